@@ -1,10 +1,14 @@
 from django.contrib import admin
 from django.db.models.query import QuerySet
 from django.http import HttpRequest, HttpResponse, HttpResponseRedirect
+from django.http.response import HttpResponseBase
 
+from furai.exports import export_queryset
 from furai.settings import CURRENCY
 
+from .exports import BOOKING_EXPORT_COLUMNS
 from .models import Booking
+from .services import cancel_bookings, complete_bookings
 
 
 @admin.action(description="Cancel selected bookings")
@@ -13,8 +17,8 @@ def cancel(
     request: HttpRequest,
     queryset: QuerySet[Booking],
 ) -> None:
-    for booking in queryset.all():
-        booking.mark_as_cancelled(True)
+    count = cancel_bookings(queryset)
+    modeladmin.message_user(request, f"{count} bookings have been cancelled")
 
 
 @admin.action(description="Mark selected bookings as complete")
@@ -23,8 +27,17 @@ def mark_as_complete(
     request: HttpRequest,
     queryset: QuerySet[Booking],
 ) -> None:
-    for booking in queryset.all():
-        booking.mark_as_complete()
+    count = complete_bookings(queryset)
+    modeladmin.message_user(request, f"{count} bookings have been completed")
+
+
+@admin.action(description="Export selected bookings as CSV")
+def export_as_csv(
+    modeladmin: admin.ModelAdmin,
+    request: HttpRequest,
+    queryset: QuerySet[Booking],
+) -> HttpResponseBase:
+    return export_queryset(queryset.order_by("pk"), BOOKING_EXPORT_COLUMNS, "bookings")
 
 
 @admin.register(Booking)
@@ -41,10 +54,11 @@ class BookingAdmin(admin.ModelAdmin):
         "first_name",
         "last_name",
     )
-    readonly_fields = ("price_cents",)
+    readonly_fields = ("price_cents", "stripe_payment_intent_id")
+    exclude = ("stripe_client_secret",)
     list_filter = ("customer", "car")
     list_per_page = 30
-    actions = [mark_as_complete, cancel]
+    actions = [mark_as_complete, cancel, export_as_csv]
 
     def response_change(self, request: HttpRequest, obj: Booking) -> HttpResponse:
         if "_cancel" in request.POST:
@@ -2,5 +2,8 @@ from django.apps import AppConfig
 
 
 class BookingConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'booking'
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "booking"
+
+    def ready(self) -> None:
+        from . import signals  # noqa: F401
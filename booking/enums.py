@@ -7,3 +7,12 @@ class BookingStatus(TextChoices):
     UNPAID = "UNPAID"
     CANCELED_BY_STAFF = "CANCELED_BY_STAFF"
     CANCELED_BY_CUSTOMER = "CANCELED_BY_CUSTOMER"
+    EXPIRED = "EXPIRED"
+
+
+# Statuses of bookings that no longer hold their car for the booked time period
+RELEASED_BOOKING_STATUSES = (
+    BookingStatus.CANCELED_BY_STAFF,
+    BookingStatus.CANCELED_BY_CUSTOMER,
+    BookingStatus.EXPIRED,
+)
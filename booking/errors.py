@@ -1,3 +1,5 @@
+from typing import Any, cast
+
 from rest_framework import exceptions, status
 
 BOOKING_CAR_UNAVAILABLE_TIME_PERIOD_ERROR = exceptions.ValidationError(
@@ -5,6 +7,21 @@ BOOKING_CAR_UNAVAILABLE_TIME_PERIOD_ERROR = exceptions.ValidationError(
     code=str(status.HTTP_400_BAD_REQUEST),
 )
 
+
+def get_car_unavailable_time_period_error(
+    alternatives: list[dict[str, str]],
+) -> exceptions.ValidationError:
+    """Return the car unavailability error along with free time periods of the car"""
+
+    return exceptions.ValidationError(
+        detail={
+            **cast(dict[str, Any], BOOKING_CAR_UNAVAILABLE_TIME_PERIOD_ERROR.detail),
+            "alternatives": alternatives,
+        },
+        code=str(status.HTTP_400_BAD_REQUEST),
+    )
+
+
 BOOKING_START_DATE_IN_THE_PAST_ERROR = exceptions.ValidationError(
     detail={"start_date": "The start date of a booking cannot be in the past"},
     code=str(status.HTTP_400_BAD_REQUEST),
@@ -39,3 +56,37 @@ BOOKING_NEGATIVE_PRICE_ERROR = exceptions.ValidationError(
     detail={"price_cents": "The price of a booking cannot be negative"},
     code=str(status.HTTP_400_BAD_REQUEST),
 )
+
+BOOKING_PRICE_MISMATCH_ERROR = exceptions.ValidationError(
+    detail={
+        "price_cents": "The price of the booking does not match the price of the car for this time period"
+    },
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
+
+BOOKING_EXPIRED_ERROR = exceptions.ValidationError(
+    detail={"status": "This booking expired before being paid"},
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
+
+BOOKING_IDEMPOTENCY_KEY_INVALID_ERROR = exceptions.ValidationError(
+    detail={"idempotency_key": "The idempotency key must have 1 to 255 characters"},
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
+
+BOOKING_IDEMPOTENCY_KEY_REUSED_ERROR = exceptions.ValidationError(
+    detail={
+        "idempotency_key": "This idempotency key was already used by another request"
+    },
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
+
+BOOKING_EXPORT_INVALID_STATUS_ERROR = exceptions.ValidationError(
+    detail={"status": "Unknown booking status"},
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
+
+BOOKING_EXPORT_INVALID_CAR_ERROR = exceptions.ValidationError(
+    detail={"car": "The car must be a car identifier"},
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
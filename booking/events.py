@@ -0,0 +1,129 @@
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from typing import Any
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .enums import BookingStatus
+from .models import Booking, StripeEvent
+from .services import BookingService, recover_expired_booking
+
+PAYMENT_SUCCEEDED_EVENT = "payment_intent.succeeded"
+PAYMENT_CANCELED_EVENT = "payment_intent.canceled"
+
+
+def get_booking_id(stripe_object: Any) -> int | None:
+    """Return the booking identifier from the metadata of a Stripe object"""
+
+    metadata = stripe_object.get("metadata") or {}
+    try:
+        return int(metadata["booking_id"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def record_stripe_event(event: dict[str, Any]) -> None:
+    """Record a verified Stripe event. Events already recorded are ignored"""
+
+    StripeEvent.objects.bulk_create(
+        [
+            StripeEvent(
+                event_id=event["id"],
+                type=event["type"],
+                booking_id=get_booking_id(event["data"]["object"]),
+                payload=event,
+                stripe_created_at=datetime.fromtimestamp(
+                    event["created"], tz=dt_timezone.utc
+                ),
+            )
+        ],
+        ignore_conflicts=True,
+    )
+
+
+@transaction.atomic
+def process_stripe_events(batch_size: int) -> int:
+    """
+    Apply a batch of pending Stripe events to their bookings.
+    The bookings of the events are locked, and bookings locked by another
+    worker are skipped, so that the events of a booking are always applied by a
+    single worker in the order Stripe created them.
+    Returns the number of processed events
+    """
+
+    now = timezone.now()
+    candidate_booking_ids = set(
+        StripeEvent.objects.pending()
+        .order_by("stripe_created_at", "id")
+        .values_list("booking_id", flat=True)[:batch_size]
+    )
+    if not candidate_booking_ids:
+        return 0
+
+    bookings = {
+        booking.pk: booking
+        for booking in Booking.objects.select_for_update(skip_locked=True, of=("self",))
+        .select_related("car", "customer__user")
+        .filter(pk__in=candidate_booking_ids - {None})
+    }
+    # Events of deleted bookings are recorded as processed without effect
+    existing_booking_ids = set(
+        Booking.objects.filter(pk__in=candidate_booking_ids - {None}).values_list(
+            "pk", flat=True
+        )
+    )
+    missing_booking_ids = candidate_booking_ids - existing_booking_ids - {None}
+    events = list(
+        StripeEvent.objects.pending()
+        .select_for_update(skip_locked=True)
+        .filter(
+            Q(booking_id__in=bookings.keys())
+            | Q(booking_id__in=missing_booking_ids)
+            | Q(booking_id__isnull=True)
+        )
+        .order_by("stripe_created_at", "id")
+    )
+
+    updated_booking_ids: set[int] = set()
+    deleted_bookings: dict[int, Booking] = {}
+    recovered_bookings: list[Booking] = []
+    for event in events:
+        if event.booking_id not in bookings:
+            continue
+        booking = bookings[event.booking_id]
+        if event.type == PAYMENT_SUCCEEDED_EVENT:
+            # Duplicated or late events do not change paid or cancelled bookings
+            if booking.status == BookingStatus.UNPAID:
+                booking.status = BookingStatus.ACTIVE
+                booking.updated_at = now
+                updated_booking_ids.add(booking.pk)
+            # Paid while its payment intent was being cancelled by the expiry
+            elif booking.status == BookingStatus.EXPIRED and recover_expired_booking(
+                booking, event.payload["data"]["object"]["id"]
+            ):
+                recovered_bookings.append(booking)
+        # Payment intents of expired bookings are cancelled by the expiry
+        elif (
+            event.type == PAYMENT_CANCELED_EVENT
+            and booking.status != BookingStatus.EXPIRED
+        ):
+            deleted_bookings[booking.pk] = bookings.pop(booking.pk)
+
+    confirmed_bookings = [
+        bookings[booking_id]
+        for booking_id in updated_booking_ids
+        if booking_id in bookings
+    ]
+    Booking.objects.bulk_update(confirmed_bookings, ["status", "updated_at"])
+    if deleted_bookings:
+        Booking.objects.filter(pk__in=deleted_bookings.keys()).delete()
+    booking_service = BookingService()
+    for booking in [*confirmed_bookings, *recovered_bookings]:
+        booking_service.send_confirmation_email(booking)
+
+    StripeEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+        processed_at=now, updated_at=now
+    )
+    return len(events)
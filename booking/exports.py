@@ -0,0 +1,55 @@
+from django.db.models.query import QuerySet
+from django.http import QueryDict
+
+from furai.utils import parse_period
+
+from .enums import BookingStatus
+from .errors import (
+    BOOKING_EXPORT_INVALID_CAR_ERROR,
+    BOOKING_EXPORT_INVALID_STATUS_ERROR,
+)
+from .models import Booking
+
+# Exported columns and the lookups they are read from
+BOOKING_EXPORT_COLUMNS = {
+    "id": "id",
+    "created_at": "created_at",
+    "status": "status",
+    "start_date": "start_date",
+    "end_date": "end_date",
+    "price_cents": "price_cents",
+    "car_id": "car_id",
+    "car_make": "car__make",
+    "car_model": "car__model",
+    "customer_id": "customer_id",
+    "customer_first_name": "customer__first_name",
+    "customer_last_name": "customer__last_name",
+    "customer_email": "customer__user__email",
+    "stripe_payment_intent_id": "stripe_payment_intent_id",
+}
+
+
+def filter_export_bookings(
+    queryset: QuerySet[Booking], query_params: QueryDict
+) -> QuerySet[Booking]:
+    """
+    Filter the exported bookings by status (repeatable), car and start date
+    period, from the status, car, start and end query params
+    """
+
+    statuses = query_params.getlist("status")
+    if any(status not in BookingStatus.values for status in statuses):
+        raise BOOKING_EXPORT_INVALID_STATUS_ERROR
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+
+    car_id = query_params.get("car")
+    if car_id is not None:
+        if not car_id.isdigit():
+            raise BOOKING_EXPORT_INVALID_CAR_ERROR
+        queryset = queryset.filter(car=int(car_id))
+
+    period = parse_period(query_params, "start", "end")
+    if period is not None:
+        queryset = queryset.filter(start_date__gte=period[0], start_date__lt=period[1])
+    return queryset.order_by("pk")
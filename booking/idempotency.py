@@ -0,0 +1,110 @@
+import hashlib
+from collections.abc import Callable, Mapping
+from datetime import timedelta
+from functools import wraps
+from typing import Any
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
+
+from .errors import (
+    BOOKING_IDEMPOTENCY_KEY_INVALID_ERROR,
+    BOOKING_IDEMPOTENCY_KEY_REUSED_ERROR,
+)
+from .models import IdempotencyKey
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_REPLAYED_HEADER = "Idempotent-Replayed"
+
+ViewMethod = Callable[..., Response]
+
+
+def get_request_fingerprint(request: Request) -> str:
+    """Hash the method, the path and the body of a request"""
+
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.path}\n".encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def get_idempotency_scope(request: Request) -> str:
+    """
+    Return the client idempotency keys are unique for. Anonymous clients are
+    told apart by the email address of their request body, as a booking is
+    created along with the user of this email address
+    """
+
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    email = request.data.get("email") if isinstance(request.data, Mapping) else None
+    if not isinstance(email, str) or not email:
+        return "anonymous"
+    digest = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+    return f"anonymous:{digest}"
+
+
+def idempotent(view_method: ViewMethod) -> ViewMethod:
+    """
+    Make a view method idempotent for the requests sent with an Idempotency-Key
+    header. The response of the first request is stored and replayed to its
+    retries without running the view again.
+
+    The key is inserted in the transaction of the view, so a concurrent retry
+    waits on the unique constraint until the first request ends. Requests
+    raising an error or answered with a server error are rolled back along
+    with their key, so that they can be retried
+    """
+
+    @wraps(view_method)
+    def wrapper(
+        view: GenericViewSet, request: Request, *args: Any, **kwargs: Any
+    ) -> Response:
+        key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if key is None:
+            return view_method(view, request, *args, **kwargs)
+        if not key or len(key) > 255:
+            raise BOOKING_IDEMPOTENCY_KEY_INVALID_ERROR
+
+        # The body is read before being parsed by the scope
+        fingerprint = get_request_fingerprint(request)
+        scope = get_idempotency_scope(request)
+        now = timezone.now()
+        with transaction.atomic():
+            IdempotencyKey.objects.expired(now).filter(scope=scope, key=key).delete()
+            idempotency_key = IdempotencyKey(
+                key=key,
+                scope=scope,
+                fingerprint=fingerprint,
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+            )
+            try:
+                with transaction.atomic():
+                    idempotency_key.save()
+            except IntegrityError:
+                stored_key = IdempotencyKey.objects.get(scope=scope, key=key)
+                if stored_key.fingerprint != fingerprint:
+                    raise BOOKING_IDEMPOTENCY_KEY_REUSED_ERROR
+                return Response(
+                    stored_key.response_data,
+                    status=stored_key.status_code,
+                    headers={IDEMPOTENCY_REPLAYED_HEADER: "true"},
+                )
+
+            response = view_method(view, request, *args, **kwargs)
+            if response.status_code >= 500:
+                transaction.set_rollback(True)
+                return response
+
+            idempotency_key.status_code = response.status_code
+            idempotency_key.response_data = response.data
+            idempotency_key.save(
+                update_fields=["status_code", "response_data", "updated_at"]
+            )
+            return response
+
+    return wrapper
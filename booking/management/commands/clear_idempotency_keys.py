@@ -0,0 +1,14 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from booking.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete the expired idempotency keys and their stored responses"
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        count, _ = IdempotencyKey.objects.expired(timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count} idempotency keys"))
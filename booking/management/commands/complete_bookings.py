@@ -0,0 +1,37 @@
+import time
+from typing import Any
+
+from django.core.management.base import CommandParser
+
+from booking.services import complete_finished_bookings
+from furai.commands import WorkerCommand
+
+
+class Command(WorkerCommand):
+    help = "Complete the active bookings whose end date has passed"
+
+    default_interval = 300.0
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="The maximum number of bookings completed per transaction",
+        )
+
+    def run_once(self, **options: Any) -> int:
+        """Complete every finished booking, one batch per transaction"""
+
+        start = time.monotonic()
+        count = 0
+        while True:
+            batch_count = complete_finished_bookings(options["batch_size"])
+            count += batch_count
+            if batch_count < options["batch_size"]:
+                break
+        if count or options["once"]:
+            duration = time.monotonic() - start
+            self.stdout.write(f"Completed {count} bookings in {duration:.3f}s")
+        return count
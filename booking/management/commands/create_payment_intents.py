@@ -0,0 +1,22 @@
+from typing import Any
+
+from django.core.management.base import CommandParser
+
+from booking.services import create_pending_payment_intents
+from furai.commands import WorkerCommand
+
+
+class Command(WorkerCommand):
+    help = "Create the Stripe payment intents of the unpaid bookings in advance"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="The maximum number of payment intents created per batch",
+        )
+
+    def run_once(self, **options: Any) -> int:
+        return create_pending_payment_intents(options["batch_size"])
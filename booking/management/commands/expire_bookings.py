@@ -0,0 +1,24 @@
+from typing import Any
+
+from django.core.management.base import CommandParser
+
+from booking.services import expire_unpaid_bookings
+from furai.commands import WorkerCommand
+
+
+class Command(WorkerCommand):
+    help = "Expire the bookings left unpaid for longer than BOOKING_HOLD_TTL"
+
+    default_interval = 60.0
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="The maximum number of bookings expired per batch",
+        )
+
+    def run_once(self, **options: Any) -> int:
+        return expire_unpaid_bookings(options["batch_size"])
@@ -0,0 +1,22 @@
+from typing import Any
+
+from django.core.management.base import CommandParser
+
+from booking.events import process_stripe_events
+from furai.commands import WorkerCommand
+
+
+class Command(WorkerCommand):
+    help = "Apply the Stripe events received by the webhook to their bookings"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="The maximum number of events claimed per batch",
+        )
+
+    def run_once(self, **options: Any) -> int:
+        return process_stripe_events(options["batch_size"])
@@ -0,0 +1,78 @@
+from argparse import ArgumentTypeError
+from datetime import datetime, timedelta
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from booking.reconciliation import (
+    ReconciliationStats,
+    list_payment_intents,
+    reconcile_payment_intents,
+)
+from furai.utils import parse_query_datetime
+
+
+def parse_date_argument(value: str) -> datetime:
+    try:
+        return parse_query_datetime(value)
+    except ValidationError as error:
+        raise ArgumentTypeError(f"Invalid ISO 8601 date: {value}") from error
+
+
+class Command(BaseCommand):
+    help = (
+        "Activate the unpaid bookings whose Stripe payment succeeded, "
+        "e.g. after missed webhooks, and report the drift"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--since",
+            type=parse_date_argument,
+            help="Reconcile the payment intents created after this ISO 8601 date, "
+            "7 days ago by default",
+        )
+        parser.add_argument(
+            "--until",
+            type=parse_date_argument,
+            help="Reconcile the payment intents created before this ISO 8601 date",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the drift without updating the bookings",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        since = options["since"] or timezone.now() - timedelta(days=7)
+        stats = ReconciliationStats()
+        for payment_intents in list_payment_intents(since, options["until"]):
+            reconcile_payment_intents(payment_intents, stats, options["dry_run"])
+
+        self.stdout.write(f"Payment intents: {stats.payment_intents}")
+        self.stdout.write(f"Unknown bookings: {stats.unknown_bookings}")
+        activated_bookings = sorted(stats.activated_bookings)
+        canceled_unpaid_bookings = sorted(stats.canceled_unpaid_bookings)
+        self.stdout.write(
+            "Unpaid bookings with a succeeded payment: "
+            f"{len(activated_bookings)} {activated_bookings}"
+        )
+        self.stdout.write(
+            "Unpaid bookings with a canceled payment: "
+            f"{len(canceled_unpaid_bookings)} {canceled_unpaid_bookings}"
+        )
+        paid_released_bookings = sorted(stats.paid_released_bookings)
+        self.stdout.write(
+            "Expired or cancelled bookings with a succeeded payment: "
+            f"{len(paid_released_bookings)} {paid_released_bookings}"
+        )
+        if options["dry_run"]:
+            self.stdout.write(
+                self.style.WARNING(f"Found {stats.drift} drifted bookings")
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"Activated {len(activated_bookings)} bookings")
+            )
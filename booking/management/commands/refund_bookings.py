@@ -0,0 +1,22 @@
+from typing import Any
+
+from django.core.management.base import CommandParser
+
+from booking.services import refund_pending_bookings
+from furai.commands import WorkerCommand
+
+
+class Command(WorkerCommand):
+    help = "Refund the Stripe payments of the bookings flagged for a refund"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="The maximum number of bookings refunded per batch",
+        )
+
+    def run_once(self, **options: Any) -> int:
+        return refund_pending_bookings(options["batch_size"])
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0005_booking_updated_at_alter_booking_created_at'),
+        ('car', '0011_remove_car_price_twelve_hours_cents_and_more'),
+        ('customer', '0007_customer_updated_at_alter_customer_created_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status__in', ('CANCELED_BY_STAFF', 'CANCELED_BY_CUSTOMER')), _negated=True), fields=['car', 'start_date', 'end_date'], name='booking_car_period_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-17 23:10
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+import booking.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0006_booking_car_period_idx'),
+        ('car', '0011_remove_car_price_twelve_hours_cents_and_more'),
+        ('customer', '0007_customer_updated_at_alter_customer_created_at'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('status__in', ('CANCELED_BY_STAFF', 'CANCELED_BY_CUSTOMER')), _negated=True), expressions=[(booking.models.TsTzRange('start_date', 'end_date', django.contrib.postgres.fields.ranges.RangeBoundary()), '&&'), ('car', '=')], name='booking_car_period_excl'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0007_booking_car_period_excl'),
+        ('car', '0012_car_car_price_24h_id_idx'),
+        ('customer', '0007_customer_updated_at_alter_customer_created_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['customer', '-created_at', '-id'], name='booking_customer_created_idx'),
+        ),
+    ]
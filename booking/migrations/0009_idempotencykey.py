@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-17 23:49
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0008_booking_booking_customer_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_comment='The creation date of the model instance', default=django.utils.timezone.now, help_text='The creation date of the model instance')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_comment='The last updated date of the model instance', help_text='The last updated date of the model instance')),
+                ('key', models.CharField(db_comment='The idempotency key sent by the client', help_text='The idempotency key sent by the client', max_length=255)),
+                ('scope', models.CharField(db_comment='The client the idempotency key belongs to', help_text='The client the idempotency key belongs to', max_length=255)),
+                ('fingerprint', models.CharField(db_comment='The hash of the request method, path and body', help_text='The hash of the request method, path and body', max_length=64)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, db_comment='The status code of the response, empty until it is stored', help_text='The status code of the response, empty until it is stored', null=True)),
+                ('response_data', models.JSONField(blank=True, db_comment='The data of the response', encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='The data of the response', null=True)),
+                ('expires_at', models.DateTimeField(db_comment='The date after which the idempotency key can be reused', help_text='The date after which the idempotency key can be reused')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='idempotency_key_expires_idx')],
+                'constraints': [models.UniqueConstraint(fields=('scope', 'key'), name='idempotency_key_scope_key_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 23:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0009_idempotencykey'),
+        ('car', '0012_car_car_price_24h_id_idx'),
+        ('customer', '0009_customer_stripe_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='stripe_client_secret',
+            field=models.CharField(blank=True, db_comment='The client secret of the Stripe payment intent', help_text='The client secret of the Stripe payment intent', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='stripe_payment_intent_id',
+            field=models.CharField(blank=True, db_comment='The Stripe payment intent identifier used to pay the booking', help_text='The Stripe payment intent identifier used to pay the booking', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'UNPAID'), ('stripe_payment_intent_id', '')), fields=['created_at'], name='booking_payment_intent_idx'),
+        ),
+    ]
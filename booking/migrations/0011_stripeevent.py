@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-17 23:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0010_booking_stripe_client_secret_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_comment='The creation date of the model instance', default=django.utils.timezone.now, help_text='The creation date of the model instance')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_comment='The last updated date of the model instance', help_text='The last updated date of the model instance')),
+                ('event_id', models.CharField(db_comment='The Stripe event identifier', help_text='The Stripe event identifier', max_length=255, unique=True)),
+                ('type', models.CharField(db_comment='The Stripe event type', help_text='The Stripe event type', max_length=255)),
+                ('booking_id', models.BigIntegerField(blank=True, db_comment='The identifier of the booking the event is about', help_text='The identifier of the booking the event is about', null=True)),
+                ('payload', models.JSONField(db_comment='The Stripe event', help_text='The Stripe event')),
+                ('stripe_created_at', models.DateTimeField(db_comment='The date Stripe created the event', help_text='The date Stripe created the event')),
+                ('processed_at', models.DateTimeField(blank=True, db_comment='The date the event was applied', help_text='The date the event was applied', null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['stripe_created_at', 'id'], name='stripe_event_pending_idx'), models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['booking_id', 'stripe_created_at'], name='stripe_event_booking_idx')],
+            },
+        ),
+    ]
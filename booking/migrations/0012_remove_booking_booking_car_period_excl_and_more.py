@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-18 00:00
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.db import migrations, models
+
+import booking.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0011_stripeevent'),
+        ('car', '0012_car_car_price_24h_id_idx'),
+        ('customer', '0009_customer_stripe_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='booking',
+            name='booking_car_period_excl',
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='booking_car_period_idx',
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='status',
+            field=models.CharField(choices=[('COMPLETED', 'Completed'), ('ACTIVE', 'Active'), ('UNPAID', 'Unpaid'), ('CANCELED_BY_STAFF', 'Canceled By Staff'), ('CANCELED_BY_CUSTOMER', 'Canceled By Customer'), ('EXPIRED', 'Expired')], db_comment='The current booking status', default='UNPAID', help_text='The current booking status'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status__in', ('CANCELED_BY_STAFF', 'CANCELED_BY_CUSTOMER', 'EXPIRED')), _negated=True), fields=['car', 'start_date', 'end_date'], name='booking_car_period_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('status__in', ('CANCELED_BY_STAFF', 'CANCELED_BY_CUSTOMER', 'EXPIRED')), _negated=True), expressions=[(booking.models.TsTzRange('start_date', 'end_date', django.contrib.postgres.fields.ranges.RangeBoundary()), '&&'), ('car', '=')], name='booking_car_period_excl'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 00:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0012_remove_booking_booking_car_period_excl_and_more'),
+        ('car', '0012_car_car_price_24h_id_idx'),
+        ('customer', '0009_customer_stripe_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['end_date'], name='booking_active_end_idx'),
+        ),
+    ]
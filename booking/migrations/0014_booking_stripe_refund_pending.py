@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0013_booking_booking_active_end_idx'),
+        ('car', '0012_car_car_price_24h_id_idx'),
+        ('customer', '0009_customer_stripe_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='stripe_refund_pending',
+            field=models.BooleanField(db_comment='Whether the Stripe payment of the booking must be refunded', default=False, help_text='Whether the Stripe payment of the booking must be refunded'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('stripe_refund_pending', True)), fields=['updated_at'], name='booking_refund_pending_idx'),
+        ),
+    ]
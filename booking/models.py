@@ -1,12 +1,25 @@
+from datetime import datetime
 from typing import Any, Self
 
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeBoundary
+from django.contrib.postgres.fields.ranges import RangeOperators
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Func, Q
 
 from car.models import Car
 from customer.models import Customer
 from furai.models import BaseModel
 
-from .enums import BookingStatus
+from .enums import RELEASED_BOOKING_STATUSES, BookingStatus
+
+BOOKING_OVERLAP_CONSTRAINT_NAME = "booking_car_period_excl"
+
+
+class TsTzRange(Func):
+    function = "TSTZRANGE"
+    output_field = DateTimeRangeField()
 
 
 class BookingManager(models.Manager):
@@ -18,9 +31,23 @@ class BookingManager(models.Manager):
         return customer
 
 
+class BookingQuerySet(models.QuerySet):
+    def blocking(self) -> Self:
+        """Bookings that still hold their car for the booked time period"""
+
+        return self.exclude(status__in=RELEASED_BOOKING_STATUSES)
+
+    def overlapping(self, start_date: datetime, end_date: datetime) -> Self:
+        """Blocking bookings overlapping the given time period"""
+
+        return self.blocking().filter(start_date__lt=end_date, end_date__gt=start_date)
+
+
 class Booking(BaseModel):
     """Representation of a Booking"""
 
+    objects = BookingQuerySet.as_manager()
+
     car = models.ForeignKey(
         Car,
         on_delete=models.CASCADE,
@@ -51,6 +78,70 @@ class Booking(BaseModel):
         db_comment="The current booking status",
         default=BookingStatus.UNPAID,
     )
+    stripe_payment_intent_id = models.CharField(
+        help_text="The Stripe payment intent identifier used to pay the booking",
+        db_comment="The Stripe payment intent identifier used to pay the booking",
+        max_length=255,
+        blank=True,
+    )
+    stripe_client_secret = models.CharField(
+        help_text="The client secret of the Stripe payment intent",
+        db_comment="The client secret of the Stripe payment intent",
+        max_length=255,
+        blank=True,
+    )
+    stripe_refund_pending = models.BooleanField(
+        help_text="Whether the Stripe payment of the booking must be refunded",
+        db_comment="Whether the Stripe payment of the booking must be refunded",
+        default=False,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["car", "start_date", "end_date"],
+                condition=~Q(status__in=RELEASED_BOOKING_STATUSES),
+                name="booking_car_period_idx",
+            ),
+            # Keyset pagination of the bookings of a customer
+            models.Index(
+                fields=["customer", "-created_at", "-id"],
+                name="booking_customer_created_idx",
+            ),
+            # Claiming the unpaid bookings without a payment intent
+            models.Index(
+                fields=["created_at"],
+                condition=Q(status=BookingStatus.UNPAID, stripe_payment_intent_id=""),
+                name="booking_payment_intent_idx",
+            ),
+            # Completing the active bookings whose end date has passed
+            models.Index(
+                fields=["end_date"],
+                condition=Q(status=BookingStatus.ACTIVE),
+                name="booking_active_end_idx",
+            ),
+            # Claiming the bookings whose payment must be refunded
+            models.Index(
+                fields=["updated_at"],
+                condition=Q(stripe_refund_pending=True),
+                name="booking_refund_pending_idx",
+            ),
+        ]
+        constraints = [
+            # Prevent double bookings of a car, as two concurrent transactions can
+            # both see a time period as available before inserting their booking
+            ExclusionConstraint(
+                name=BOOKING_OVERLAP_CONSTRAINT_NAME,
+                expressions=[
+                    (
+                        TsTzRange("start_date", "end_date", RangeBoundary()),
+                        RangeOperators.OVERLAPS,
+                    ),
+                    ("car", RangeOperators.EQUAL),
+                ],
+                condition=~Q(status__in=RELEASED_BOOKING_STATUSES),
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.customer.name} - {self.car.name}"
@@ -74,3 +165,127 @@ class Booking(BaseModel):
         self.status = BookingStatus.COMPLETED
         self.save()
         return self
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    def expired(self, now: datetime) -> Self:
+        return self.filter(expires_at__lte=now)
+
+
+class IdempotencyKey(BaseModel):
+    """
+    Representation of a request sent with an Idempotency-Key header, storing
+    its response so that retries of the request replay it
+    """
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    key = models.CharField(
+        help_text="The idempotency key sent by the client",
+        db_comment="The idempotency key sent by the client",
+        max_length=255,
+    )
+    scope = models.CharField(
+        help_text="The client the idempotency key belongs to",
+        db_comment="The client the idempotency key belongs to",
+        max_length=255,
+    )
+    fingerprint = models.CharField(
+        help_text="The hash of the request method, path and body",
+        db_comment="The hash of the request method, path and body",
+        max_length=64,
+    )
+    status_code = models.PositiveSmallIntegerField(
+        help_text="The status code of the response, empty until it is stored",
+        db_comment="The status code of the response, empty until it is stored",
+        null=True,
+        blank=True,
+    )
+    response_data = models.JSONField(
+        help_text="The data of the response",
+        db_comment="The data of the response",
+        encoder=DjangoJSONEncoder,
+        null=True,
+        blank=True,
+    )
+    expires_at = models.DateTimeField(
+        help_text="The date after which the idempotency key can be reused",
+        db_comment="The date after which the idempotency key can be reused",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["expires_at"], name="idempotency_key_expires_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["scope", "key"], name="idempotency_key_scope_key_uniq"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return self.key
+
+
+class StripeEventQuerySet(models.QuerySet):
+    def pending(self) -> Self:
+        return self.filter(processed_at__isnull=True)
+
+
+class StripeEvent(BaseModel):
+    """
+    Representation of an event received from Stripe, recorded once per event
+    and applied to its booking by the Stripe event worker
+    """
+
+    objects = StripeEventQuerySet.as_manager()
+
+    event_id = models.CharField(
+        help_text="The Stripe event identifier",
+        db_comment="The Stripe event identifier",
+        max_length=255,
+        unique=True,
+    )
+    type = models.CharField(
+        help_text="The Stripe event type",
+        db_comment="The Stripe event type",
+        max_length=255,
+    )
+    booking_id = models.BigIntegerField(
+        help_text="The identifier of the booking the event is about",
+        db_comment="The identifier of the booking the event is about",
+        null=True,
+        blank=True,
+    )
+    payload = models.JSONField(
+        help_text="The Stripe event",
+        db_comment="The Stripe event",
+    )
+    stripe_created_at = models.DateTimeField(
+        help_text="The date Stripe created the event",
+        db_comment="The date Stripe created the event",
+    )
+    processed_at = models.DateTimeField(
+        help_text="The date the event was applied",
+        db_comment="The date the event was applied",
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        indexes = [
+            # Claiming the pending events in the order Stripe created them
+            models.Index(
+                fields=["stripe_created_at", "id"],
+                condition=Q(processed_at__isnull=True),
+                name="stripe_event_pending_idx",
+            ),
+            models.Index(
+                fields=["booking_id", "stripe_created_at"],
+                condition=Q(processed_at__isnull=True),
+                name="stripe_event_booking_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.type} - {self.event_id}"
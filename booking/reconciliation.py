@@ -0,0 +1,113 @@
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+import stripe
+from django.db import transaction
+from django.utils import timezone
+
+from .enums import RELEASED_BOOKING_STATUSES, BookingStatus
+from .events import get_booking_id
+from .models import Booking
+from .services import BookingService
+
+# Maximum number of payment intents listed per Stripe request
+STRIPE_LIST_LIMIT = 100
+
+
+@dataclass
+class ReconciliationStats:
+    """Drift between the Stripe payment intents and the booking statuses"""
+
+    payment_intents: int = 0
+    unknown_bookings: int = 0
+    activated_bookings: set[int] = field(default_factory=set)
+    canceled_unpaid_bookings: set[int] = field(default_factory=set)
+    # Expired or cancelled bookings whose payment succeeded anyway
+    paid_released_bookings: set[int] = field(default_factory=set)
+
+    @property
+    def drift(self) -> int:
+        return (
+            len(self.activated_bookings)
+            + len(self.canceled_unpaid_bookings)
+            + len(self.paid_released_bookings)
+        )
+
+
+def list_payment_intents(
+    created_after: datetime, created_before: datetime | None = None
+) -> Iterator[Sequence[Any]]:
+    """Yield the pages of the Stripe payment intents created in a time period"""
+
+    created: dict[str, int] = {"gte": int(created_after.timestamp())}
+    if created_before is not None:
+        created["lt"] = int(created_before.timestamp())
+    params: dict[str, Any] = {"created": created, "limit": STRIPE_LIST_LIMIT}
+    while True:
+        page = stripe.PaymentIntent.list(**params)
+        payment_intents: list[Any] = page.data
+        if payment_intents:
+            yield payment_intents
+        if not page.has_more or not payment_intents:
+            return
+        params["starting_after"] = payment_intents[-1]["id"]
+
+
+@transaction.atomic
+def reconcile_payment_intents(
+    payment_intents: Sequence[Any], stats: ReconciliationStats, dry_run: bool = False
+) -> None:
+    """
+    Activate the unpaid bookings of a page of succeeded payment intents, with a
+    single query to load the bookings and a single bulk update
+    """
+
+    booking_ids: dict[int, Any] = {}
+    for payment_intent in payment_intents:
+        stats.payment_intents += 1
+        booking_id = get_booking_id(payment_intent)
+        if booking_id is None:
+            stats.unknown_bookings += 1
+        # A succeeded payment intent wins over the other intents of the booking
+        elif booking_id not in booking_ids or payment_intent["status"] == "succeeded":
+            booking_ids[booking_id] = payment_intent
+
+    bookings: dict[int, Booking] = Booking.objects.select_for_update(
+        of=("self",)
+    ).in_bulk(booking_ids.keys())
+    stats.unknown_bookings += len(booking_ids.keys() - bookings.keys())
+
+    now = timezone.now()
+    activated_bookings: list[Booking] = []
+    for booking_id, booking in bookings.items():
+        payment_intent = booking_ids[booking_id]
+        if booking.status in RELEASED_BOOKING_STATUSES:
+            # Only reported, as the payment may have to be refunded
+            if payment_intent["status"] == "succeeded":
+                stats.paid_released_bookings.add(booking_id)
+            continue
+        if booking.status != BookingStatus.UNPAID:
+            continue
+        if payment_intent["status"] == "succeeded":
+            booking.status = BookingStatus.ACTIVE
+            booking.stripe_payment_intent_id = payment_intent["id"]
+            booking.updated_at = now
+            activated_bookings.append(booking)
+            stats.activated_bookings.add(booking_id)
+            stats.canceled_unpaid_bookings.discard(booking_id)
+        elif payment_intent["status"] == "canceled":
+            # Only reported, as the customer may still pay with another intent
+            stats.canceled_unpaid_bookings.add(booking_id)
+
+    if dry_run or not activated_bookings:
+        return
+    Booking.objects.bulk_update(
+        activated_bookings, ["status", "stripe_payment_intent_id", "updated_at"]
+    )
+    booking_service = BookingService()
+    for booking in Booking.objects.select_related("car", "customer__user").filter(
+        pk__in=[booking.pk for booking in activated_bookings]
+    ):
+        booking_service.send_confirmation_email(booking)
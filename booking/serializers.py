@@ -1,11 +1,19 @@
+from typing import Any
+
 from django_countries.serializer_fields import CountryField
 from django_countries.serializers import CountryFieldMixin
 from rest_framework import serializers
 
+from car.serializers import CarSummarySerializer
+from furai.fieldsets import SparseFieldsetSerializerMixin
+from furai.utils import check_booking_duration
+
 from .models import Booking
 
 
-class BookingSerializer(serializers.ModelSerializer, CountryFieldMixin):
+class BookingSerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer, CountryFieldMixin
+):
     email = serializers.EmailField(write_only=True)
     first_name = serializers.CharField(write_only=True)
     last_name = serializers.CharField(write_only=True)
@@ -23,11 +31,18 @@ class BookingSerializer(serializers.ModelSerializer, CountryFieldMixin):
     passport = serializers.CharField(
         required=False, write_only=True, allow_blank=True, allow_null=True
     )
+    car_summary = CarSummarySerializer(source="car", read_only=True)
 
     class Meta:
         model = Booking
-        fields = "__all__"
+        exclude = ["stripe_payment_intent_id", "stripe_client_secret"]
         extra_kwargs = {
             "customer": {"read_only": True},
             "status": {"read_only": True},
+            "price_cents": {"required": False},
         }
+
+    def validate(self, attrs: dict[str, Any]) -> dict[str, Any]:
+        if "start_date" in attrs and "end_date" in attrs:
+            check_booking_duration(attrs["start_date"], attrs["end_date"])
+        return attrs
@@ -1,36 +1,61 @@
+import logging
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import partial
 from typing import Any, cast
 
-import resend
 import stripe
-from django.db import transaction
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Prefetch
+from django.db.models.query import QuerySet
 from django.shortcuts import get_object_or_404
 from django.template.loader import render_to_string
 from django.utils import timezone
-from resend.emails._email import Email
+from rest_framework.exceptions import ValidationError
 
-from booking.enums import BookingStatus
-from car.models import CarMedia
+from booking.enums import RELEASED_BOOKING_STATUSES, BookingStatus
+from car.availability import find_free_windows
+from car.cache import get_availability_version
+from car.models import Car, CarMedia
+from car.pricing import quote_car
+from car.serializers import get_car_thumbnail
 from customer.models import Customer
-from customer.services import CustomerService
-from furai.settings import CURRENCY, NOREPLY_EMAIL_ADDRESS
+from customer.services import CustomerService, sync_stripe_customer
+from furai.settings import CURRENCY
+from notification.models import OutboxEmail
+from notification.services import EmailService
 from user.models import CustomUser
 
 from .errors import (
     BOOKING_ALREADY_CANCELED_ERROR,
     BOOKING_CANCEL_COMPLETED_ERROR,
-    BOOKING_CAR_UNAVAILABLE_TIME_PERIOD_ERROR,
     BOOKING_END_DATE_BEFORE_START_DATE_ERROR,
     BOOKING_END_DATE_IN_THE_PAST_ERROR,
+    BOOKING_EXPIRED_ERROR,
     BOOKING_NEGATIVE_PRICE_ERROR,
+    BOOKING_PRICE_MISMATCH_ERROR,
     BOOKING_SAME_DAY_BOOKING_ERROR,
     BOOKING_START_DATE_IN_THE_PAST_ERROR,
+    get_car_unavailable_time_period_error,
 )
-from .models import Booking
+from .models import BOOKING_OVERLAP_CONSTRAINT_NAME, Booking
 
 stripe.api_key = os.getenv("STRIPE_API_KEY")
 
+logger = logging.getLogger(__name__)
+
+# Number of free time periods suggested when the car of a booking is unavailable
+BOOKING_ALTERNATIVES_COUNT = 3
+
+
+def is_booking_overlap_error(error: IntegrityError) -> bool:
+    """Whether an error was raised by the constraint preventing double bookings"""
+
+    diagnostic = getattr(error.__cause__, "diag", None)
+    constraint_name = getattr(diagnostic, "constraint_name", None)
+    return constraint_name == BOOKING_OVERLAP_CONSTRAINT_NAME
+
 
 class BookingService:
     """
@@ -43,7 +68,7 @@ class BookingService:
         address_country: str | None = None,
         address_line1: str | None = None,
         address_postal_code: str | None = None,
-        car: int | None = None,
+        car: Car | None = None,
         email: str | None = None,
         end_date: datetime | None = None,
         first_name: str | None = None,
@@ -73,63 +98,97 @@ class BookingService:
         self.passport = passport
         self.id = id
 
-    def send_confirmation_email(self, booking: Booking) -> Email:
-        """Send an email to the user when a new Booking is created"""
+    def send_confirmation_email(self, booking: Booking) -> OutboxEmail:
+        """
+        Write an email to the outbox to notify the user of a new Booking.
+        It is only sent if the current transaction commits
+        """
 
-        queryset = CarMedia.objects.filter(car=booking.car, is_thumbnail=True)
-        car_thumbnail = queryset[0].url if queryset.exists() else None
         html_body = render_to_string(
             "booking-confirmation.html",
             {
                 "start_date": booking.start_date,
                 "end_date": booking.end_date,
-                "car_thumbnail": car_thumbnail,
+                "car_thumbnail": get_car_thumbnail(booking.car),
                 "car_name": booking.car.name,
                 "status": booking.status,
             },
         )
-        params: resend.Emails.SendParams = {
-            "from": NOREPLY_EMAIL_ADDRESS,
-            "to": [booking.customer.user.email],
-            "subject": "Your booking confirmation",
-            "html": html_body,
-        }
-        return resend.Emails.send(params)
+        return EmailService(
+            to=booking.customer.user.email,
+            subject="Your booking confirmation",
+            html=html_body,
+        ).enqueue()
+
+    def send_cancellation_email(self, booking: Booking) -> OutboxEmail:
+        """
+        Write an email to the outbox to notify the user of a cancelled Booking.
+        It is only sent if the current transaction commits
+        """
 
-    def send_cancellation_email(self, booking: Booking) -> Email:
-        """Send an email to the user when a Booking is cancelled"""
+        return self.get_cancellation_email(booking).enqueue()
+
+    def get_cancellation_email(self, booking: Booking) -> EmailService:
+        """Render the email notifying the user of a cancelled Booking"""
 
-        queryset = CarMedia.objects.filter(car=booking.car, is_thumbnail=True)
-        car_thumbnail = queryset[0].url if queryset.exists() else None
         html_body = render_to_string(
             "booking-cancellation.html",
             {
                 "start_date": booking.start_date,
                 "end_date": booking.end_date,
-                "car_thumbnail": car_thumbnail,
+                "car_thumbnail": get_car_thumbnail(booking.car),
                 "car_name": booking.car.name,
                 "status": booking.status,
             },
         )
-        params: resend.Emails.SendParams = {
-            "from": NOREPLY_EMAIL_ADDRESS,
-            "to": [booking.customer.user.email],
-            "subject": "Your booking has been cancelled",
-            "html": html_body,
-        }
-        return resend.Emails.send(params)
+        return EmailService(
+            to=booking.customer.user.email,
+            subject="Your booking has been cancelled",
+            html=html_body,
+        )
 
-    def create_payment_intent(self) -> stripe.PaymentIntent:
-        """Create a Stripe payment intent from a booking"""
+    @transaction.atomic
+    def create_payment_intent(self) -> dict[str, Any]:
+        """
+        Return the Stripe payment intent of a booking. It is only created on the
+        first call, unless the payment intent worker already created it
+        """
 
-        booking = get_object_or_404(Booking, pk=self.id)
+        booking = get_object_or_404(
+            Booking.objects.select_for_update(of=("self",)).select_related("customer"),
+            pk=self.id,
+        )
+        if booking.status == BookingStatus.EXPIRED:
+            raise BOOKING_EXPIRED_ERROR
+        if not booking.stripe_payment_intent_id:
+            self.attach_payment_intent(booking)
+        return get_payment_intent_data(booking)
+
+    def attach_payment_intent(self, booking: Booking) -> Booking:
+        """Create the Stripe payment intent of a locked booking and store it"""
+
+        customer = booking.customer
+        if not customer.stripe_id:
+            # The Stripe sync worker did not create the Stripe customer yet
+            customer = cast(Customer, sync_stripe_customer(customer.pk))
+        # A retried creation returns the payment intent created the first time
         payment_intent = stripe.PaymentIntent.create(
             amount=booking.price_cents,
             currency=CURRENCY.lower(),
-            customer=booking.customer.stripe_id,
+            customer=customer.stripe_id,
             metadata={"booking_id": str(booking.pk)},
+            idempotency_key=f"booking-{booking.pk}-payment-intent",
+        )
+        booking.stripe_payment_intent_id = payment_intent["id"]
+        booking.stripe_client_secret = payment_intent["client_secret"]
+        booking.save(
+            update_fields=[
+                "stripe_payment_intent_id",
+                "stripe_client_secret",
+                "updated_at",
+            ]
         )
-        return payment_intent
+        return booking
 
     @transaction.atomic
     def create(self) -> Booking:
@@ -159,19 +218,20 @@ class BookingService:
         ):
             raise BOOKING_SAME_DAY_BOOKING_ERROR
 
-        # Raise an error if the car is unavailable in the requested time period
-        if Booking.objects.filter(
-            car=self.car,
-            start_date__lt=self.end_date,
-            end_date__gt=self.start_date,
-        ).exists():
-            raise BOOKING_CAR_UNAVAILABLE_TIME_PERIOD_ERROR
-
-        try:
-            user = CustomUser.objects.get(email=self.email)
-        except CustomUser.DoesNotExist:
-            user = CustomUser.objects.create(email=cast(str, self.email))
+        # Compute the price from the car price tiers. A price sent by the client
+        # is only accepted if it matches
+        price_cents = self.price_cents
+        if (
+            self.car is not None
+            and self.start_date is not None
+            and self.end_date is not None
+        ):
+            quote = quote_car(self.car, self.start_date, self.end_date)
+            if price_cents is not None and price_cents != quote.price_cents:
+                raise BOOKING_PRICE_MISMATCH_ERROR
+            price_cents = quote.price_cents
 
+        user = CustomUser.objects.upsert(cast(str, self.email))
         customer_service_data: dict[str, Any] = {
             "user": user,
             "first_name": self.first_name,
@@ -185,31 +245,48 @@ class BookingService:
             "address_line2": self.address_line2,
             "address_state": self.address_state,
         }
-
-        try:
-            customer = Customer.objects.get(user=user)
-            customer_service = CustomerService(
-                **customer_service_data,
-                id=customer.pk,
-            )
-            customer_service.update()
-        except Customer.DoesNotExist:
-            customer_service = CustomerService(**customer_service_data)
-            customer = customer_service.create()
+        customer = CustomerService(**customer_service_data).upsert()
 
         booking = Booking(  # type: ignore
             car=self.car,
             customer=customer,
             start_date=self.start_date,
             end_date=self.end_date,
-            price_cents=self.price_cents,
+            price_cents=price_cents,
         )
-        booking.save()
+        # Raise an error if the car is unavailable in the requested time period.
+        # Overlapping bookings are rejected by an exclusion constraint
+        try:
+            with transaction.atomic():
+                booking.save()
+        except IntegrityError as error:
+            if is_booking_overlap_error(error):
+                raise self.get_car_unavailable_error(booking) from error
+            raise
 
         self.send_confirmation_email(booking)
 
         return booking
 
+    def get_car_unavailable_error(self, booking: Booking) -> ValidationError:
+        """
+        Return the car unavailability error along with the earliest free time
+        periods of the car with the same duration, so that clients can retry
+        """
+
+        free_windows = find_free_windows(
+            [booking.car_id],
+            after=booking.start_date,
+            duration=booking.end_date - booking.start_date,
+            count=BOOKING_ALTERNATIVES_COUNT,
+        )
+        return get_car_unavailable_time_period_error(
+            [
+                {"start_date": start_date.isoformat(), "end_date": end_date.isoformat()}
+                for start_date, end_date in free_windows[booking.car_id]
+            ]
+        )
+
     @transaction.atomic
     def cancel(self, is_staff_origin: bool = False) -> Booking:
         """Cancel a booking"""
@@ -222,8 +299,313 @@ class BookingService:
             BookingStatus.CANCELED_BY_CUSTOMER or BookingStatus.CANCELED_BY_STAFF
         ):
             raise BOOKING_ALREADY_CANCELED_ERROR
+        if booking.status == BookingStatus.EXPIRED:
+            raise BOOKING_EXPIRED_ERROR
 
         booking.mark_as_cancelled(is_staff_origin)
         self.send_cancellation_email(booking)
 
         return booking
+
+
+def get_payment_intent_data(booking: Booking) -> dict[str, Any]:
+    """Return the stored Stripe payment intent of a booking"""
+
+    return {
+        "id": booking.stripe_payment_intent_id,
+        "client_secret": booking.stripe_client_secret,
+        "amount": booking.price_cents,
+        "currency": CURRENCY.lower(),
+    }
+
+
+def create_pending_payment_intents(batch_size: int) -> int:
+    """
+    Create the Stripe payment intents of the unpaid bookings in advance, the
+    oldest first, so that they are ready when customers pay.
+    Returns the number of created payment intents
+    """
+
+    created_count = 0
+    failed_ids: list[int] = []
+    while created_count + len(failed_ids) < batch_size:
+        with transaction.atomic():
+            booking = (
+                Booking.objects.select_for_update(skip_locked=True, of=("self",))
+                .select_related("customer")
+                .filter(status=BookingStatus.UNPAID, stripe_payment_intent_id="")
+                .exclude(pk__in=failed_ids)
+                .order_by("created_at")
+                .first()
+            )
+            if booking is None:
+                break
+            try:
+                with transaction.atomic():
+                    BookingService().attach_payment_intent(booking)
+            except stripe.StripeError as error:
+                logger.warning(
+                    "Could not create the payment intent of booking %s: %s",
+                    booking.pk,
+                    error,
+                )
+                failed_ids.append(booking.pk)
+                continue
+        created_count += 1
+    return created_count
+
+
+def expire_unpaid_bookings(batch_size: int) -> int:
+    """
+    Expire a batch of the bookings left unpaid for longer than the hold TTL,
+    with a single UPDATE ... RETURNING statement skipping the bookings locked
+    by a payment. Their Stripe payment intents are then cancelled and the
+    availability of their cars is invalidated.
+    Returns the number of expired bookings
+    """
+
+    table_name = connection.ops.quote_name(Booking._meta.db_table)
+    now = timezone.now()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table_name}
+            SET status = %(expired)s, updated_at = %(now)s
+            WHERE id IN (
+                SELECT id FROM {table_name}
+                WHERE status = %(unpaid)s AND created_at < %(expires_before)s
+                ORDER BY created_at
+                LIMIT %(batch_size)s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, car_id, stripe_payment_intent_id
+            """,
+            {
+                "expired": BookingStatus.EXPIRED,
+                "unpaid": BookingStatus.UNPAID,
+                "now": now,
+                "expires_before": now - timedelta(seconds=settings.BOOKING_HOLD_TTL),
+                "batch_size": batch_size,
+            },
+        )
+        expired_bookings = cursor.fetchall()
+        for car_id in {car_id for _, car_id, _ in expired_bookings}:
+            get_availability_version(car_id).bump_on_commit()
+
+    for booking_id, _, payment_intent_id in expired_bookings:
+        if not payment_intent_id:
+            continue
+        try:
+            stripe.PaymentIntent.cancel(
+                payment_intent_id, idempotency_key=f"booking-{booking_id}-expiry"
+            )
+        except stripe.StripeError as error:
+            # e.g. the payment succeeded right before the booking expired
+            logger.warning(
+                "Could not cancel the payment intent of expired booking %s: %s",
+                booking_id,
+                error,
+            )
+    return len(expired_bookings)
+
+
+def complete_finished_bookings(batch_size: int) -> int:
+    """
+    Complete a batch of the active bookings whose end date has passed, with a
+    single UPDATE statement skipping the bookings locked by other transactions.
+    Returns the number of completed bookings
+    """
+
+    table_name = connection.ops.quote_name(Booking._meta.db_table)
+    now = timezone.now()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table_name}
+            SET status = %(completed)s, updated_at = %(now)s
+            WHERE id IN (
+                SELECT id FROM {table_name}
+                WHERE status = %(active)s AND end_date < %(now)s
+                ORDER BY end_date
+                LIMIT %(batch_size)s
+                FOR UPDATE SKIP LOCKED
+            )
+            """,
+            {
+                "completed": BookingStatus.COMPLETED,
+                "active": BookingStatus.ACTIVE,
+                "now": now,
+                "batch_size": batch_size,
+            },
+        )
+        return cursor.rowcount
+
+
+def cancel_bookings(queryset: QuerySet[Booking], batch_size: int = 500) -> int:
+    """
+    Cancel bookings on behalf of the staff, with one UPDATE statement per batch.
+    The cancellation emails of a batch are written to the outbox with a single
+    INSERT statement. Completed and released bookings are left untouched.
+    Returns the number of cancelled bookings
+    """
+
+    cancellable_bookings = (
+        queryset.exclude(
+            status__in=[BookingStatus.COMPLETED, *RELEASED_BOOKING_STATUSES]
+        )
+        .select_related("car", "customer__user")
+        .prefetch_related(
+            Prefetch(
+                "car__carmedia_set",
+                queryset=CarMedia.objects.filter(is_thumbnail=True),
+                to_attr="thumbnails",
+            )
+        )
+        .order_by("pk")
+    )
+    count = 0
+    while True:
+        with transaction.atomic():
+            bookings = list(
+                cancellable_bookings.select_for_update(of=("self",))[:batch_size]
+            )
+            if not bookings:
+                return count
+
+            now = timezone.now()
+            Booking.objects.filter(pk__in=[booking.pk for booking in bookings]).update(
+                status=BookingStatus.CANCELED_BY_STAFF, updated_at=now
+            )
+            service = BookingService()
+            for booking in bookings:
+                booking.status = BookingStatus.CANCELED_BY_STAFF
+            EmailService.enqueue_many(
+                service.get_cancellation_email(booking) for booking in bookings
+            )
+            for car_id in {booking.car_id for booking in bookings}:
+                get_availability_version(car_id).bump_on_commit()
+            count += len(bookings)
+
+
+def complete_bookings(queryset: QuerySet[Booking]) -> int:
+    """
+    Complete bookings with a single UPDATE statement. Released bookings are left
+    untouched, as they no longer hold their car. Returns the number of completed
+    bookings
+    """
+
+    return (
+        queryset.exclude(
+            status__in=[BookingStatus.COMPLETED, *RELEASED_BOOKING_STATUSES]
+        )
+        .order_by()
+        .update(status=BookingStatus.COMPLETED, updated_at=timezone.now())
+    )
+
+
+def recover_expired_booking(booking: Booking, payment_intent_id: str) -> bool:
+    """
+    Reactivate an expired booking paid before its payment intent was cancelled,
+    if its time period is still free. Its payment is flagged to be refunded
+    after the commit otherwise, and retried by the refund worker on failure.
+    Returns whether the booking was reactivated
+    """
+
+    booking.status = BookingStatus.ACTIVE
+    booking.updated_at = timezone.now()
+    try:
+        with transaction.atomic():
+            booking.save(update_fields=["status", "updated_at"])
+    except IntegrityError as error:
+        if not is_booking_overlap_error(error):
+            raise
+        booking.status = BookingStatus.EXPIRED
+    else:
+        return True
+
+    logger.error(
+        "Refunding the payment %s of expired booking %s, as its car was booked again",
+        payment_intent_id,
+        booking.pk,
+    )
+    booking.stripe_payment_intent_id = payment_intent_id
+    booking.stripe_refund_pending = True
+    booking.save(
+        update_fields=[
+            "stripe_payment_intent_id",
+            "stripe_refund_pending",
+            "updated_at",
+        ]
+    )
+    transaction.on_commit(partial(refund_booking_after_commit, booking.pk))
+    return False
+
+
+def refund_booking(booking_id: int, skip_locked: bool = False) -> Booking | None:
+    """
+    Refund the Stripe payment of a booking flagged for a refund.
+    The booking row is locked during the refund, so that a payment is never
+    refunded twice at the same time. With skip_locked, None is returned instead
+    of waiting for a running refund
+    """
+
+    with transaction.atomic():
+        booking = (
+            Booking.objects.select_for_update(skip_locked=skip_locked)
+            .filter(pk=booking_id)
+            .first()
+        )
+        if booking is None or not booking.stripe_refund_pending:
+            return booking
+
+        # A retried refund returns the Stripe refund created the first time
+        stripe.Refund.create(
+            payment_intent=booking.stripe_payment_intent_id,
+            idempotency_key=f"booking-{booking.pk}-refund",
+        )
+        booking.stripe_refund_pending = False
+        Booking.objects.filter(pk=booking.pk).update(
+            stripe_refund_pending=False, updated_at=timezone.now()
+        )
+        return booking
+
+
+def refund_booking_after_commit(booking_id: int) -> None:
+    """Refund a booking once flagged, leaving failed refunds to the worker"""
+
+    try:
+        refund_booking(booking_id, skip_locked=True)
+    except stripe.StripeError as error:
+        logger.warning("Could not refund booking %s: %s", booking_id, error)
+
+
+def refund_pending_bookings(batch_size: int) -> int:
+    """
+    Refund the bookings flagged for a refund, the least recently updated
+    first. Returns the number of refunded bookings
+    """
+
+    refunded_count = 0
+    failed_ids: list[int] = []
+    while refunded_count + len(failed_ids) < batch_size:
+        booking_id = (
+            Booking.objects.filter(stripe_refund_pending=True)
+            .exclude(pk__in=failed_ids)
+            .order_by("updated_at")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if booking_id is None:
+            break
+        try:
+            booking = refund_booking(booking_id, skip_locked=True)
+        except stripe.StripeError as error:
+            logger.warning("Could not refund booking %s: %s", booking_id, error)
+            failed_ids.append(booking_id)
+            continue
+        if booking is None:
+            # Being refunded by another worker
+            failed_ids.append(booking_id)
+            continue
+        refunded_count += 1
+    return refunded_count
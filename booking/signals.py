@@ -0,0 +1,19 @@
+from typing import Any
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from car.cache import get_availability_version
+
+from .models import Booking
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def bump_availability_version(instance: Booking, **kwargs: Any) -> None:
+    """
+    Invalidate cached availability responses of the car of a saved or deleted
+    booking. Bookings updated in bulk bump the version of their cars explicitly
+    """
+
+    get_availability_version(instance.car_id).bump_on_commit()
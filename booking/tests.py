@@ -1,26 +1,41 @@
+import csv
+import gzip
+import json
 import random
 import re
 from datetime import datetime, timedelta, timezone
+from io import StringIO
+from unittest.mock import patch
 
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from faker import Faker
 from rest_framework.reverse import reverse
 from rest_framework.status import (
     HTTP_200_OK,
     HTTP_201_CREATED,
+    HTTP_304_NOT_MODIFIED,
     HTTP_400_BAD_REQUEST,
     HTTP_401_UNAUTHORIZED,
     HTTP_403_FORBIDDEN,
 )
 from rest_framework.test import APITestCase
 
-from car.models import Car
-from car.tests import set_up_car
+from car.cache import get_availability_version
+from car.models import Car, CarMedia
+from car.pricing import quote_car
+from car.tests import set_up_car, set_up_car_media_list
 from customer.errors import CUSTOMER_PASSPORT_NUMBER_REQUIRED_ERROR
 from customer.models import Customer
+from customer.services import sync_stripe_customer
 from customer.tests import set_up_customer, set_up_customer_list
+from furai.exports import format_csv_value
 from furai.tests.mocks import enable_stripe_mock
 from furai.tests.utils import TestClientAuthenticator
+from notification.enums import EmailStatus
+from notification.models import OutboxEmail
 from user.models import CustomUser
 
 from .enums import BookingStatus
@@ -30,11 +45,16 @@ from .errors import (
     BOOKING_CAR_UNAVAILABLE_TIME_PERIOD_ERROR,
     BOOKING_END_DATE_BEFORE_START_DATE_ERROR,
     BOOKING_END_DATE_IN_THE_PAST_ERROR,
+    BOOKING_EXPIRED_ERROR,
+    BOOKING_IDEMPOTENCY_KEY_REUSED_ERROR,
     BOOKING_NEGATIVE_PRICE_ERROR,
+    BOOKING_PRICE_MISMATCH_ERROR,
     BOOKING_SAME_DAY_BOOKING_ERROR,
     BOOKING_START_DATE_IN_THE_PAST_ERROR,
 )
-from .models import Booking
+from .events import record_stripe_event
+from .models import Booking, IdempotencyKey, StripeEvent
+from .services import BookingService, cancel_bookings, complete_bookings
 
 fake = Faker()
 
@@ -45,6 +65,22 @@ secure_booking_start_date = fake.future_datetime(tzinfo=timezone.utc) + timedelt
     days=3
 )
 secure_booking_end_date = secure_booking_start_date + timedelta(hours=3)
+# Far enough in the future to never overlap the dates above
+secure_booking_list_start_date = secure_future_date + timedelta(days=60)
+
+
+def get_secure_start_date(days):
+    """
+    Return a start date after the bookings of the booking list, never on the
+    same day of the month as today. Dates are two days apart, and moved to the
+    odd day in between when on the same day of the month as today, so distinct
+    days never return the same date
+    """
+
+    start_date = secure_booking_list_start_date + timedelta(days=20 + days * 2)
+    if start_date.day == datetime.now(timezone.utc).day:
+        start_date += timedelta(days=1)
+    return start_date
 
 
 def set_up_booking(car, customer):
@@ -67,14 +103,16 @@ def set_up_booking_list():
     customer_list = set_up_customer_list()
     booking_list = []
     car_count = Car.objects.count()
-    for customer in customer_list:
+    for index, customer in enumerate(customer_list):
         """Creates a booking for each customer from a random car"""
+        # Bookings of a same car cannot overlap
+        start_date = secure_booking_list_start_date + timedelta(days=index)
         booking = Booking.objects.create(
             car=Car.objects.all()[random.randint(0, car_count - 1)],
             price_cents=fake.pyint(300000, 1000000),
             customer=customer,
-            start_date=secure_future_date,
-            end_date=secure_future_date + timedelta(hours=6),
+            start_date=start_date,
+            end_date=start_date + timedelta(hours=6),
             status=BookingStatus.UNPAID,
         )
         booking_list.append(booking)
@@ -118,11 +156,124 @@ class BookingTestCase(TestCase):
         self.booking.refresh_from_db()
         assert self.booking.status == BookingStatus.COMPLETED
 
+    def test_complete_bookings(self):
+        """Completes the active bookings whose end date has passed, in batches"""
+
+        finished_bookings = [
+            Booking.objects.create(
+                car=self.car,
+                price_cents=fake.pyint(300000, 1000000),
+                customer=self.customer,
+                start_date=secure_past_date - timedelta(days=index + 1),
+                end_date=secure_past_date - timedelta(days=index, hours=12),
+                status=status,
+            )
+            for index, status in enumerate(
+                [BookingStatus.ACTIVE, BookingStatus.ACTIVE, BookingStatus.UNPAID]
+            )
+        ]
+        self.booking.status = BookingStatus.ACTIVE
+        self.booking.save()
+
+        stdout = StringIO()
+        call_command("complete_bookings", "--once", "--batch-size", "1", stdout=stdout)
+        assert "Completed 2 bookings in" in stdout.getvalue()
+        statuses = [
+            Booking.objects.get(pk=booking.pk).status for booking in finished_bookings
+        ]
+        assert statuses == [
+            BookingStatus.COMPLETED,
+            BookingStatus.COMPLETED,
+            BookingStatus.UNPAID,
+        ]
+        self.booking.refresh_from_db()
+        assert self.booking.status == BookingStatus.ACTIVE
+
+    def test_cancel_bookings(self):
+        """Cancels bookings in batches and queues their emails in bulk"""
+
+        booking_list = Booking.objects.exclude(pk=self.booking.pk)
+        booking_list.filter(pk=booking_list[0].pk).update(
+            status=BookingStatus.COMPLETED
+        )
+        cancellable_count = booking_list.count()
+
+        with CaptureQueriesContext(connection) as context:
+            count = cancel_bookings(Booking.objects.all(), batch_size=4)
+        statements = [query["sql"].split(" ", 1)[0] for query in context]
+        # One UPDATE and one emails INSERT per batch
+        batch_count = -(-cancellable_count // 4)
+        assert statements.count("UPDATE") == batch_count
+        assert statements.count("INSERT") == batch_count
+        assert count == cancellable_count
+        assert not Booking.objects.exclude(
+            status__in=[BookingStatus.COMPLETED, BookingStatus.CANCELED_BY_STAFF]
+        ).exists()
+        assert OutboxEmail.objects.count() == count
+        assert OutboxEmail.objects.filter(to=self.customer.user.email).exists()
+
+    def test_complete_selected_bookings(self):
+        """Completes the selected bookings that still hold their car"""
+
+        self.booking.mark_as_cancelled()
+        assert complete_bookings(Booking.objects.all()) == (Booking.objects.count() - 1)
+        self.booking.refresh_from_db()
+        assert self.booking.status == BookingStatus.CANCELED_BY_CUSTOMER
+
+    def test_availability_version(self):
+        """Invalidates the availability of a car when its bookings change"""
+
+        availability_version = get_availability_version(self.car.pk)
+        version = availability_version.get()
+        self.booking.mark_as_cancelled(True)
+        assert availability_version.get() > version
+
+        version = availability_version.get()
+        self.booking.delete()
+        assert availability_version.get() > version
+
     def test_representation_string(self):
         """Returns the instance representation correctly"""
 
         assert self.booking.__str__() == f"{self.customer.name} - {self.car.name}"
 
+    def test_overlapping_booking(self):
+        """Ensures a car cannot be booked twice during the same time period"""
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Booking.objects.create(
+                car=self.car,
+                price_cents=fake.pyint(300000, 1000000),
+                customer=self.customer,
+                start_date=self.booking.start_date + timedelta(hours=1),
+                end_date=self.booking.end_date + timedelta(hours=1),
+            )
+
+    def test_overlapping_cancelled_booking(self):
+        """Ensures a cancelled booking releases the car for its time period"""
+
+        self.booking.mark_as_cancelled()
+        booking = Booking.objects.create(
+            car=self.car,
+            price_cents=fake.pyint(300000, 1000000),
+            customer=self.customer,
+            start_date=self.booking.start_date,
+            end_date=self.booking.end_date,
+        )
+        assert booking.pk is not None
+
+    def test_adjacent_booking(self):
+        """Ensures a car can be booked right after another booking ends"""
+
+        booking = Booking.objects.create(
+            car=self.car,
+            price_cents=fake.pyint(300000, 1000000),
+            customer=self.customer,
+            start_date=self.booking.end_date,
+            end_date=self.booking.end_date + timedelta(hours=3),
+        )
+        assert booking.pk is not None
+
 
 class BookingAPITestCase(APITestCase):
     def setUp(self):
@@ -154,6 +305,74 @@ class BookingAPITestCase(APITestCase):
             assert booking["customer"] == self.customer.id
         TestClientAuthenticator.authenticate_logout(self.client)
 
+    def test_get_booking_list_car_summary(self):
+        """Embeds a summary of the car in the bookings with a constant query count"""
+
+        set_up_car_media_list(self.car)
+        for index in range(3):
+            start_date = get_secure_start_date(index)
+            Booking.objects.create(
+                car=set_up_car(),
+                price_cents=fake.pyint(300000, 1000000),
+                customer=self.customer,
+                start_date=start_date,
+                end_date=start_date + timedelta(hours=6),
+            )
+        TestClientAuthenticator.authenticate(self.client, self.customer.user)
+        url = reverse("bookings-list")
+        # Token authentication, conditional probe, bookings with their car and
+        # car thumbnails
+        with self.assertNumQueries(4):
+            response = self.client.get(url, format="json")
+        assert response.status_code == HTTP_200_OK
+        results = response.data["results"]
+        assert len(results) == 4
+        booking = next(
+            booking for booking in results if booking["id"] == self.booking.pk
+        )
+        assert booking["car_summary"] == {
+            "id": self.car.pk,
+            "name": self.car.name,
+            "make": self.car.make,
+            "model": self.car.model,
+            "thumbnail": self.car.carmedia_set.get(is_thumbnail=True).url,
+        }
+        TestClientAuthenticator.authenticate_logout(self.client)
+
+    def test_get_booking_list_fields(self):
+        """Only serializes the requested fields of the bookings"""
+
+        TestClientAuthenticator.authenticate(self.client, self.customer.user)
+        url = reverse("bookings-list")
+        response = self.client.get(
+            url, data={"fields": "id,status,start_date"}, format="json"
+        )
+        assert response.status_code == HTTP_200_OK
+        for booking in response.data["results"]:
+            assert sorted(booking) == ["id", "start_date", "status"]
+        TestClientAuthenticator.authenticate_logout(self.client)
+
+    def test_get_booking_list_not_modified(self):
+        """Returns a 304 response if the bookings of a customer did not change"""
+
+        TestClientAuthenticator.authenticate(self.client, self.customer.user)
+        url = reverse("bookings-list")
+        response = self.client.get(url, format="json")
+        not_modified_response = self.client.get(
+            url, format="json", HTTP_IF_NONE_MATCH=response.headers["ETag"]
+        )
+        assert not_modified_response.status_code == HTTP_304_NOT_MODIFIED
+        self.booking.mark_as_cancelled()
+        modified_response = self.client.get(
+            url, format="json", HTTP_IF_NONE_MATCH=response.headers["ETag"]
+        )
+        assert modified_response.status_code == HTTP_200_OK
+        assert (
+            modified_response.data["results"][0]["status"]
+            == BookingStatus.CANCELED_BY_CUSTOMER
+        )
+        TestClientAuthenticator.authenticate_logout(self.client)
+
     def test_create_booking_negative_price(self):
         """Return an error error if price is negative"""
 
@@ -185,6 +404,220 @@ class BookingAPITestCase(APITestCase):
             == BOOKING_NEGATIVE_PRICE_ERROR.detail["price_cents"]
         )
 
+    def get_booking_data(self, **data):
+        return {
+            "start_date": secure_booking_start_date,
+            "end_date": secure_booking_end_date,
+            "car": self.car.pk,
+            "email": self.customer.user.email,
+            "first_name": self.customer.first_name,
+            "last_name": self.customer.last_name,
+            "address_line1": self.customer.address_line1,
+            "address_line2": self.customer.address_line2,
+            "address_city": self.customer.address_city,
+            "address_postal_code": self.customer.address_postal_code,
+            "address_state": self.customer.address_state,
+            "address_country": "US",
+            "phone": self.customer.phone,
+            "passport": self.customer.passport,
+            **data,
+        }
+
+    def test_create_booking_price(self):
+        """Computes the price of a booking from the car price tiers"""
+
+        url = reverse("bookings-list")
+        response = self.client.post(url, data=self.get_booking_data(), format="json")
+        assert response.status_code == HTTP_201_CREATED
+        quote = quote_car(self.car, secure_booking_start_date, secure_booking_end_date)
+        assert response.data["price_cents"] == quote.price_cents
+
+    def test_create_booking_confirmation_email(self):
+        """Writes the confirmation email to the outbox along with the booking"""
+
+        url = reverse("bookings-list")
+        response = self.client.post(url, data=self.get_booking_data(), format="json")
+        assert response.status_code == HTTP_201_CREATED
+        email = OutboxEmail.objects.get()
+        assert email.to == self.customer.user.email
+        assert email.status == EmailStatus.PENDING
+
+        # No email is written when the booking is rejected
+        response = self.client.post(url, data=self.get_booking_data(), format="json")
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert OutboxEmail.objects.count() == 1
+
+    def test_confirmation_email_car_thumbnail(self):
+        """Embeds the car thumbnail in the confirmation email with a single query"""
+
+        set_up_car_media_list(self.car)
+        with CaptureQueriesContext(connection) as context:
+            email = BookingService().send_confirmation_email(self.booking)
+        thumbnail = self.car.carmedia_set.get(is_thumbnail=True)
+        assert thumbnail.url in email.html
+        media_table = CarMedia._meta.db_table
+        assert (
+            len([q for q in context.captured_queries if media_table in q["sql"]]) == 1
+        )
+
+    def test_create_payment_intent_stripe_sync(self):
+        """Creates the missing Stripe customer before the payment intent"""
+
+        TestClientAuthenticator.authenticate(self.client, self.customer.user)
+        url = reverse("bookings-create-payment-intent", kwargs={"pk": self.booking.pk})
+        response = self.client.post(url, format="json")
+        assert response.status_code == HTTP_200_OK
+        assert len(self.stripe_mock.create_calls) == 1
+        payment_intent_call = self.stripe_mock.payment_intent_create_calls[0]
+        assert payment_intent_call["customer"] == "cus_123"
+        self.customer.refresh_from_db()
+        assert self.customer.stripe_id == "cus_123"
+        assert not self.customer.stripe_sync_pending
+
+        # The Stripe customer is only created once
+        response = self.client.post(url, format="json")
+        assert response.status_code == HTTP_200_OK
+        assert len(self.stripe_mock.create_calls) == 1
+        TestClientAuthenticator.authenticate_logout(self.client)
+
+    def test_create_booking_repeat_customer(self):
+        """Flags a repeat customer for Stripe only if its Stripe fields changed"""
+
+        url = reverse("bookings-list")
+        response = self.client.post(url, data=self.get_booking_data(), format="json")
+        assert response.status_code == HTTP_201_CREATED
+        sync_stripe_customer(self.customer.pk)
+        self.customer.refresh_from_db()
+        assert not self.customer.stripe_sync_pending
+
+        start_date = get_secure_start_date(0)
+        response = self.client.post(
+            url,
+            data=self.get_booking_data(
+                start_date=start_date, end_date=start_date + timedelta(hours=3)
+            ),
+            format="json",
+        )
+        assert response.status_code == HTTP_201_CREATED
+        assert Customer.objects.filter(user=self.customer.user).count() == 1
+        self.customer.refresh_from_db()
+        assert not self.customer.stripe_sync_pending
+
+        start_date = get_secure_start_date(1)
+        phone = fake.phone_number()
+        response = self.client.post(
+            url,
+            data=self.get_booking_data(
+                start_date=start_date,
+                end_date=start_date + timedelta(hours=3),
+                phone=phone,
+            ),
+            format="json",
+        )
+        assert response.status_code == HTTP_201_CREATED
+        self.customer.refresh_from_db()
+        assert self.customer.phone == phone
+        assert self.customer.stripe_sync_pending
+
+    def test_create_payment_intent_stored(self):
+        """Stores the payment intent of a booking and returns it on later calls"""
+
+        TestClientAuthenticator.authenticate(self.client, self.customer.user)
+        url = reverse("bookings-create-payment-intent", kwargs={"pk": self.booking.pk})
+        response = self.client.post(url, format="json")
+        assert response.status_code == HTTP_200_OK
+        assert response.data["id"] == "pi_123"
+        assert response.data["client_secret"] == "pi_123_secret_123"
+        assert response.data["amount"] == self.booking.price_cents
+        payment_intent_call = self.stripe_mock.payment_intent_create_calls[0]
+        assert payment_intent_call["idempotency_key"] == (
+            f"booking-{self.booking.pk}-payment-intent"
+        )
+        self.booking.refresh_from_db()
+        assert self.booking.stripe_payment_intent_id == "pi_123"
+
+        response = self.client.post(url, format="json")
+        assert response.status_code == HTTP_200_OK
+        assert response.data["client_secret"] == "pi_123_secret_123"
+        assert len(self.stripe_mock.payment_intent_create_calls) == 1
+        TestClientAuthenticator.authenticate_logout(self.client)
+
+    def test_create_payment_intents_worker(self):
+        """Creates the payment intents of the unpaid bookings in advance"""
+
+        self.booking_list[0].mark_as_cancelled()
+        call_command("create_payment_intents", "--once", stdout=StringIO())
+        self.booking.refresh_from_db()
+        assert self.booking.stripe_payment_intent_id == "pi_123"
+        assert not Booking.objects.filter(
+            pk=self.booking_list[0].pk, stripe_payment_intent_id="pi_123"
+        ).exists()
+        payment_intent_count = len(self.stripe_mock.payment_intent_create_calls)
+        assert payment_intent_count == len(self.booking_list)
+
+        TestClientAuthenticator.authenticate(self.client, self.customer.user)
+        url = reverse("bookings-create-payment-intent", kwargs={"pk": self.booking.pk})
+        response = self.client.post(url, format="json")
+        assert response.status_code == HTTP_200_OK
+        assert response.data["client_secret"] == "pi_123_secret_123"
+        assert len(self.stripe_mock.payment_intent_create_calls) == payment_intent_count
+        TestClientAuthenticator.authenticate_logout(self.client)
+
+    def test_create_booking_matching_price(self):
+        """Accepts a client price matching the quote"""
+
+        quote = quote_car(self.car, secure_booking_start_date, secure_booking_end_date)
+        url = reverse("bookings-list")
+        response = self.client.post(
+            url,
+            data=self.get_booking_data(price_cents=quote.price_cents),
+            format="json",
+        )
+        assert response.status_code == HTTP_201_CREATED
+
+    def test_create_booking_price_mismatch(self):
+        """Return an error if the client price does not match the quote"""
+
+        quote = quote_car(self.car, secure_booking_start_date, secure_booking_end_date)
+        url = reverse("bookings-list")
+        response = self.client.post(
+            url,
+            data=self.get_booking_data(price_cents=quote.price_cents - 1),
+            format="json",
+        )
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert (
+            response.data["price_cents"]
+            == BOOKING_PRICE_MISMATCH_ERROR.detail["price_cents"]
+        )
+
+    def test_create_booking_car_not_available_alternatives(self):
+        """Suggests free time periods of the car when it is unavailable"""
+
+        Booking.objects.create(
+            car=self.car,
+            customer=self.customer,
+            start_date=secure_booking_start_date,
+            end_date=secure_booking_end_date,
+            price_cents=fake.pyint(300000, 1000000),
+        )
+        url = reverse("bookings-list")
+        response = self.client.post(url, data=self.get_booking_data(), format="json")
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert (
+            response.data["car"]
+            == BOOKING_CAR_UNAVAILABLE_TIME_PERIOD_ERROR.detail["car"]
+        )
+        alternatives = response.data["alternatives"]
+        assert len(alternatives) > 0
+        alternative_start_date = datetime.fromisoformat(alternatives[0]["start_date"])
+        alternative_end_date = datetime.fromisoformat(alternatives[0]["end_date"])
+        assert alternative_start_date == secure_booking_end_date
+        assert (
+            alternative_end_date - alternative_start_date
+            == secure_booking_end_date - secure_booking_start_date
+        )
+
     def test_create_booking_start_date_same_day(self):
         """Return an error error if start date is current day"""
 
@@ -197,7 +630,6 @@ class BookingAPITestCase(APITestCase):
                 ).isoformat(),
                 "end_date": secure_booking_end_date,
                 "car": self.car.pk,
-                "price_cents": fake.pyint(300000, 1000000),
                 "email": self.customer.user.email,
                 "first_name": self.customer.first_name,
                 "last_name": self.customer.last_name,
@@ -228,7 +660,6 @@ class BookingAPITestCase(APITestCase):
                 "start_date": secure_past_date,
                 "end_date": secure_booking_end_date,
                 "car": self.car.pk,
-                "price_cents": fake.pyint(300000, 1000000),
                 "email": self.customer.user.email,
                 "first_name": self.customer.first_name,
                 "last_name": self.customer.last_name,
@@ -259,7 +690,6 @@ class BookingAPITestCase(APITestCase):
                 "start_date": secure_booking_start_date,
                 "end_date": secure_past_date,
                 "car": self.car.pk,
-                "price_cents": fake.pyint(300000, 1000000),
                 "email": self.customer.user.email,
                 "first_name": self.customer.first_name,
                 "last_name": self.customer.last_name,
@@ -290,7 +720,6 @@ class BookingAPITestCase(APITestCase):
                 "start_date": secure_booking_start_date,
                 "end_date": secure_booking_start_date - timedelta(hours=6),
                 "car": self.car.pk,
-                "price_cents": fake.pyint(300000, 1000000),
                 "email": self.customer.user.email,
                 "first_name": self.customer.first_name,
                 "last_name": self.customer.last_name,
@@ -311,6 +740,35 @@ class BookingAPITestCase(APITestCase):
             == BOOKING_END_DATE_BEFORE_START_DATE_ERROR.detail["end_date"]
         )
 
+    def test_create_booking_too_long(self):
+        """Return an error if the booking is longer than the maximum duration"""
+
+        url = reverse("bookings-list")
+        with self.settings(BOOKING_MAX_DURATION=24 * 60 * 60):
+            response = self.client.post(
+                url,
+                data={
+                    "start_date": secure_booking_start_date,
+                    "end_date": secure_booking_start_date + timedelta(hours=25),
+                    "car": self.car.pk,
+                    "email": self.customer.user.email,
+                    "first_name": self.customer.first_name,
+                    "last_name": self.customer.last_name,
+                    "address_line1": self.customer.address_line1,
+                    "address_city": self.customer.address_city,
+                    "address_postal_code": self.customer.address_postal_code,
+                    "address_country": "US",
+                    "phone": self.customer.phone,
+                    "passport": self.customer.passport,
+                },
+                format="json",
+            )
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert "period" in response.data
+        assert not Booking.objects.filter(
+            start_date=secure_booking_start_date, car=self.car
+        ).exists()
+
     def test_create_booking_required_passport(self):
         """Return an error error if customer is a foreign national and passport number is empty"""
 
@@ -321,7 +779,6 @@ class BookingAPITestCase(APITestCase):
                 "start_date": secure_booking_start_date,
                 "end_date": secure_booking_end_date,
                 "car": self.car.pk,
-                "price_cents": fake.pyint(300000, 1000000),
                 "email": self.customer.user.email,
                 "first_name": self.customer.first_name,
                 "last_name": self.customer.last_name,
@@ -351,7 +808,6 @@ class BookingAPITestCase(APITestCase):
                 "start_date": secure_booking_start_date,
                 "end_date": secure_booking_end_date,
                 "car": self.car.pk,
-                "price_cents": fake.pyint(300000, 1000000),
                 "email": self.customer.user.email,
                 "first_name": self.customer.first_name,
                 "last_name": self.customer.last_name,
@@ -385,7 +841,6 @@ class BookingAPITestCase(APITestCase):
                 "start_date": secure_booking_start_date,
                 "end_date": secure_booking_end_date,
                 "car": self.car.pk,
-                "price_cents": fake.pyint(300000, 1000000),
                 "email": email,
                 "first_name": first_name,
                 "last_name": last_name,
@@ -416,7 +871,6 @@ class BookingAPITestCase(APITestCase):
                 "start_date": secure_booking_start_date,
                 "end_date": secure_booking_end_date,
                 "car": self.car.pk,
-                "price_cents": fake.pyint(300000, 1000000),
                 "email": email,
                 "first_name": first_name,
                 "last_name": last_name,
@@ -452,7 +906,6 @@ class BookingAPITestCase(APITestCase):
                 "start_date": secure_booking_start_date,
                 "end_date": secure_booking_end_date,
                 "car": self.car.pk,
-                "price_cents": fake.pyint(300000, 1000000),
                 "email": self.customer.user.email,
                 "first_name": self.customer.first_name,
                 "last_name": self.customer.last_name,
@@ -482,7 +935,6 @@ class BookingAPITestCase(APITestCase):
             "start_date": secure_booking_start_date,
             "end_date": secure_booking_end_date,
             "car": self.car.pk,
-            "price_cents": fake.pyint(300000, 1000000),
             "email": self.customer.user.email,
             "first_name": self.customer.first_name,
             "last_name": self.customer.last_name,
@@ -500,7 +952,7 @@ class BookingAPITestCase(APITestCase):
             customer=self.customer,
             start_date=secure_booking_start_date,
             end_date=secure_booking_end_date,
-            price_cents=base_data.get("price_cents"),
+            price_cents=fake.pyint(300000, 1000000),
         )
 
         url = reverse("bookings-list")
@@ -600,3 +1052,574 @@ class BookingAPITestCase(APITestCase):
         assert response.status_code == HTTP_200_OK
         assert response.data["status"] == BookingStatus.CANCELED_BY_CUSTOMER
         TestClientAuthenticator.authenticate_logout(self.client)
+
+    def test_create_booking_idempotency_key(self):
+        """Replays the response of a booking request retried with the same key"""
+
+        url = reverse("bookings-list")
+        data = self.get_booking_data()
+        response = self.client.post(
+            url, data=data, format="json", headers={"Idempotency-Key": "key-1"}
+        )
+        assert response.status_code == HTTP_201_CREATED
+        assert "Idempotent-Replayed" not in response.headers
+        booking_count = Booking.objects.count()
+
+        replayed_response = self.client.post(
+            url, data=data, format="json", headers={"Idempotency-Key": "key-1"}
+        )
+        assert replayed_response.status_code == HTTP_201_CREATED
+        assert replayed_response.headers["Idempotent-Replayed"] == "true"
+        assert replayed_response.json() == response.json()
+        assert Booking.objects.count() == booking_count
+        assert OutboxEmail.objects.count() == 1
+
+    def test_create_booking_idempotency_key_reused(self):
+        """Return an error if an idempotency key is reused by another request"""
+
+        url = reverse("bookings-list")
+        response = self.client.post(
+            url,
+            data=self.get_booking_data(),
+            format="json",
+            headers={"Idempotency-Key": "key-1"},
+        )
+        assert response.status_code == HTTP_201_CREATED
+
+        start_date = get_secure_start_date(0)
+        response = self.client.post(
+            url,
+            data=self.get_booking_data(
+                start_date=start_date, end_date=start_date + timedelta(hours=3)
+            ),
+            format="json",
+            headers={"Idempotency-Key": "key-1"},
+        )
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert (
+            response.data["idempotency_key"]
+            == BOOKING_IDEMPOTENCY_KEY_REUSED_ERROR.detail["idempotency_key"]
+        )
+
+    def test_create_booking_idempotency_key_distinct_clients(self):
+        """Scopes the idempotency keys of anonymous clients to their email address"""
+
+        url = reverse("bookings-list")
+        response = self.client.post(
+            url,
+            data=self.get_booking_data(),
+            format="json",
+            headers={"Idempotency-Key": "key-1"},
+        )
+        assert response.status_code == HTTP_201_CREATED
+
+        other_customer = set_up_customer()
+        start_date = get_secure_start_date(0)
+        other_response = self.client.post(
+            url,
+            data=self.get_booking_data(
+                email=other_customer.user.email,
+                start_date=start_date,
+                end_date=start_date + timedelta(hours=3),
+            ),
+            format="json",
+            headers={"Idempotency-Key": "key-1"},
+        )
+        assert other_response.status_code == HTTP_201_CREATED
+        assert "Idempotent-Replayed" not in other_response.headers
+        assert other_response.data["id"] != response.data["id"]
+        assert IdempotencyKey.objects.filter(key="key-1").count() == 2
+
+    def test_create_booking_idempotency_key_error(self):
+        """Runs the request again when the first request raised an error"""
+
+        url = reverse("bookings-list")
+        data = self.get_booking_data()
+        with patch.object(
+            BookingService, "create", side_effect=BOOKING_PRICE_MISMATCH_ERROR
+        ):
+            response = self.client.post(
+                url, data=data, format="json", headers={"Idempotency-Key": "key-1"}
+            )
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert not IdempotencyKey.objects.exists()
+
+        response = self.client.post(
+            url, data=data, format="json", headers={"Idempotency-Key": "key-1"}
+        )
+        assert response.status_code == HTTP_201_CREATED
+
+    def test_create_booking_idempotency_key_expired(self):
+        """Runs the request again once its idempotency key expired"""
+
+        url = reverse("bookings-list")
+        data = self.get_booking_data()
+        response = self.client.post(
+            url, data=data, format="json", headers={"Idempotency-Key": "key-1"}
+        )
+        assert response.status_code == HTTP_201_CREATED
+        IdempotencyKey.objects.update(expires_at=datetime.now(timezone.utc))
+
+        # The booking exists, so the request now fails
+        response = self.client.post(
+            url, data=data, format="json", headers={"Idempotency-Key": "key-1"}
+        )
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert "Idempotent-Replayed" not in response.headers
+
+    def test_cancel_booking_idempotency_key(self):
+        """Replays the response of a cancellation retried with the same key"""
+
+        TestClientAuthenticator.authenticate(self.client, self.booking.customer.user)
+        url = reverse("bookings-cancel", kwargs={"pk": self.booking.id})
+        for _ in range(2):
+            response = self.client.post(
+                url, format="json", headers={"Idempotency-Key": "key-1"}
+            )
+            assert response.status_code == HTTP_200_OK
+            assert response.data["status"] == BookingStatus.CANCELED_BY_CUSTOMER
+        assert response.headers["Idempotent-Replayed"] == "true"
+        assert OutboxEmail.objects.count() == 1
+        TestClientAuthenticator.authenticate_logout(self.client)
+
+    def test_create_payment_intent_idempotency_key(self):
+        """Does not call Stripe when a payment intent request is replayed"""
+
+        TestClientAuthenticator.authenticate(self.client, self.customer.user)
+        url = reverse("bookings-create-payment-intent", kwargs={"pk": self.booking.pk})
+        for _ in range(2):
+            response = self.client.post(
+                url, format="json", headers={"Idempotency-Key": "key-1"}
+            )
+            assert response.status_code == HTTP_200_OK
+            assert response.data["client_secret"] == "pi_123_secret_123"
+        assert len(self.stripe_mock.payment_intent_create_calls) == 1
+        TestClientAuthenticator.authenticate_logout(self.client)
+
+
+def get_stripe_event(booking, type, id=None, created=None):
+    """Build a Stripe payment intent event about a booking"""
+
+    return {
+        "id": id or f"evt_{fake.uuid4()}",
+        "type": type,
+        "created": created or int(datetime.now(timezone.utc).timestamp()),
+        "data": {
+            "object": {
+                "id": "pi_123",
+                "object": "payment_intent",
+                "metadata": {"booking_id": str(booking.pk)},
+            }
+        },
+    }
+
+
+class StripeWebhookTestCase(APITestCase):
+    def setUp(self):
+        enable_stripe_mock(self)
+        self.car = set_up_car()
+        self.customer = set_up_customer()
+        self.booking = set_up_booking(self.car, self.customer)
+        patcher = patch(
+            "furai.views.stripe.Webhook.construct_event",
+            lambda payload, sig_header, secret: json.loads(payload),
+        )
+        self.addCleanup(patcher.stop)
+        patcher.start()
+
+    def post_event(self, event):
+        url = reverse("webhook")
+        return self.client.post(
+            url, data=event, format="json", headers={"Stripe-Signature": "t=1,v1=x"}
+        )
+
+    def process_events(self):
+        call_command("process_stripe_events", "--once", stdout=StringIO())
+
+    def test_webhook_records_event(self):
+        """Records an event without applying it"""
+
+        event = get_stripe_event(self.booking, "payment_intent.succeeded")
+        response = self.post_event(event)
+        assert response.status_code == HTTP_200_OK
+        stripe_event = StripeEvent.objects.get()
+        assert stripe_event.event_id == event["id"]
+        assert stripe_event.booking_id == self.booking.pk
+        assert stripe_event.processed_at is None
+        self.booking.refresh_from_db()
+        assert self.booking.status == BookingStatus.UNPAID
+
+    def test_webhook_duplicate_event(self):
+        """Applies an event retried by Stripe only once"""
+
+        event = get_stripe_event(self.booking, "payment_intent.succeeded")
+        for _ in range(2):
+            response = self.post_event(event)
+            assert response.status_code == HTTP_200_OK
+        assert StripeEvent.objects.count() == 1
+
+        self.process_events()
+        self.booking.refresh_from_db()
+        assert self.booking.status == BookingStatus.ACTIVE
+        assert OutboxEmail.objects.count() == 1
+        assert not StripeEvent.objects.pending().exists()
+
+        # A retry received after the event was applied is ignored too
+        self.post_event(event)
+        self.process_events()
+        assert OutboxEmail.objects.count() == 1
+
+    def test_process_events_booking_order(self):
+        """Applies the events of a booking in the order Stripe created them"""
+
+        created = int(datetime.now(timezone.utc).timestamp())
+        # The cancellation is received before the earlier payment
+        self.post_event(
+            get_stripe_event(
+                self.booking, "payment_intent.canceled", created=created + 10
+            )
+        )
+        self.post_event(
+            get_stripe_event(self.booking, "payment_intent.succeeded", created=created)
+        )
+        other_booking = set_up_booking_list()[0]
+        self.post_event(get_stripe_event(other_booking, "payment_intent.succeeded"))
+
+        self.process_events()
+        assert not Booking.objects.filter(pk=self.booking.pk).exists()
+        other_booking.refresh_from_db()
+        assert other_booking.status == BookingStatus.ACTIVE
+        assert OutboxEmail.objects.count() == 1
+        assert not StripeEvent.objects.pending().exists()
+
+    def test_process_events_unknown_booking(self):
+        """Marks the events of unknown bookings as processed"""
+
+        event = get_stripe_event(self.booking, "payment_intent.succeeded")
+        event["data"]["object"]["metadata"] = {}
+        self.post_event(event)
+        self.process_events()
+        assert StripeEvent.objects.get().processed_at is not None
+        self.booking.refresh_from_db()
+        assert self.booking.status == BookingStatus.UNPAID
+
+
+class PaymentReconciliationTestCase(TestCase):
+    def setUp(self):
+        enable_stripe_mock(self)
+        set_up_car()
+        self.booking_list = set_up_booking_list()
+        now = int(datetime.now(timezone.utc).timestamp())
+        stripe_mock = self.stripe_mock
+        self.succeeded_intent = stripe_mock.add_payment_intent(
+            self.booking_list[0].pk, "succeeded", now - 60
+        )
+        stripe_mock.add_payment_intent(self.booking_list[1].pk, "canceled", now - 50)
+        stripe_mock.add_payment_intent(self.booking_list[1].pk, "canceled", now - 45)
+        self.booking_list[2].status = BookingStatus.ACTIVE
+        self.booking_list[2].save()
+        stripe_mock.add_payment_intent(self.booking_list[2].pk, "succeeded", now - 40)
+        stripe_mock.add_payment_intent(None, "succeeded", now - 30)
+        stripe_mock.add_payment_intent(999999999, "succeeded", now - 20)
+        # Created before the reconciled time period
+        stripe_mock.add_payment_intent(
+            self.booking_list[3].pk, "succeeded", now - 30 * 24 * 60 * 60
+        )
+
+    def reconcile_payments(self, *args):
+        stdout = StringIO()
+        with patch("booking.reconciliation.STRIPE_LIST_LIMIT", 2):
+            call_command("reconcile_payments", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_reconcile_payments(self):
+        """Activates the unpaid bookings whose payment succeeded"""
+
+        output = self.reconcile_payments()
+        booking = Booking.objects.get(pk=self.booking_list[0].pk)
+        assert booking.status == BookingStatus.ACTIVE
+        assert booking.stripe_payment_intent_id == self.succeeded_intent["id"]
+        assert Booking.objects.get(pk=self.booking_list[1].pk).status == (
+            BookingStatus.UNPAID
+        )
+        assert Booking.objects.get(pk=self.booking_list[3].pk).status == (
+            BookingStatus.UNPAID
+        )
+        assert OutboxEmail.objects.count() == 1
+        # The 6 payment intents of the time period are listed 2 per page
+        assert self.stripe_mock.payment_intent_list_calls == 3
+        assert "Payment intents: 6" in output
+        assert "Unknown bookings: 2" in output
+        assert f"succeeded payment: 1 [{self.booking_list[0].pk}]" in output
+        assert f"canceled payment: 1 [{self.booking_list[1].pk}]" in output
+
+        # Reconciled bookings do not drift anymore
+        output = self.reconcile_payments()
+        assert "succeeded payment: 0" in output
+        assert OutboxEmail.objects.count() == 1
+
+    def test_reconcile_payments_released_booking(self):
+        """Reports the expired or cancelled bookings whose payment succeeded"""
+
+        expired_booking = self.booking_list[4]
+        expired_booking.status = BookingStatus.EXPIRED
+        expired_booking.save()
+        self.stripe_mock.add_payment_intent(
+            expired_booking.pk,
+            "succeeded",
+            int(datetime.now(timezone.utc).timestamp()) - 10,
+        )
+
+        output = self.reconcile_payments()
+        assert (
+            "Expired or cancelled bookings with a succeeded payment: "
+            f"1 [{expired_booking.pk}]"
+        ) in output
+        expired_booking.refresh_from_db()
+        assert expired_booking.status == BookingStatus.EXPIRED
+
+    def test_reconcile_payments_dry_run(self):
+        """Reports the drift without updating the bookings"""
+
+        output = self.reconcile_payments("--dry-run", "--since", "2000-01-01")
+        assert "Found 3 drifted bookings" in output
+        assert (
+            not Booking.objects.filter(status=BookingStatus.ACTIVE)
+            .exclude(pk=self.booking_list[2].pk)
+            .exists()
+        )
+        assert not OutboxEmail.objects.exists()
+
+
+class BookingExpiryTestCase(APITestCase):
+    def setUp(self):
+        enable_stripe_mock(self)
+        self.car = set_up_car()
+        self.customer = set_up_customer()
+        self.booking = set_up_booking(self.car, self.customer)
+        self.booking.stripe_payment_intent_id = "pi_123"
+        self.booking.save()
+        self.booking_list = set_up_booking_list()
+        # Only the first booking is held for longer than the hold TTL
+        Booking.objects.filter(pk=self.booking.pk).update(
+            created_at=datetime.now(timezone.utc) - timedelta(hours=1)
+        )
+
+    def expire_bookings(self):
+        call_command("expire_bookings", "--once", stdout=StringIO())
+
+    def test_expire_bookings(self):
+        """Expires the stale unpaid bookings and cancels their payment intents"""
+
+        self.expire_bookings()
+        self.booking.refresh_from_db()
+        assert self.booking.status == BookingStatus.EXPIRED
+        assert not Booking.objects.filter(
+            pk__in=[booking.pk for booking in self.booking_list],
+            status=BookingStatus.EXPIRED,
+        ).exists()
+        assert self.stripe_mock.payment_intent_cancel_calls == [
+            ("pi_123", {"idempotency_key": f"booking-{self.booking.pk}-expiry"})
+        ]
+
+        # The car is available again during the expired booking
+        Booking.objects.create(
+            car=self.car,
+            price_cents=self.booking.price_cents,
+            customer=self.customer,
+            start_date=self.booking.start_date,
+            end_date=self.booking.end_date,
+            status=BookingStatus.UNPAID,
+        )
+
+    def test_expire_bookings_stripe_error(self):
+        """Expires the bookings even when their payment intents cannot be cancelled"""
+
+        self.stripe_mock.fail = True
+        self.expire_bookings()
+        self.booking.refresh_from_db()
+        assert self.booking.status == BookingStatus.EXPIRED
+
+    def test_create_payment_intent_expired_booking(self):
+        """Does not create a payment intent for an expired booking"""
+
+        self.expire_bookings()
+        TestClientAuthenticator.authenticate(self.client, self.customer.user)
+        url = reverse("bookings-create-payment-intent", kwargs={"pk": self.booking.pk})
+        response = self.client.post(url, format="json")
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert response.data == BOOKING_EXPIRED_ERROR.detail
+        TestClientAuthenticator.authenticate_logout(self.client)
+
+    def test_process_succeeded_event_expired_booking(self):
+        """Reactivates an expired booking paid while its car is still free"""
+
+        self.expire_bookings()
+        record_stripe_event(get_stripe_event(self.booking, "payment_intent.succeeded"))
+        call_command("process_stripe_events", "--once", stdout=StringIO())
+        self.booking.refresh_from_db()
+        assert self.booking.status == BookingStatus.ACTIVE
+        assert OutboxEmail.objects.filter(to=self.customer.user.email).exists()
+        assert not self.stripe_mock.refund_create_calls
+
+    def test_process_succeeded_event_expired_booking_rebooked(self):
+        """Refunds an expired booking paid after its car was booked again"""
+
+        self.expire_bookings()
+        Booking.objects.create(
+            car=self.car,
+            price_cents=self.booking.price_cents,
+            customer=set_up_customer(),
+            start_date=self.booking.start_date,
+            end_date=self.booking.end_date,
+            status=BookingStatus.ACTIVE,
+        )
+        record_stripe_event(get_stripe_event(self.booking, "payment_intent.succeeded"))
+        with (
+            self.assertLogs("booking.services", level="ERROR"),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            call_command("process_stripe_events", "--once", stdout=StringIO())
+        self.booking.refresh_from_db()
+        assert self.booking.status == BookingStatus.EXPIRED
+        assert not self.booking.stripe_refund_pending
+        assert self.stripe_mock.refund_create_calls == [
+            {
+                "payment_intent": "pi_123",
+                "idempotency_key": f"booking-{self.booking.pk}-refund",
+            }
+        ]
+        assert not OutboxEmail.objects.exists()
+        assert StripeEvent.objects.get().processed_at is not None
+
+    def test_refund_bookings_stripe_error(self):
+        """Retries the refunds failing after the Stripe event is processed"""
+
+        self.expire_bookings()
+        Booking.objects.create(
+            car=self.car,
+            price_cents=self.booking.price_cents,
+            customer=set_up_customer(),
+            start_date=self.booking.start_date,
+            end_date=self.booking.end_date,
+            status=BookingStatus.ACTIVE,
+        )
+        record_stripe_event(get_stripe_event(self.booking, "payment_intent.succeeded"))
+        self.stripe_mock.fail = True
+        with (
+            self.assertLogs("booking.services", level="WARNING"),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            call_command("process_stripe_events", "--once", stdout=StringIO())
+        self.booking.refresh_from_db()
+        assert self.booking.stripe_refund_pending
+        assert StripeEvent.objects.get().processed_at is not None
+
+        with self.assertLogs("booking.services", level="WARNING"):
+            call_command("refund_bookings", "--once", stdout=StringIO())
+        self.booking.refresh_from_db()
+        assert self.booking.stripe_refund_pending
+
+        self.stripe_mock.fail = False
+        call_command("refund_bookings", "--once", stdout=StringIO())
+        self.booking.refresh_from_db()
+        assert not self.booking.stripe_refund_pending
+        assert len(self.stripe_mock.refund_create_calls) == 1
+
+    def test_process_canceled_event_expired_booking(self):
+        """Keeps an expired booking when its payment intent cancellation arrives"""
+
+        self.expire_bookings()
+        record_stripe_event(get_stripe_event(self.booking, "payment_intent.canceled"))
+        call_command("process_stripe_events", "--once", stdout=StringIO())
+        self.booking.refresh_from_db()
+        assert self.booking.status == BookingStatus.EXPIRED
+
+
+class BookingExportTestCase(APITestCase):
+    def setUp(self):
+        enable_stripe_mock(self)
+        self.car = set_up_car()
+        self.customer = set_up_customer()
+        self.booking = set_up_booking(self.car, self.customer)
+        self.booking_list = set_up_booking_list()
+        self.staff_user = CustomUser.objects.create_user(
+            email=fake.email(), password=fake.password(), is_staff=True
+        )
+
+        TestClientAuthenticator.authenticate(self.client, self.staff_user)
+        self.addCleanup(TestClientAuthenticator.authenticate_logout, self.client)
+
+    def export(self, **query):
+        return self.client.get(reverse("bookings-export"), query)
+
+    def test_export_bookings_csv(self):
+        """Streams the bookings matching the filters as a CSV file"""
+
+        self.booking.status = BookingStatus.ACTIVE
+        self.booking.save()
+        response = self.export(
+            status=BookingStatus.ACTIVE,
+            car=self.car.pk,
+            start=(self.booking.start_date - timedelta(days=1)).isoformat(),
+            end=(self.booking.start_date + timedelta(days=1)).isoformat(),
+        )
+        assert response.status_code == HTTP_200_OK
+        assert response["Content-Type"] == "text/csv"
+        assert 'filename="bookings.csv"' in response["Content-Disposition"]
+        rows = list(csv.DictReader(StringIO(response.getvalue().decode())))
+        assert len(rows) == 1
+        assert rows[0]["id"] == str(self.booking.pk)
+        assert rows[0]["customer_email"] == self.customer.user.email
+        assert rows[0]["start_date"] == self.booking.start_date.isoformat()
+
+    def test_export_bookings_csv_formulas(self):
+        """Escapes the CSV cells read as formulas by spreadsheets"""
+
+        formula = '=HYPERLINK("https://example.com","Invoice")'
+        self.customer.first_name = formula
+        self.customer.last_name = "-1+2"
+        self.customer.save()
+        response = self.export(car=self.car.pk)
+        rows = list(csv.DictReader(StringIO(response.getvalue().decode())))
+        assert rows[0]["customer_first_name"] == f"'{formula}"
+        assert rows[0]["customer_last_name"] == "'-1+2"
+        assert format_csv_value("\t1250") == "'\t1250"
+
+        for value in ("+66 81 234 5678", "-1250", "+1 (555) 010-0199"):
+            self.customer.last_name = value
+            self.customer.save()
+            response = self.export(car=self.car.pk)
+            rows = list(csv.DictReader(StringIO(response.getvalue().decode())))
+            assert rows[0]["customer_last_name"] == value
+
+        response = self.export(output="ndjson", car=self.car.pk)
+        row = json.loads(response.getvalue().decode().splitlines()[0])
+        assert row["customer_first_name"] == formula
+
+    def test_export_bookings_ndjson_gzip(self):
+        """Streams every booking as a gzip compressed NDJSON file"""
+
+        response = self.export(output="ndjson", gzip="true")
+        assert response.status_code == HTTP_200_OK
+        assert response["Content-Type"] == "application/gzip"
+        assert 'filename="bookings.ndjson.gz"' in response["Content-Disposition"]
+        lines = gzip.decompress(response.getvalue()).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        assert [row["id"] for row in rows] == sorted(
+            Booking.objects.values_list("pk", flat=True)
+        )
+        assert rows[0]["status"] == BookingStatus.UNPAID
+
+    def test_export_bookings_invalid_filters(self):
+        """Rejects unknown output formats and filter values"""
+
+        for query in [{"output": "xml"}, {"status": "UNKNOWN"}, {"car": "car"}]:
+            assert self.export(**query).status_code == HTTP_400_BAD_REQUEST
+
+    def test_export_bookings_not_authorized(self):
+        """Prevent exporting the bookings if the user is not staff"""
+
+        TestClientAuthenticator.authenticate(self.client, self.customer.user)
+        response = self.export()
+        assert response.status_code == HTTP_403_FORBIDDEN
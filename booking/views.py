@@ -1,25 +1,40 @@
+from datetime import datetime
 from typing import Any, cast
 
+from django.db.models import Prefetch
 from django.db.models.query import QuerySet
+from django.http.response import HttpResponseBase
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
 from rest_framework.mixins import CreateModelMixin, ListModelMixin
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST
 from rest_framework.viewsets import GenericViewSet
 
-from customer.models import Customer
+from car.cache import catalog_version
+from car.models import CarMedia
+from furai.conditional import ConditionalGetMixin, make_etag
+from furai.exports import export_queryset, parse_export_options
+from furai.fieldsets import SparseFieldsetMixin
 from user.models import CustomUser
 
+from .exports import BOOKING_EXPORT_COLUMNS, filter_export_bookings
+from .idempotency import idempotent
 from .models import Booking
 from .permissions import IsBookingOwner
 from .serializers import BookingSerializer
 from .services import BookingService
 
 
-class BookingViewSet(CreateModelMixin, ListModelMixin, GenericViewSet):
+class BookingViewSet(
+    SparseFieldsetMixin,
+    ConditionalGetMixin,
+    CreateModelMixin,
+    ListModelMixin,
+    GenericViewSet,
+):
     """
     List all bookings related to a customer or create Bookings
     """
@@ -31,23 +46,45 @@ class BookingViewSet(CreateModelMixin, ListModelMixin, GenericViewSet):
             CustomUser,
             self.request.user,
         )
-        customer = get_object_or_404(Customer, user=user.pk)
-        queryset = Booking.objects.filter(customer=customer).order_by("-created_at")
+        # Served by the (customer, created_at) index through the customer join
+        queryset = Booking.objects.filter(customer__user=user.pk).order_by(
+            "-created_at"
+        )
+        if self.includes_field("car_summary"):
+            queryset = queryset.select_related("car").prefetch_related(
+                Prefetch(
+                    "car__carmedia_set",
+                    queryset=CarMedia.objects.filter(is_thumbnail=True),
+                    to_attr="thumbnails",
+                )
+            )
         return queryset
 
+    def get_conditional_validators(
+        self, request: Request, queryset: QuerySet | None = None
+    ) -> tuple[str | None, datetime | None]:
+        etag, last_modified = super().get_conditional_validators(request, queryset)
+        # The embedded car summaries change with the car catalog
+        return make_etag(request, etag, catalog_version.get()), last_modified
+
     def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """List all bookings related to a customer"""
 
         self.permission_classes = [IsAuthenticated]
         self.check_permissions(request)
-        queryset = self.get_queryset()
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
 
+        def get_response() -> Response:
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
+
+        return self.get_conditional_response(request, get_response)
+
+    @idempotent
     def create(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """Create a booking. Automatically creates user and/or customer"""
 
@@ -81,7 +118,21 @@ class BookingViewSet(CreateModelMixin, ListModelMixin, GenericViewSet):
             )
         return Response(serializer.errors, status=HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, permission_classes=[IsAdminUser])
+    def export(self, request: Request, *args: Any, **kwargs: Any) -> HttpResponseBase:
+        """
+        Stream the bookings as a CSV or NDJSON file, optionally gzip compressed,
+        filtered by status, car and start date period. Staff only
+        """
+
+        output, compress = parse_export_options(request.query_params)
+        queryset = filter_export_bookings(Booking.objects.all(), request.query_params)
+        return export_queryset(
+            queryset, BOOKING_EXPORT_COLUMNS, "bookings", output, compress
+        )
+
     @action(detail=True, methods=["post"])
+    @idempotent
     def create_payment_intent(
         self, request: Request, *args: Any, **kwargs: Any
     ) -> Response:
@@ -98,6 +149,7 @@ class BookingViewSet(CreateModelMixin, ListModelMixin, GenericViewSet):
         return Response(payment_intent, status=HTTP_200_OK)
 
     @action(detail=True, methods=["post"])
+    @idempotent
     def cancel(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """Cancel a booking"""
 
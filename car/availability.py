@@ -0,0 +1,258 @@
+import base64
+import math
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from datetime import date, datetime, time, timedelta
+from functools import reduce
+from operator import or_
+from typing import Any
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from booking.enums import RELEASED_BOOKING_STATUSES
+from booking.models import Booking
+
+from .enums import CarDayAvailability
+from .models import Car
+
+
+def get_availability_matrix(
+    car_ids: Sequence[int], periods: Sequence[tuple[datetime, datetime]]
+) -> list[list[bool]]:
+    """
+    Return whether each car (rows) is available during each time period (columns),
+    from a single query on the bookings overlapping one of the periods
+    """
+
+    booked_periods: dict[int, list[tuple[datetime, datetime]]] = defaultdict(list)
+    if car_ids and periods:
+        overlaps = reduce(
+            or_,
+            (
+                Q(start_date__lt=end_date, end_date__gt=start_date)
+                for start_date, end_date in periods
+            ),
+        )
+        bookings = (
+            Booking.objects.blocking()
+            .filter(overlaps, car_id__in=car_ids)
+            .values_list("car_id", "start_date", "end_date")
+        )
+        for car_id, start_date, end_date in bookings:
+            booked_periods[car_id].append((start_date, end_date))
+
+    return [
+        [
+            not any(
+                booked_start_date < end_date and booked_end_date > start_date
+                for booked_start_date, booked_end_date in booked_periods[car_id]
+            )
+            for start_date, end_date in periods
+        ]
+        for car_id in car_ids
+    ]
+
+
+def merge_intervals(
+    intervals: Iterable[tuple[datetime, datetime]],
+) -> list[tuple[datetime, datetime]]:
+    """Merge overlapping or adjacent time intervals"""
+
+    merged: list[tuple[datetime, datetime]] = []
+    for start_date, end_date in sorted(intervals):
+        if merged and start_date <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end_date))
+        else:
+            merged.append((start_date, end_date))
+    return merged
+
+
+def get_booked_intervals(
+    car_id: int, start_date: datetime, end_date: datetime
+) -> list[tuple[datetime, datetime]]:
+    """
+    Return the merged time intervals during which a car is booked within a time
+    period, from a single range query on the bookings of the car
+    """
+
+    bookings = (
+        Booking.objects.overlapping(start_date, end_date)
+        .filter(car_id=car_id)
+        .values_list("start_date", "end_date")
+    )
+    return merge_intervals(
+        (max(booked_start_date, start_date), min(booked_end_date, end_date))
+        for booked_start_date, booked_end_date in bookings
+    )
+
+
+def encode_hourly_bitmap(
+    intervals: Iterable[tuple[datetime, datetime]],
+    start_date: datetime,
+    end_date: datetime,
+) -> str:
+    """
+    Encode in base64 a bitmap with one bit per hour of a time period, most
+    significant bit first. A bit is set when its hour is at least partly booked
+    """
+
+    hour = timedelta(hours=1)
+    bitmap = bytearray(math.ceil(math.ceil((end_date - start_date) / hour) / 8))
+    for interval_start_date, interval_end_date in intervals:
+        first_hour = math.floor((interval_start_date - start_date) / hour)
+        last_hour = math.ceil((interval_end_date - start_date) / hour)
+        for hour_index in range(first_hour, last_hour):
+            bitmap[hour_index // 8] |= 0x80 >> (hour_index % 8)
+    return base64.b64encode(bytes(bitmap)).decode()
+
+
+def find_free_windows(
+    car_ids: Sequence[int] | None,
+    after: datetime,
+    duration: timedelta,
+    count: int,
+) -> dict[int, list[tuple[datetime, datetime]]]:
+    """
+    Return the earliest free time windows of a duration starting after a date,
+    up to count windows per car, for the given cars or every car.
+
+    The gaps between the bookings of each car are found with LEAD() over the
+    bookings ordered by start date. A booking of zero duration at the search
+    start is added for each car, so that the gap before its first booking counts.
+    Consecutive windows are generated inside each gap with generate_series
+    """
+
+    car_filter = "" if car_ids is None else "AND car_id = ANY(%(car_ids)s)"
+    sentinel_filter = "" if car_ids is None else "WHERE id = ANY(%(car_ids)s)"
+    query = f"""
+        WITH periods AS (
+            SELECT car_id, GREATEST(start_date, %(after)s) AS start_date, end_date
+            FROM {Booking._meta.db_table}
+            WHERE end_date > %(after)s
+                AND NOT status = ANY(%(released_statuses)s)
+                {car_filter}
+            UNION ALL
+            SELECT id, %(after)s, %(after)s
+            FROM {Car._meta.db_table}
+            {sentinel_filter}
+        ),
+        gaps AS (
+            SELECT
+                car_id,
+                end_date AS gap_start,
+                LEAD(start_date) OVER (
+                    PARTITION BY car_id ORDER BY start_date, end_date
+                ) AS gap_end
+            FROM periods
+        ),
+        windows AS (
+            SELECT
+                car_id,
+                gap_start + window_index * %(duration)s AS window_start,
+                ROW_NUMBER() OVER (
+                    PARTITION BY car_id ORDER BY gap_start, window_index
+                ) AS window_rank
+            FROM gaps
+            CROSS JOIN generate_series(0, %(count)s - 1) AS window_index
+            WHERE gap_end IS NULL
+                OR gap_start + (window_index + 1) * %(duration)s <= gap_end
+        )
+        SELECT car_id, window_start
+        FROM windows
+        WHERE window_rank <= %(count)s
+        ORDER BY car_id, window_start
+    """
+    params: dict[str, Any] = {
+        "after": after,
+        "duration": duration,
+        "count": count,
+        "car_ids": list(car_ids or []),
+        "released_statuses": list(RELEASED_BOOKING_STATUSES),
+    }
+
+    free_windows: dict[int, list[tuple[datetime, datetime]]] = defaultdict(list)
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        for car_id, window_start in cursor.fetchall():
+            free_windows[car_id].append((window_start, window_start + duration))
+    return free_windows
+
+
+def get_fleet_availability(
+    car_ids: Sequence[int], start_date: date, days: int
+) -> dict[int, list[CarDayAvailability]]:
+    """
+    Return the availability of each car for each day of a date range, from a
+    single query joining the days generated with generate_series to the bookings
+    """
+
+    if not car_ids:
+        return {}
+
+    query = f"""
+        WITH days AS (
+            SELECT generate_series(
+                %(start)s::timestamptz,
+                %(start)s::timestamptz + (%(days)s - 1) * INTERVAL '1 day',
+                INTERVAL '1 day'
+            ) AS day_start
+        )
+        SELECT
+            car.id,
+            days.day_start,
+            COALESCE(
+                SUM(
+                    EXTRACT(
+                        EPOCH FROM LEAST(
+                            booking.end_date, days.day_start + INTERVAL '1 day'
+                        ) - GREATEST(booking.start_date, days.day_start)
+                    )
+                ) FILTER (WHERE booking.id IS NOT NULL),
+                0
+            ) AS booked_seconds
+        FROM {Car._meta.db_table} AS car
+        CROSS JOIN days
+        LEFT JOIN {Booking._meta.db_table} AS booking
+            ON booking.car_id = car.id
+            AND NOT booking.status = ANY(%(released_statuses)s)
+            AND booking.start_date < days.day_start + INTERVAL '1 day'
+            AND booking.end_date > days.day_start
+        WHERE car.id = ANY(%(car_ids)s)
+        GROUP BY car.id, days.day_start
+        ORDER BY car.id, days.day_start
+    """
+    params: dict[str, Any] = {
+        "start": timezone.make_aware(datetime.combine(start_date, time.min)),
+        "days": days,
+        "car_ids": list(car_ids),
+        "released_statuses": list(RELEASED_BOOKING_STATUSES),
+    }
+
+    day_seconds = timedelta(days=1).total_seconds()
+    availability: dict[int, list[CarDayAvailability]] = defaultdict(list)
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        for car_id, day_start, booked_seconds in cursor.fetchall():
+            # Bookings of a car cannot overlap, so their durations add up
+            if booked_seconds <= 0:
+                day_availability = CarDayAvailability.FREE
+            elif booked_seconds < day_seconds:
+                day_availability = CarDayAvailability.PARTIAL
+            else:
+                day_availability = CarDayAvailability.BOOKED
+            availability[car_id].append(day_availability)
+    return availability
+
+
+def encode_run_lengths(values: Iterable[str]) -> str:
+    """Encode a sequence of one character values as runs, e.g. FFFB is 3F1B"""
+
+    runs: list[list[Any]] = []
+    for value in values:
+        if runs and runs[-1][1] == value:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, value])
+    return "".join(f"{length}{value}" for length, value in runs)
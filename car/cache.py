@@ -0,0 +1,107 @@
+import hashlib
+from collections.abc import Callable
+from datetime import datetime
+from functools import cache, partial
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db.models.query import QuerySet
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK
+
+from furai.cache import (
+    MISS,
+    CacheBackend,
+    SingleFlight,
+    VersionCounter,
+    get_cache_backend,
+)
+from furai.conditional import ConditionalGetMixin, make_etag
+
+# Version of the car catalog (cars, medias and features), bumped on every write
+catalog_version = VersionCounter(
+    "car:catalog:version", alias=settings.CAR_CATALOG_CACHE.get("ALIAS", "default")
+)
+
+catalog_single_flight = SingleFlight()
+
+
+def get_availability_version(car_id: int | str) -> VersionCounter:
+    """Return the version of the bookings of a car, bumped when they change"""
+
+    return VersionCounter(
+        f"car:{car_id}:availability:version",
+        alias=settings.CAR_CATALOG_CACHE.get("ALIAS", "default"),
+    )
+
+
+@cache
+def get_catalog_cache() -> CacheBackend:
+    """Return the cache backend storing catalog responses"""
+
+    return get_cache_backend(settings.CAR_CATALOG_CACHE)
+
+
+def get_catalog_cache_key(request: Request, version: int) -> str:
+    """Build the cache key of a catalog response from the request URL"""
+
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    url = request.build_absolute_uri(request.path)
+    digest = hashlib.md5(f"{url}?{query}".encode()).hexdigest()
+    return f"car:catalog:{version}:{digest}"
+
+
+class CatalogCacheMixin(ConditionalGetMixin):
+    """
+    Cache catalog responses until the catalog version changes.
+    The catalog version is also used to answer conditional requests
+    """
+
+    # Query params making the response depend on other data than the catalog
+    catalog_cache_bypass_params: tuple[str, ...] = ()
+
+    def get_cache_version(self) -> VersionCounter:
+        """Return the version of the data the cached responses depend on"""
+
+        return catalog_version
+
+    def bypasses_catalog_cache(self, request: Request) -> bool:
+        return any(
+            param in request.query_params for param in self.catalog_cache_bypass_params
+        )
+
+    def get_conditional_validators(
+        self, request: Request, queryset: QuerySet | None = None
+    ) -> tuple[str | None, datetime | None]:
+        return make_etag(request, "catalog", self.get_cache_version().get()), None
+
+    def get_cached_response(
+        self, request: Request, get_response: Callable[[], Response]
+    ) -> Response:
+        """Return a 304 response, the cached response data or compute and cache it"""
+
+        if self.bypasses_catalog_cache(request):
+            return get_response()
+        return self.get_conditional_response(
+            request, partial(self.get_catalog_response, request, get_response)
+        )
+
+    def get_catalog_response(
+        self, request: Request, get_response: Callable[[], Response]
+    ) -> Response:
+        key = get_catalog_cache_key(request, self.get_cache_version().get())
+        catalog_cache = get_catalog_cache()
+        data = catalog_cache.get(key)
+        if data is not MISS:
+            return Response(data, status=HTTP_200_OK)
+
+        def compute() -> Response:
+            response = get_response()
+            if response.status_code == HTTP_200_OK:
+                catalog_cache.set(key, response.data)
+            return response
+
+        # Only one request computes a missing response, the others reuse it
+        response: Response = catalog_single_flight.do(key, compute)
+        return Response(response.data, status=response.status_code)
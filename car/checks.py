@@ -0,0 +1,32 @@
+from typing import Any
+
+from django.conf import settings
+from django.core.checks import CheckMessage, Error, Tags, register
+
+# Cache backends storing their entries in the memory of each process
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches)
+def check_version_cache(app_configs: Any, **kwargs: Any) -> list[CheckMessage]:
+    """
+    Ensure the catalog and availability versions are shared between processes,
+    as a version bumped in a single process would leave the others serving
+    stale responses
+    """
+
+    alias = settings.CAR_CATALOG_CACHE.get("ALIAS", "default")
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    return [
+        Error(
+            f"The {alias} cache stores the car catalog and availability versions "
+            "and must be shared between processes",
+            hint="Use the database, Redis or Memcached cache backend",
+            id="car.E001",
+        )
+    ]
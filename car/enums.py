@@ -45,3 +45,9 @@ class CarFeatures(models.TextChoices):
     POWERED_WINDOWS = "POWERED_WINDOWS"
     REAR_CAMERA = "REAR_CAMERA"
     USB_PORTS = "USB_PORTS"
+
+
+class CarDayAvailability(models.TextChoices):
+    FREE = "F"
+    PARTIAL = "P"
+    BOOKED = "B"
@@ -13,3 +13,22 @@ CAR_MEDIA_MULTIPLE_THUMBNAIL_ERROR = exceptions.ValidationError(
     detail={"is_thumbnail": "Cannot assign multiple thumbnails for one car"},
     code=str(status.HTTP_400_BAD_REQUEST),
 )
+
+CAR_INVALID_EXPAND_ERROR = exceptions.ValidationError(
+    detail={
+        "expand": "Invalid expanded field. Available options are: thumbnail, medias, feature_names"
+    },
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
+
+CAR_INVALID_FILTER_ERROR = exceptions.ValidationError(
+    detail={
+        "filters": "Invalid filter value. Choice filters accept comma separated options and range filters accept integers"
+    },
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
+
+CAR_CALENDAR_PERIOD_TOO_LONG_ERROR = exceptions.ValidationError(
+    detail={"period": "The period of a calendar cannot be longer than 366 days"},
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
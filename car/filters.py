@@ -0,0 +1,126 @@
+from django.db.models import Count, Exists, OuterRef, Q
+from django.db.models.query import QuerySet
+from django.http import QueryDict
+
+from .enums import CarDrivetrain, CarFeatures, CarFuelType, CarMake, CarTransmission
+from .errors import CAR_INVALID_FILTER_ERROR
+from .models import Car
+
+# Fields filtered with one or more comma separated choices, also used as facets
+CAR_CHOICE_FILTERS: dict[str, list[str]] = {
+    "make": CarMake.values,
+    "transmission": CarTransmission.values,
+    "drivetrain": CarDrivetrain.values,
+    "fuel_type": CarFuelType.values,
+}
+
+# Fields filtered with __gte and __lte bounds
+CAR_RANGE_FILTERS = (
+    "capacity",
+    "price_hourly_cents",
+    "price_three_hours_cents",
+    "price_six_hours_cents",
+    "price_nine_hours_cents",
+    "price_twenty_four_hours_cents",
+)
+
+
+def parse_choices(value: str, choices: list[str]) -> list[str]:
+    values = value.split(",")
+    if not set(values).issubset(choices):
+        raise CAR_INVALID_FILTER_ERROR
+    return values
+
+
+def get_car_filters(query_params: QueryDict) -> dict[str, Q]:
+    """Return the conditions of the car filters from the query params, by filter"""
+
+    filters: dict[str, Q] = {}
+    for field_name, choices in CAR_CHOICE_FILTERS.items():
+        value = query_params.get(field_name)
+        if value:
+            filters[field_name] = Q(
+                **{f"{field_name}__in": parse_choices(value, choices)}
+            )
+
+    for field_name in CAR_RANGE_FILTERS:
+        for lookup in ("gte", "lte"):
+            value = query_params.get(f"{field_name}__{lookup}")
+            if value is None:
+                continue
+            try:
+                bound = int(value)
+            except ValueError as error:
+                raise CAR_INVALID_FILTER_ERROR from error
+            filters[f"{field_name}__{lookup}"] = Q(**{f"{field_name}__{lookup}": bound})
+
+    features = query_params.get("features__all")
+    if features:
+        # Semi-join against the links of each requested feature
+        filters["features"] = Q(
+            *[
+                Exists(
+                    Car.features.through.objects.filter(
+                        car_id=OuterRef("pk"), carfeature__name=feature_name
+                    )
+                )
+                for feature_name in set(parse_choices(features, CarFeatures.values))
+            ]
+        )
+    return filters
+
+
+def filter_cars(queryset: QuerySet[Car], query_params: QueryDict) -> QuerySet[Car]:
+    """Filter cars from the query params"""
+
+    for condition in get_car_filters(query_params).values():
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def get_car_facets(
+    queryset: QuerySet[Car], query_params: QueryDict
+) -> dict[str, dict[str, int]]:
+    """
+    Count the cars matching each choice of the facet fields and each feature,
+    with a single aggregate query using FILTER clauses. The choices of a field
+    are counted with every filter except the one of the field, so that other
+    choices can be added to the selection. The features are combined with AND,
+    so they are counted with every filter
+    """
+
+    filters = get_car_filters(query_params)
+    facets: dict[str, tuple[str, str]] = {}
+    aggregates = {}
+    for field_name, choices in CAR_CHOICE_FILTERS.items():
+        other_filters = [
+            condition for name, condition in filters.items() if name != field_name
+        ]
+        for choice in choices:
+            alias = f"facet_{len(facets)}"
+            facets[alias] = (field_name, choice)
+            aggregates[alias] = Count(
+                "pk", filter=Q(*other_filters, **{field_name: choice})
+            )
+    for feature_name in CarFeatures.values:
+        alias = f"facet_{len(facets)}"
+        facets[alias] = ("features", feature_name)
+        aggregates[alias] = Count(
+            "pk",
+            filter=Q(
+                Exists(
+                    Car.features.through.objects.filter(
+                        car_id=OuterRef("pk"), carfeature__name=feature_name
+                    )
+                ),
+                *filters.values(),
+            ),
+        )
+
+    counts = queryset.aggregate(**aggregates)
+    facet_counts: dict[str, dict[str, int]] = {
+        field_name: {} for field_name in [*CAR_CHOICE_FILTERS, "features"]
+    }
+    for alias, (field_name, choice) in facets.items():
+        facet_counts[field_name][choice] = counts[alias]
+    return facet_counts
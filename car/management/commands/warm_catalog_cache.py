@@ -0,0 +1,69 @@
+from typing import Any
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.urls import resolve, reverse
+from rest_framework.test import APIRequestFactory
+
+from car.models import Car
+
+
+class Command(BaseCommand):
+    help = "Warm the car catalog response cache, e.g. after a deployment"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--host",
+            required=True,
+            help="The host the API is served from, part of the cache keys",
+        )
+        parser.add_argument(
+            "--scheme",
+            required=True,
+            choices=["http", "https"],
+            help="The scheme the API is served with, part of the cache keys",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if settings.CAR_CATALOG_CACHE["BACKEND"] == "lru":
+            raise CommandError(
+                "The lru catalog cache is local to each process and would be lost "
+                "when this command exits, set CAR_CATALOG_CACHE_BACKEND=django"
+            )
+
+        self.factory = APIRequestFactory()
+        self.host = options["host"]
+        self.secure = options["scheme"] == "https"
+        self.count = 0
+
+        self.warm_pages(reverse("cars-list"))
+        self.warm_pages(reverse("car-features-list"))
+        self.warm_pages(reverse("car-medias-list"))
+        for car_id in Car.objects.values_list("pk", flat=True).iterator():
+            self.warm(reverse("cars-detail", kwargs={"pk": car_id}))
+            self.warm_pages(reverse("car-medias-list", query={"car": car_id}))
+            self.warm_pages(
+                reverse(
+                    "car-medias-list", query={"car": car_id, "is_thumbnail": "true"}
+                )
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Warmed {self.count} responses"))
+
+    def warm(self, url: str) -> Any:
+        """Request a catalog endpoint and return the response data"""
+
+        request = self.factory.get(url, secure=self.secure, HTTP_HOST=self.host)
+        match = resolve(urlsplit(url).path)
+        response = match.func(request, *match.args, **match.kwargs)
+        self.count += 1
+        return response.data
+
+    def warm_pages(self, url: str) -> None:
+        """Request every page of a catalog list endpoint"""
+
+        data = self.warm(url)
+        while data.get("next"):
+            next_url = urlsplit(data["next"])
+            data = self.warm(f"{next_url.path}?{next_url.query}")
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-17 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car', '0011_remove_car_price_twelve_hours_cents_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['price_twenty_four_hours_cents', 'id'], name='car_price_24h_id_idx'),
+        ),
+    ]
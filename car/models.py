@@ -135,6 +135,15 @@ class Car(BaseModel):
     )
     features = models.ManyToManyField(CarFeature, blank=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the car list
+            models.Index(
+                fields=["price_twenty_four_hours_cents", "id"],
+                name="car_price_24h_id_idx",
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
@@ -0,0 +1,123 @@
+import math
+import threading
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from .models import Car
+
+# Price tiers of a car as (hours, price in cents) pairs
+PriceTiers = tuple[tuple[int, int], ...]
+
+# Car fields storing the price of each tier
+PRICE_FIELDS = (
+    "price_hourly_cents",
+    "price_three_hours_cents",
+    "price_six_hours_cents",
+    "price_nine_hours_cents",
+    "price_twenty_four_hours_cents",
+)
+
+
+@dataclass(frozen=True)
+class Quote:
+    """Cheapest price of a rental and the tiers it is made of"""
+
+    hours: int
+    price_cents: int
+    # Number of times each tier is used, by tier hours
+    tiers: dict[int, int]
+
+
+class PricingTable:
+    """
+    Cheapest price of every hour count for a set of price tiers, computed with a
+    dynamic program and extended on demand. A tier can be longer than the hours
+    left to cover, as a long tier is often cheaper than several short ones
+    """
+
+    def __init__(self, tiers: PriceTiers) -> None:
+        self.tiers = tiers
+        self._prices = [0]
+        self._choices = [0]
+        self._lock = threading.Lock()
+
+    def extend(self, hours: int) -> None:
+        if hours < len(self._prices):
+            return
+        with self._lock:
+            for hour_count in range(len(self._prices), hours + 1):
+                price, tier_hours = min(
+                    (self._prices[max(hour_count - tier_hours, 0)] + price, tier_hours)
+                    for tier_hours, price in self.tiers
+                )
+                self._prices.append(price)
+                self._choices.append(tier_hours)
+
+    def get_price(self, hours: int) -> int:
+        self.extend(hours)
+        return self._prices[hours]
+
+    def quote(self, hours: int) -> Quote:
+        self.extend(hours)
+        tiers: dict[int, int] = {}
+        hour_count = hours
+        while hour_count > 0:
+            tier_hours = self._choices[hour_count]
+            tiers[tier_hours] = tiers.get(tier_hours, 0) + 1
+            hour_count = max(hour_count - tier_hours, 0)
+        return Quote(hours=hours, price_cents=self._prices[hours], tiers=tiers)
+
+
+def get_price_tiers(car: Car) -> PriceTiers:
+    return (
+        (1, car.price_hourly_cents),
+        (3, car.price_three_hours_cents),
+        (6, car.price_six_hours_cents),
+        (9, car.price_nine_hours_cents),
+        (24, car.price_twenty_four_hours_cents),
+    )
+
+
+@lru_cache(maxsize=1024)
+def get_pricing_table(tiers: PriceTiers) -> PricingTable:
+    """
+    Return the pricing table of a set of price tiers. Tables are keyed by the
+    prices themselves, so updating the prices of a car uses a new table
+    """
+
+    return PricingTable(tiers)
+
+
+def get_rental_hours(start_date: datetime, end_date: datetime) -> int:
+    """Return the number of hours billed for a rental, started hours included"""
+
+    return max(math.ceil((end_date - start_date) / timedelta(hours=1)), 1)
+
+
+def quote_car(car: Car, start_date: datetime, end_date: datetime) -> Quote:
+    """Return the cheapest price to rent a car during a time period"""
+
+    table = get_pricing_table(get_price_tiers(car))
+    return table.quote(get_rental_hours(start_date, end_date))
+
+
+def get_price_matrix(
+    cars: Iterable[Car], periods: Sequence[tuple[datetime, datetime]]
+) -> list[list[int]]:
+    """
+    Return the cheapest price of each car (rows) for each time period (columns).
+    The pricing table of a car is extended once to the longest period, so every
+    price of its row is a table lookup
+    """
+
+    hours_list = [
+        get_rental_hours(start_date, end_date) for start_date, end_date in periods
+    ]
+    matrix = []
+    for car in cars:
+        table = get_pricing_table(get_price_tiers(car))
+        table.extend(max(hours_list, default=0))
+        matrix.append([table.get_price(hours) for hours in hours_list])
+    return matrix
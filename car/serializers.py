@@ -1,23 +1,172 @@
+from typing import Any
+
 from rest_framework import serializers
 
+from furai.errors import PERIOD_END_BEFORE_START_ERROR
+from furai.fieldsets import SparseFieldsetSerializerMixin
+from furai.utils import check_booking_duration
+
 from .models import Car, CarFeature, CarMedia
 
 
-class CarSerializer(serializers.ModelSerializer):
+class CarMediaSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = CarMedia
+        fields = "__all__"
+
+
+def get_car_thumbnail(car: Car) -> str | None:
+    """
+    Return the URL of the car thumbnail, from the thumbnails prefetched in the
+    thumbnails attribute when available
+    """
+
+    if hasattr(car, "thumbnails"):
+        thumbnails = car.thumbnails
+    else:
+        thumbnails = CarMedia.objects.filter(car=car, is_thumbnail=True)[:1]
+    return thumbnails[0].url if thumbnails else None
+
+
+class CarSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     name = serializers.ReadOnlyField()
+    thumbnail = serializers.SerializerMethodField()
+    medias = CarMediaSerializer(many=True, read_only=True, source="carmedia_set")
+    feature_names = serializers.SerializerMethodField()
+
+    # Fields only included when requested with the expand query param
+    expandable_fields = ("thumbnail", "medias", "feature_names")
+    field_sources = {
+        "name": ("make", "model"),
+        "thumbnail": (),
+        "medias": (),
+        "feature_names": (),
+    }
 
     class Meta:
         model = Car
         fields = "__all__"
 
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        expand = self.context.get("expand", ())
+        for field_name in self.expandable_fields:
+            if field_name not in expand:
+                self.fields.pop(field_name, None)
+
+    def get_thumbnail(self, obj: Car) -> str | None:
+        """Return the URL of the car thumbnail"""
+
+        return get_car_thumbnail(obj)
+
+    def get_feature_names(self, obj: Car) -> list[str]:
+        """Return the names of the car features"""
+
+        return [car_feature.name for car_feature in obj.features.all()]
+
+
+class CarSummarySerializer(serializers.ModelSerializer):
+    """Summary of a car embedded in the representation of other objects"""
+
+    name = serializers.ReadOnlyField()
+    thumbnail = serializers.SerializerMethodField()
 
-class CarMediaSerializer(serializers.ModelSerializer):
     class Meta:
-        model = CarMedia
-        fields = "__all__"
+        model = Car
+        fields = ["id", "name", "make", "model", "thumbnail"]
+
+    def get_thumbnail(self, obj: Car) -> str | None:
+        """Return the URL of the car thumbnail"""
+
+        return get_car_thumbnail(obj)
 
 
-class CarFeatureSerializer(serializers.ModelSerializer):
+class CarFeatureSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = CarFeature
         fields = "__all__"
+
+
+class CarQuoteTierSerializer(serializers.Serializer):
+    hours = serializers.IntegerField()
+    count = serializers.IntegerField()
+
+
+class CarQuoteSerializer(serializers.Serializer):
+    car = serializers.IntegerField()
+    start_date = serializers.DateTimeField()
+    end_date = serializers.DateTimeField()
+    hours = serializers.IntegerField()
+    price_cents = serializers.IntegerField()
+    tiers = CarQuoteTierSerializer(many=True)
+
+
+class CarQuoteWindowSerializer(serializers.Serializer):
+    start_date = serializers.DateTimeField()
+    end_date = serializers.DateTimeField()
+
+    def validate(self, attrs: dict[str, Any]) -> dict[str, Any]:
+        if attrs["end_date"] <= attrs["start_date"]:
+            raise PERIOD_END_BEFORE_START_ERROR
+        check_booking_duration(attrs["start_date"], attrs["end_date"])
+        return attrs
+
+
+class CarQuoteMatrixRequestSerializer(serializers.Serializer):
+    windows = serializers.ListField(
+        child=CarQuoteWindowSerializer(), allow_empty=False, max_length=50
+    )
+    cars = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
+
+
+class CarQuoteMatrixSerializer(serializers.Serializer):
+    cars = serializers.ListField(child=serializers.IntegerField())
+    windows = CarQuoteWindowSerializer(many=True)
+    # Rows are cars and columns are windows
+    prices = serializers.ListField(
+        child=serializers.ListField(child=serializers.IntegerField())
+    )
+    available = serializers.ListField(
+        child=serializers.ListField(child=serializers.BooleanField())
+    )
+
+
+class CarCalendarIntervalSerializer(serializers.Serializer):
+    start_date = serializers.DateTimeField()
+    end_date = serializers.DateTimeField()
+
+
+class CarCalendarSerializer(serializers.Serializer):
+    car = serializers.IntegerField()
+    start_date = serializers.DateTimeField()
+    end_date = serializers.DateTimeField()
+    intervals = CarCalendarIntervalSerializer(many=True)
+    # One bit per hour from the start date, set when the hour is booked
+    bitmap = serializers.CharField(allow_null=True)
+
+
+class CarFreeWindowQuerySerializer(serializers.Serializer):
+    after = serializers.DateTimeField(required=False)
+    hours = serializers.IntegerField(min_value=1, max_value=24 * 30)
+    count = serializers.IntegerField(min_value=1, max_value=20, default=3)
+
+
+class CarFreeWindowsSerializer(serializers.Serializer):
+    car = serializers.IntegerField()
+    windows = CarCalendarIntervalSerializer(many=True)
+
+
+class CarAvailabilityMatrixQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    days = serializers.IntegerField(min_value=1, max_value=366, default=60)
+
+
+class CarAvailabilityMatrixSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    days = serializers.IntegerField()
+    cars = serializers.ListField(child=serializers.IntegerField())
+    # Run-length encoded availability of each car per day, e.g. 3F1P2B for 3 free
+    # days, 1 partially booked day then 2 booked days
+    rows = serializers.ListField(child=serializers.CharField())
@@ -1,7 +1,9 @@
 from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django.utils.text import slugify
 
+from .cache import catalog_version
 from .enums import CarFeatures
 from .errors import CAR_FEATURE_INVALID_NAME_ERROR, CAR_MEDIA_MULTIPLE_THUMBNAIL_ERROR
 from .models import Car, CarFeature, CarMedia
@@ -110,8 +112,11 @@ class CarService:
                 price_six_hours_cents=self.price_six_hours_cents,
                 price_nine_hours_cents=self.price_nine_hours_cents,
                 price_twenty_four_hours_cents=self.price_twenty_four_hours_cents,
+                updated_at=timezone.now(),
             )
         )
+        # Queryset updates do not send the post_save signal
+        catalog_version.bump_on_commit()
 
         return car
 
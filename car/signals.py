@@ -0,0 +1,20 @@
+from typing import Any
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import catalog_version
+from .models import Car, CarFeature, CarMedia
+
+
+@receiver(post_save, sender=Car)
+@receiver(post_save, sender=CarFeature)
+@receiver(post_save, sender=CarMedia)
+@receiver(post_delete, sender=Car)
+@receiver(post_delete, sender=CarFeature)
+@receiver(post_delete, sender=CarMedia)
+@receiver(m2m_changed, sender=Car.features.through)
+def bump_catalog_version(**kwargs: Any) -> None:
+    """Invalidate cached catalog responses when a car, media or feature changes"""
+
+    catalog_version.bump_on_commit()
@@ -1,14 +1,49 @@
-from django.db import IntegrityError
+import base64
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import slugify
 from faker import Faker
 from rest_framework.exceptions import ValidationError
-from rest_framework.status import HTTP_200_OK, HTTP_404_NOT_FOUND
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_304_NOT_MODIFIED,
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+)
 from rest_framework.test import APITestCase
 
+from booking.enums import BookingStatus
+from booking.models import Booking
+from booking.services import BookingService
+from customer.tests import set_up_customer
+from furai.cache import MISS, LRUCacheBackend, SingleFlight
+from furai.errors import (
+    FIELDSET_INVALID_FIELD_ERROR,
+    PAGINATION_INVALID_CURSOR_ERROR,
+    PERIOD_END_BEFORE_START_ERROR,
+    PERIOD_INCOMPLETE_ERROR,
+)
+from furai.tests.mocks import enable_stripe_mock
+
+from .cache import get_catalog_cache
+from .checks import check_version_cache
 from .enums import CarDrivetrain, CarFeatures, CarFuelType, CarMake, CarTransmission
+from .errors import (
+    CAR_CALENDAR_PERIOD_TOO_LONG_ERROR,
+    CAR_INVALID_EXPAND_ERROR,
+    CAR_INVALID_FILTER_ERROR,
+)
 from .models import Car, CarFeature, CarMedia
+from .pricing import get_price_tiers, get_pricing_table, quote_car
 
 fake = Faker()
 
@@ -150,6 +185,845 @@ class CarAPITestCase(APITestCase):
         assert response.status_code == HTTP_404_NOT_FOUND
 
 
+class CarExpandAPITestCase(APITestCase):
+    def setUp(self):
+        self.features = set_up_car_features()
+        self.car = set_up_car()
+        self.car.features.set(self.features[:3])
+        set_up_car_media_list(self.car)
+
+    def test_get_car_list_not_expanded(self):
+        """Does not embed related objects by default"""
+
+        url = reverse("cars-list")
+        response = self.client.get(url, format="json")
+        assert response.status_code == HTTP_200_OK
+        car = response.data["results"][0]
+        for field_name in ("thumbnail", "medias", "feature_names"):
+            assert field_name not in car
+
+    def test_get_car_list_expanded(self):
+        """Embeds the thumbnail, the medias and the feature names"""
+
+        url = reverse("cars-list")
+        response = self.client.get(
+            url, data={"expand": "thumbnail,medias,feature_names"}, format="json"
+        )
+        assert response.status_code == HTTP_200_OK
+        car = response.data["results"][0]
+        thumbnail = CarMedia.objects.get(car=self.car, is_thumbnail=True)
+        assert car["thumbnail"] == thumbnail.url
+        assert len(car["medias"]) == 10
+        assert sorted(car["feature_names"]) == sorted(
+            feature.name for feature in self.features[:3]
+        )
+
+    def test_get_car_detail_expanded(self):
+        """Embeds related objects in a car instance"""
+
+        url = reverse("cars-detail", kwargs={"pk": self.car.pk})
+        response = self.client.get(
+            url, data={"expand": "thumbnail,feature_names"}, format="json"
+        )
+        assert response.status_code == HTTP_200_OK
+        assert response.data["thumbnail"] is not None
+        assert len(response.data["feature_names"]) == 3
+        assert "medias" not in response.data
+
+    def test_get_car_list_expanded_query_count(self):
+        """Lists expanded cars with a fixed number of queries"""
+
+        url = reverse("cars-list")
+        data = {"expand": "thumbnail,medias,feature_names"}
+        # The feature names still need the features once they are omitted
+        omit_data = {"expand": "feature_names", "omit": "features"}
+        with self.assertNumQueries(5):
+            self.client.get(url, data=data, format="json")
+        with self.assertNumQueries(3):
+            self.client.get(url, data=omit_data, format="json")
+        for i in range(5):
+            car = set_up_car()
+            car.features.set(self.features)
+            set_up_car_media_list(car)
+        with self.assertNumQueries(5):
+            response = self.client.get(url, data=data, format="json")
+        assert len(response.data["results"]) == 6
+        with self.assertNumQueries(3):
+            response = self.client.get(url, data=omit_data, format="json")
+        assert len(response.data["results"][0]["feature_names"]) == 3
+        assert "features" not in response.data["results"][0]
+
+    def test_get_car_list_invalid_expand(self):
+        """Returns an error for unknown expanded fields"""
+
+        url = reverse("cars-list")
+        response = self.client.get(url, data={"expand": "customer"}, format="json")
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert response.data["expand"] == CAR_INVALID_EXPAND_ERROR.detail["expand"]
+
+
+class CarFieldsetAPITestCase(APITestCase):
+    def setUp(self):
+        self.car_list = [set_up_car() for i in range(15)]
+
+    def test_get_car_list_fields(self):
+        """Only serializes and loads the requested fields"""
+
+        url = reverse("cars-list")
+        fields = ["id", "name", "price_hourly_cents"]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                url, data={"fields": ",".join(fields)}, format="json"
+            )
+        assert response.status_code == HTTP_200_OK
+        for car in response.data["results"]:
+            assert sorted(car) == sorted(fields)
+        assert "engine_code" not in context.captured_queries[0]["sql"]
+        assert "price_hourly_cents" in context.captured_queries[0]["sql"]
+
+    def test_get_car_list_omit(self):
+        """Serializes every field except the omitted ones"""
+
+        url = reverse("cars-list")
+        response = self.client.get(
+            url, data={"omit": "engine_code,features"}, format="json"
+        )
+        assert response.status_code == HTTP_200_OK
+        car = response.data["results"][0]
+        assert "engine_code" not in car
+        assert "features" not in car
+        assert "power_hp" in car
+
+    def test_paginate_car_list_fields(self):
+        """Paginates with a cursor when the ordering fields are not requested"""
+
+        url = reverse("cars-list")
+        response = self.client.get(url, data={"fields": "name"}, format="json")
+        car_list = response.data["results"]
+        response = self.client.get(response.data["next"], format="json")
+        assert response.status_code == HTTP_200_OK
+        car_list += response.data["results"]
+        assert len(car_list) == len(self.car_list)
+        assert list(response.data["results"][0]) == ["name"]
+
+    def test_get_car_detail_fields(self):
+        """Only serializes the requested fields of a car instance"""
+
+        url = reverse("cars-detail", kwargs={"pk": self.car_list[0].pk})
+        response = self.client.get(url, data={"fields": "id,slug"}, format="json")
+        assert response.status_code == HTTP_200_OK
+        assert response.data == {
+            "id": self.car_list[0].pk,
+            "slug": self.car_list[0].slug,
+        }
+
+    def test_get_car_list_invalid_fields(self):
+        """Returns an error for unknown fields"""
+
+        url = reverse("cars-list")
+        response = self.client.get(url, data={"fields": "id,foo"}, format="json")
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert response.data["fields"] == FIELDSET_INVALID_FIELD_ERROR.detail["fields"]
+
+
+class CarPaginationAPITestCase(APITestCase):
+    def setUp(self):
+        self.car_list = [set_up_car() for i in range(25)]
+
+    def test_paginate_car_list(self):
+        """Walks through every car with the pagination cursors"""
+
+        url = reverse("cars-list")
+        response = self.client.get(url, format="json")
+        assert "count" not in response.data
+        assert response.data["previous"] is None
+        car_list = response.data["results"]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"], format="json")
+            assert response.status_code == HTTP_200_OK
+            car_list += response.data["results"]
+        assert len(car_list) == len(self.car_list)
+        assert len({car["id"] for car in car_list}) == len(self.car_list)
+        assert car_list == sorted(
+            car_list, key=lambda car: (car["price_twenty_four_hours_cents"], car["id"])
+        )
+
+        # Walk back to the first page
+        previous_car_list = response.data["results"]
+        while response.data["previous"]:
+            response = self.client.get(response.data["previous"], format="json")
+            previous_car_list = response.data["results"] + previous_car_list
+        assert previous_car_list == car_list
+
+    def test_paginate_car_list_invalid_cursor(self):
+        """Returns an error if the cursor cannot be decoded"""
+
+        url = reverse("cars-list")
+        response = self.client.get(url, data={"cursor": "foo"}, format="json")
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert (
+            response.data["cursor"] == PAGINATION_INVALID_CURSOR_ERROR.detail["cursor"]
+        )
+
+    def test_paginate_car_list_page_number(self):
+        """Paginates with page numbers and a total count when requested"""
+
+        url = reverse("cars-list")
+        response = self.client.get(url, data={"page": 2}, format="json")
+        assert response.status_code == HTTP_200_OK
+        assert response.data["count"] == len(self.car_list)
+        assert len(response.data["results"]) == 10
+
+
+class CarAvailabilityAPITestCase(APITestCase):
+    def setUp(self):
+        enable_stripe_mock(self)
+        self.car = set_up_car()
+        self.booked_car = set_up_car()
+        self.start_date = timezone.now() + timedelta(days=3)
+        self.end_date = self.start_date + timedelta(hours=6)
+        self.booking = Booking.objects.create(
+            car=self.booked_car,
+            customer=set_up_customer(),
+            start_date=self.start_date,
+            end_date=self.end_date,
+            price_cents=fake.pyint(300000, 1000000),
+        )
+
+    def get_available_car_ids(self, available_from, available_to):
+        url = reverse("cars-list")
+        response = self.client.get(
+            url,
+            data={
+                "available_from": available_from.isoformat(),
+                "available_to": available_to.isoformat(),
+            },
+            format="json",
+        )
+        assert response.status_code == HTTP_200_OK
+        return [car["id"] for car in response.data["results"]]
+
+    def test_list_available_cars(self):
+        """Excludes the cars booked during the requested time period"""
+
+        car_id_list = self.get_available_car_ids(
+            self.start_date + timedelta(hours=1), self.end_date + timedelta(hours=1)
+        )
+        assert self.car.pk in car_id_list
+        assert self.booked_car.pk not in car_id_list
+
+    def test_list_available_cars_adjacent_period(self):
+        """Includes the cars booked right before the requested time period"""
+
+        car_id_list = self.get_available_car_ids(
+            self.end_date, self.end_date + timedelta(hours=3)
+        )
+        assert self.booked_car.pk in car_id_list
+
+    def test_list_available_cars_cancelled_booking(self):
+        """Ignores cancelled bookings when searching available cars"""
+
+        self.booking.mark_as_cancelled()
+        car_id_list = self.get_available_car_ids(self.start_date, self.end_date)
+        assert self.booked_car.pk in car_id_list
+        self.booking.status = BookingStatus.CANCELED_BY_STAFF
+        self.booking.save()
+        car_id_list = self.get_available_car_ids(self.start_date, self.end_date)
+        assert self.booked_car.pk in car_id_list
+
+    def test_list_available_cars_incomplete_period(self):
+        """Returns an error if only one boundary of the period is provided"""
+
+        url = reverse("cars-list")
+        response = self.client.get(
+            url, data={"available_from": self.start_date.isoformat()}, format="json"
+        )
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert response.data["period"] == PERIOD_INCOMPLETE_ERROR.detail["period"]
+
+    def test_list_available_cars_invalid_period(self):
+        """Returns an error if the period ends before it starts"""
+
+        url = reverse("cars-list")
+        response = self.client.get(
+            url,
+            data={
+                "available_from": self.end_date.isoformat(),
+                "available_to": self.start_date.isoformat(),
+            },
+            format="json",
+        )
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert response.data["period"] == PERIOD_END_BEFORE_START_ERROR.detail["period"]
+
+
+class CarFilterAPITestCase(APITestCase):
+    def setUp(self):
+        self.features = set_up_car_features()
+        self.car_list = [set_up_car() for i in range(12)]
+        self.manual_car = self.car_list[0]
+        Car.objects.filter(pk=self.manual_car.pk).update(
+            transmission=CarTransmission.MANUAL,
+            capacity=2,
+            price_hourly_cents=500,
+        )
+        Car.objects.exclude(pk=self.manual_car.pk).update(
+            transmission=CarTransmission.AUTOMATIC, capacity=5
+        )
+        self.manual_car.refresh_from_db()
+        self.manual_car.features.set(
+            self.features.filter(name__in=[CarFeatures.AIRBAG, CarFeatures.BLUETOOTH])
+        )
+        self.car_list[1].features.set(
+            self.features.filter(name__in=[CarFeatures.AIRBAG])
+        )
+
+    def get_car_list(self, data):
+        url = reverse("cars-list")
+        response = self.client.get(url, data={"page": 1, **data}, format="json")
+        assert response.status_code == HTTP_200_OK
+        return response
+
+    def test_filter_car_list_choices(self):
+        """Filters cars on one or more choices of a field"""
+
+        response = self.get_car_list({"transmission": CarTransmission.MANUAL})
+        assert [car["id"] for car in response.data["results"]] == [self.manual_car.pk]
+        response = self.get_car_list(
+            {"transmission": f"{CarTransmission.MANUAL},{CarTransmission.AUTOMATIC}"}
+        )
+        assert response.data["count"] == len(self.car_list)
+
+    def test_filter_car_list_ranges(self):
+        """Filters cars on capacity and price ranges"""
+
+        response = self.get_car_list({"capacity__gte": 4})
+        assert response.data["count"] == len(self.car_list) - 1
+        response = self.get_car_list({"price_hourly_cents__lte": 500})
+        assert [car["id"] for car in response.data["results"]] == [self.manual_car.pk]
+
+    def test_filter_car_list_features(self):
+        """Filters the cars linked to every requested feature"""
+
+        response = self.get_car_list({"features__all": CarFeatures.AIRBAG})
+        assert response.data["count"] == 2
+        response = self.get_car_list(
+            {"features__all": f"{CarFeatures.AIRBAG},{CarFeatures.BLUETOOTH}"}
+        )
+        assert [car["id"] for car in response.data["results"]] == [self.manual_car.pk]
+
+    def test_filter_car_list_invalid(self):
+        """Returns an error for invalid filter values"""
+
+        url = reverse("cars-list")
+        for data in ({"make": "FERRARI"}, {"capacity__gte": "foo"}):
+            response = self.client.get(url, data=data, format="json")
+            assert response.status_code == HTTP_400_BAD_REQUEST
+            assert (
+                response.data["filters"] == CAR_INVALID_FILTER_ERROR.detail["filters"]
+            )
+
+    def test_car_list_facets(self):
+        """Counts the filtered cars matching each facet in a single query"""
+
+        url = reverse("cars-list")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data={"capacity__gte": 2}, format="json")
+        facets = response.data["facets"]
+        assert facets["transmission"] == {
+            CarTransmission.AUTOMATIC: len(self.car_list) - 1,
+            CarTransmission.MANUAL: 1,
+        }
+        assert facets["features"][CarFeatures.AIRBAG] == 2
+        assert facets["features"][CarFeatures.BLUETOOTH] == 1
+        assert sum(facets["make"].values()) == len(self.car_list)
+        assert len([q for q in context.captured_queries if "FILTER" in q["sql"]]) == 1
+
+    def test_car_list_facets_selected(self):
+        """Counts the choices of a facet without its own filter"""
+
+        url = reverse("cars-list")
+        response = self.client.get(
+            url, data={"transmission": CarTransmission.MANUAL}, format="json"
+        )
+        assert [car["id"] for car in response.data["results"]] == [self.manual_car.pk]
+        facets = response.data["facets"]
+        assert facets["transmission"] == {
+            CarTransmission.AUTOMATIC: len(self.car_list) - 1,
+            CarTransmission.MANUAL: 1,
+        }
+        assert sum(facets["make"].values()) == 1
+        assert facets["features"][CarFeatures.BLUETOOTH] == 1
+
+        response = self.client.get(
+            url,
+            data={
+                "transmission": CarTransmission.MANUAL,
+                "features__all": CarFeatures.BLUETOOTH,
+                "capacity__gte": 100,
+            },
+            format="json",
+        )
+        assert response.data["results"] == []
+        assert response.data["facets"]["transmission"] == {
+            CarTransmission.AUTOMATIC: 0,
+            CarTransmission.MANUAL: 0,
+        }
+
+
+class CarPricingTestCase(TestCase):
+    def setUp(self):
+        car = set_up_car()
+        Car.objects.filter(pk=car.pk).update(
+            price_hourly_cents=1000,
+            price_three_hours_cents=2500,
+            price_six_hours_cents=4000,
+            price_nine_hours_cents=5000,
+            price_twenty_four_hours_cents=8000,
+        )
+        car.refresh_from_db()
+        self.car = car
+        self.start_date = timezone.now() + timedelta(days=3)
+
+    def quote(self, duration):
+        return quote_car(self.car, self.start_date, self.start_date + duration)
+
+    def test_quote_cheapest_tiers(self):
+        """Combines the price tiers into the cheapest price"""
+
+        assert self.quote(timedelta(hours=2)).price_cents == 2000
+        assert self.quote(timedelta(hours=4)).price_cents == 3500
+        quote = self.quote(timedelta(hours=26))
+        assert quote.price_cents == 10000
+        assert quote.tiers == {24: 1, 1: 2}
+
+    def test_quote_longer_tier(self):
+        """Uses a longer tier when it is cheaper than the exact duration"""
+
+        quote = self.quote(timedelta(hours=20))
+        assert quote.price_cents == 8000
+        assert quote.tiers == {24: 1}
+
+    def test_quote_started_hour(self):
+        """Bills started hours as full hours"""
+
+        quote = self.quote(timedelta(hours=2, minutes=5))
+        assert quote.hours == 3
+        assert quote.price_cents == 2500
+
+    def test_pricing_table_cache(self):
+        """Reuses the pricing table until the car prices change"""
+
+        table = get_pricing_table(get_price_tiers(self.car))
+        assert get_pricing_table(get_price_tiers(self.car)) is table
+        self.car.price_hourly_cents = 900
+        assert get_pricing_table(get_price_tiers(self.car)) is not table
+        assert self.quote(timedelta(hours=2)).price_cents == 1800
+
+
+class CarQuoteAPITestCase(APITestCase):
+    def setUp(self):
+        self.car = set_up_car()
+        self.start_date = timezone.now() + timedelta(days=3)
+        self.end_date = self.start_date + timedelta(hours=30)
+
+    def test_get_car_quote(self):
+        """Quotes the price of a car rental"""
+
+        url = reverse("cars-quote", kwargs={"pk": self.car.pk})
+        response = self.client.get(
+            url,
+            data={
+                "start": self.start_date.isoformat(),
+                "end": self.end_date.isoformat(),
+            },
+            format="json",
+        )
+        assert response.status_code == HTTP_200_OK
+        quote = quote_car(self.car, self.start_date, self.end_date)
+        assert response.data["hours"] == 30
+        assert response.data["price_cents"] == quote.price_cents
+        assert {tier["hours"]: tier["count"] for tier in response.data["tiers"]} == (
+            quote.tiers
+        )
+
+    def test_get_car_quote_incomplete_period(self):
+        """Returns an error if the period of the quote is missing"""
+
+        url = reverse("cars-quote", kwargs={"pk": self.car.pk})
+        response = self.client.get(url, format="json")
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert response.data["period"] == PERIOD_INCOMPLETE_ERROR.detail["period"]
+
+    def test_get_car_quote_too_long(self):
+        """Returns an error if the period is longer than the maximum duration"""
+
+        url = reverse("cars-quote", kwargs={"pk": self.car.pk})
+        end_date = self.start_date + timedelta(
+            seconds=settings.BOOKING_MAX_DURATION, hours=1
+        )
+        response = self.client.get(
+            url,
+            data={"start": self.start_date.isoformat(), "end": end_date.isoformat()},
+            format="json",
+        )
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert "period" in response.data
+
+
+class CarQuoteMatrixAPITestCase(APITestCase):
+    def setUp(self):
+        enable_stripe_mock(self)
+        self.car_list = [set_up_car() for i in range(3)]
+        self.start_date = timezone.now() + timedelta(days=3)
+        self.windows = [
+            (self.start_date, self.start_date + timedelta(hours=5)),
+            (self.start_date + timedelta(days=1), self.start_date + timedelta(days=3)),
+        ]
+        self.booked_car = self.car_list[1]
+        Booking.objects.create(
+            car=self.booked_car,
+            customer=set_up_customer(),
+            start_date=self.start_date + timedelta(hours=2),
+            end_date=self.start_date + timedelta(hours=8),
+            price_cents=fake.pyint(300000, 1000000),
+        )
+
+    def post_quotes(self, data):
+        url = reverse("cars-quotes")
+        return self.client.post(url, data=data, format="json")
+
+    def get_windows_data(self):
+        return [
+            {"start_date": start_date.isoformat(), "end_date": end_date.isoformat()}
+            for start_date, end_date in self.windows
+        ]
+
+    def test_quote_matrix(self):
+        """Quotes every car for every window along with their availability"""
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.post_quotes({"windows": self.get_windows_data()})
+        assert response.status_code == HTTP_200_OK
+        assert sorted(response.data["cars"]) == sorted(car.pk for car in self.car_list)
+        for row, car_id in enumerate(response.data["cars"]):
+            car = Car.objects.get(pk=car_id)
+            assert response.data["prices"][row] == [
+                quote_car(car, *window).price_cents for window in self.windows
+            ]
+            expected_available = [car_id != self.booked_car.pk, True]
+            assert response.data["available"][row] == expected_available
+        booking_queries = [
+            query
+            for query in context.captured_queries
+            if "booking_booking" in query["sql"]
+        ]
+        assert len(booking_queries) == 1
+
+    def test_quote_matrix_cars(self):
+        """Only quotes the requested cars"""
+
+        response = self.post_quotes(
+            {"windows": self.get_windows_data(), "cars": [self.booked_car.pk]}
+        )
+        assert response.status_code == HTTP_200_OK
+        assert response.data["cars"] == [self.booked_car.pk]
+        assert response.data["available"] == [[False, True]]
+
+    def test_quote_matrix_invalid_window(self):
+        """Returns an error if a window ends before it starts"""
+
+        response = self.post_quotes(
+            {
+                "windows": [
+                    {
+                        "start_date": self.windows[0][1].isoformat(),
+                        "end_date": self.windows[0][0].isoformat(),
+                    }
+                ]
+            }
+        )
+        assert response.status_code == HTTP_400_BAD_REQUEST
+
+    def test_quote_matrix_window_too_long(self):
+        """Returns an error if a window is longer than the maximum duration"""
+
+        end_date = self.start_date + timedelta(
+            seconds=settings.BOOKING_MAX_DURATION, hours=1
+        )
+        windows = self.get_windows_data()
+        windows.append(
+            {
+                "start_date": self.start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+            }
+        )
+        response = self.post_quotes({"windows": windows})
+        assert response.status_code == HTTP_400_BAD_REQUEST
+
+
+class CarCalendarAPITestCase(APITestCase):
+    def setUp(self):
+        enable_stripe_mock(self)
+        self.car = set_up_car()
+        customer = set_up_customer()
+        self.start_date = (timezone.now() + timedelta(days=3)).replace(
+            minute=0, second=0, microsecond=0
+        )
+        self.end_date = self.start_date + timedelta(days=2)
+        self.booking_list = [
+            Booking.objects.create(
+                car=self.car,
+                customer=customer,
+                start_date=self.start_date + timedelta(hours=start_hour),
+                end_date=self.start_date + timedelta(hours=end_hour),
+                price_cents=fake.pyint(300000, 1000000),
+            )
+            for start_hour, end_hour in ((-2, 3), (3, 5), (10, 12))
+        ]
+
+    def get_calendar(self, **data):
+        url = reverse("cars-calendar", kwargs={"pk": self.car.pk})
+        return self.client.get(
+            url,
+            data={
+                "from": self.start_date.isoformat(),
+                "to": self.end_date.isoformat(),
+                **data,
+            },
+            format="json",
+        )
+
+    def test_get_car_calendar(self):
+        """Lists the merged booked intervals within the requested period"""
+
+        response = self.get_calendar()
+        assert response.status_code == HTTP_200_OK
+        intervals = [
+            (
+                datetime.fromisoformat(interval["start_date"]),
+                datetime.fromisoformat(interval["end_date"]),
+            )
+            for interval in response.data["intervals"]
+        ]
+        assert intervals == [
+            (self.start_date, self.start_date + timedelta(hours=5)),
+            (
+                self.start_date + timedelta(hours=10),
+                self.start_date + timedelta(hours=12),
+            ),
+        ]
+        assert response.data["bitmap"] is None
+
+    def test_get_car_calendar_bitmap(self):
+        """Encodes the booked hours of the requested period in a bitmap"""
+
+        response = self.get_calendar(bitmap="true")
+        assert response.status_code == HTTP_200_OK
+        bitmap = base64.b64decode(response.data["bitmap"])
+        assert len(bitmap) == 6
+        booked_hours = [
+            hour for hour in range(48) if bitmap[hour // 8] & (0x80 >> (hour % 8))
+        ]
+        assert booked_hours == [0, 1, 2, 3, 4, 10, 11]
+
+    def test_cached_car_calendar(self):
+        """Serves the calendar from the cache until a booking is cancelled"""
+
+        self.get_calendar()
+        with self.assertNumQueries(0):
+            response = self.get_calendar()
+        assert len(response.data["intervals"]) == 2
+
+        BookingService(id=self.booking_list[2].pk).cancel()
+        response = self.get_calendar()
+        assert len(response.data["intervals"]) == 1
+
+    def test_get_car_calendar_period_too_long(self):
+        """Returns an error if the requested period is too long"""
+
+        response = self.get_calendar(
+            to=(self.start_date + timedelta(days=400)).isoformat()
+        )
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert (
+            response.data["period"]
+            == CAR_CALENDAR_PERIOD_TOO_LONG_ERROR.detail["period"]
+        )
+
+
+class CarFreeWindowsAPITestCase(APITestCase):
+    def setUp(self):
+        enable_stripe_mock(self)
+        self.car = set_up_car()
+        self.free_car = set_up_car()
+        customer = set_up_customer()
+        self.start_date = (timezone.now() + timedelta(days=3)).replace(
+            minute=0, second=0, microsecond=0
+        )
+        self.booking_list = [
+            Booking.objects.create(
+                car=self.car,
+                customer=customer,
+                start_date=self.start_date + timedelta(hours=start_hour),
+                end_date=self.start_date + timedelta(hours=end_hour),
+                price_cents=fake.pyint(300000, 1000000),
+            )
+            for start_hour, end_hour in ((0, 5), (7, 10), (20, 30))
+        ]
+
+    def get_window_starts(self, windows):
+        return [datetime.fromisoformat(window["start_date"]) for window in windows]
+
+    def get_free_windows(self, after, **data):
+        url = reverse("cars-free-windows", kwargs={"pk": self.car.pk})
+        response = self.client.get(
+            url, data={"after": after.isoformat(), **data}, format="json"
+        )
+        assert response.status_code == HTTP_200_OK
+        return self.get_window_starts(response.data["windows"])
+
+    def test_get_car_free_windows(self):
+        """Lists the earliest windows inside the gaps between bookings"""
+
+        window_starts = self.get_free_windows(
+            self.start_date - timedelta(hours=3), hours=3
+        )
+        assert window_starts == [
+            self.start_date - timedelta(hours=3),
+            self.start_date + timedelta(hours=10),
+            self.start_date + timedelta(hours=13),
+        ]
+        window_starts = self.get_free_windows(
+            self.start_date - timedelta(hours=3), hours=3, count=1
+        )
+        assert window_starts == [self.start_date - timedelta(hours=3)]
+
+    def test_get_car_free_windows_during_booking(self):
+        """Starts searching after the booking in progress at the search start"""
+
+        window_starts = self.get_free_windows(
+            self.start_date + timedelta(hours=1), hours=2
+        )
+        assert window_starts == [
+            self.start_date + timedelta(hours=5),
+            self.start_date + timedelta(hours=10),
+            self.start_date + timedelta(hours=12),
+        ]
+
+    def test_get_car_free_windows_cancelled_booking(self):
+        """Ignores cancelled bookings"""
+
+        self.booking_list[1].mark_as_cancelled()
+        window_starts = self.get_free_windows(self.start_date, hours=12)
+        assert window_starts == [
+            self.start_date + timedelta(hours=5),
+            self.start_date + timedelta(hours=30),
+            self.start_date + timedelta(hours=42),
+        ]
+
+    def test_get_car_free_windows_no_booking(self):
+        """Lists consecutive windows from the earliest bookable start by default"""
+
+        url = reverse("cars-free-windows", kwargs={"pk": self.free_car.pk})
+        response = self.client.get(url, data={"hours": 24}, format="json")
+        assert response.status_code == HTTP_200_OK
+        earliest_start = timezone.now().replace(
+            hour=0, minute=0, second=0, microsecond=0
+        ) + timedelta(days=1)
+        assert self.get_window_starts(response.data["windows"]) == [
+            earliest_start,
+            earliest_start + timedelta(days=1),
+            earliest_start + timedelta(days=2),
+        ]
+
+    def test_get_fleet_free_windows(self):
+        """Lists the earliest free windows of every car in a single request"""
+
+        url = reverse("cars-fleet-free-windows")
+        response = self.client.get(
+            url,
+            data={"after": self.start_date.isoformat(), "hours": 6, "count": 1},
+            format="json",
+        )
+        assert response.status_code == HTTP_200_OK
+        free_windows = {
+            result["car"]: self.get_window_starts(result["windows"])
+            for result in response.data["results"]
+        }
+        assert free_windows[self.car.pk] == [self.start_date + timedelta(hours=10)]
+        assert free_windows[self.free_car.pk] == [self.start_date]
+
+    def test_get_car_free_windows_invalid_duration(self):
+        """Returns an error if the duration is missing or invalid"""
+
+        url = reverse("cars-free-windows", kwargs={"pk": self.car.pk})
+        for data in ({}, {"hours": 0}):
+            response = self.client.get(url, data=data, format="json")
+            assert response.status_code == HTTP_400_BAD_REQUEST
+            assert "hours" in response.data
+
+
+class CarFleetAvailabilityAPITestCase(APITestCase):
+    def setUp(self):
+        enable_stripe_mock(self)
+        self.car = set_up_car()
+        self.free_car = set_up_car()
+        customer = set_up_customer()
+        self.start = timezone.localdate() + timedelta(days=3)
+        start_date = timezone.make_aware(
+            datetime.combine(self.start, datetime.min.time())
+        )
+        for start_hour, end_hour in ((24, 48), (74, 76)):
+            Booking.objects.create(
+                car=self.car,
+                customer=customer,
+                start_date=start_date + timedelta(hours=start_hour),
+                end_date=start_date + timedelta(hours=end_hour),
+                price_cents=fake.pyint(300000, 1000000),
+            )
+
+    def test_get_fleet_availability(self):
+        """Encodes the daily availability of every car as run lengths"""
+
+        url = reverse("cars-availability")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                url, data={"start": self.start.isoformat(), "days": 5}, format="json"
+            )
+        assert response.status_code == HTTP_200_OK
+        rows = dict(zip(response.data["cars"], response.data["rows"]))
+        assert rows == {self.car.pk: "1F1B1F1P1F", self.free_car.pk: "5F"}
+        series_queries = [
+            query
+            for query in context.captured_queries
+            if "generate_series" in query["sql"]
+        ]
+        assert len(series_queries) == 1
+
+    def test_get_fleet_availability_filtered(self):
+        """Only includes the cars matching the car list filters"""
+
+        Car.objects.filter(pk=self.car.pk).update(capacity=2)
+        Car.objects.filter(pk=self.free_car.pk).update(capacity=5)
+        url = reverse("cars-availability")
+        response = self.client.get(
+            url,
+            data={"start": self.start.isoformat(), "days": 60, "capacity__lte": 2},
+            format="json",
+        )
+        assert response.data["cars"] == [self.car.pk]
+        assert response.data["rows"] == ["1F1B1F1P56F"]
+
+    def test_get_fleet_availability_invalid_days(self):
+        """Returns an error if the number of days is invalid"""
+
+        url = reverse("cars-availability")
+        response = self.client.get(url, data={"days": 400}, format="json")
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert "days" in response.data
+
+
 class CarMediaTestCase(TestCase):
     def setUp(self):
         car = set_up_car()
@@ -312,7 +1186,7 @@ class CarFeatureAPITestCase(APITestCase):
         """Correctly list all car features"""
 
         url = reverse("car-features-list")
-        response = self.client.get(url, format="json")
+        response = self.client.get(url, data={"page": 1}, format="json")
         assert response.status_code == HTTP_200_OK
         assert response.data["count"] == len(CarFeatures)
 
@@ -322,9 +1196,203 @@ class CarFeatureAPITestCase(APITestCase):
         id_list = [car_feature.id for car_feature in self.car_feature_list[:3]]
         url = reverse("car-features-list")
         response = self.client.get(
-            url, data={"id__in": ",".join(map(str, id_list))}, format="json"
+            url,
+            data={"id__in": ",".join(map(str, id_list)), "page": 1},
+            format="json",
         )
         assert response.status_code == HTTP_200_OK
         assert response.data["count"] == len(id_list)
         for car_feature in response.data["results"]:
             assert car_feature["id"] in id_list
+
+
+class CarCatalogCacheTestCase(APITestCase):
+    def setUp(self):
+        car = set_up_car()
+        set_up_car_media_list(car)
+        set_up_car_features()
+        self.car = car
+
+    def test_cached_car_list(self):
+        """Serves the car list from the cache until the catalog changes"""
+
+        url = reverse("cars-list")
+        response = self.client.get(url, format="json")
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(url, format="json")
+        assert cached_response.status_code == HTTP_200_OK
+        assert cached_response.data == response.data
+
+    def test_cached_car_detail(self):
+        """Serves a car from the cache until the catalog changes"""
+
+        url = reverse("cars-detail", kwargs={"pk": self.car.pk})
+        self.client.get(url, format="json")
+        with self.assertNumQueries(0):
+            response = self.client.get(url, format="json")
+        assert response.data["id"] == self.car.pk
+
+    def test_invalidate_on_car_create(self):
+        """Creating a car invalidates the cached car list"""
+
+        url = reverse("cars-list")
+        self.client.get(url, format="json")
+        car = set_up_car()
+        response = self.client.get(url, format="json")
+        assert car.pk in [car["id"] for car in response.data["results"]]
+
+    def test_invalidate_on_car_media_create(self):
+        """Creating a car media invalidates the cached car media list"""
+
+        url = reverse("car-medias-list", query={"car": self.car.pk, "page": 1})
+        count = self.client.get(url, format="json").data["count"]
+        CarMedia.objects.create(car=self.car, url=fake.image_url())
+        response = self.client.get(url, format="json")
+        assert response.data["count"] == count + 1
+
+    def test_invalidate_on_car_feature_link(self):
+        """Linking a feature to a car invalidates the cached car"""
+
+        url = reverse("cars-detail", kwargs={"pk": self.car.pk})
+        self.client.get(url, format="json")
+        car_feature = CarFeature.objects.first()
+        self.car.features.add(car_feature)
+        response = self.client.get(url, format="json")
+        assert response.data["features"] == [car_feature.pk]
+
+    def test_bypass_cache_availability(self):
+        """Never caches availability searches as they depend on bookings"""
+
+        url = reverse("cars-list")
+        query = {
+            "available_from": (timezone.now() + timedelta(days=3)).isoformat(),
+            "available_to": (timezone.now() + timedelta(days=4)).isoformat(),
+        }
+        self.client.get(url, data=query, format="json")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, data=query, format="json")
+        assert len(queries) > 0
+
+    def test_warm_catalog_cache(self):
+        """Warms the cache of every catalog endpoint"""
+
+        catalog_cache = {**settings.CAR_CATALOG_CACHE, "BACKEND": "django"}
+        with self.settings(CAR_CATALOG_CACHE=catalog_cache):
+            get_catalog_cache.cache_clear()
+            self.addCleanup(get_catalog_cache.cache_clear)
+            call_command("warm_catalog_cache", host="testserver", scheme="http")
+        with self.assertNumQueries(0):
+            self.client.get(reverse("cars-list"), format="json")
+            self.client.get(
+                reverse("cars-detail", kwargs={"pk": self.car.pk}), format="json"
+            )
+            self.client.get(reverse("car-features-list"), format="json")
+            self.client.get(
+                reverse(
+                    "car-medias-list",
+                    query={"car": self.car.pk, "is_thumbnail": "true"},
+                ),
+                format="json",
+            )
+
+    def test_warm_catalog_cache_lru(self):
+        """Refuses to warm a catalog cache local to the command process"""
+
+        with self.assertRaises(CommandError):
+            call_command("warm_catalog_cache", host="testserver", scheme="http")
+
+    def test_conditional_car_list(self):
+        """Returns a 304 response without querying the database if the list did not change"""
+
+        url = reverse("cars-list")
+        response = self.client.get(url, format="json")
+        assert response.headers["ETag"]
+        with self.assertNumQueries(0):
+            not_modified_response = self.client.get(
+                url, format="json", HTTP_IF_NONE_MATCH=response.headers["ETag"]
+            )
+        assert not_modified_response.status_code == HTTP_304_NOT_MODIFIED
+        assert not_modified_response.headers["ETag"] == response.headers["ETag"]
+
+    def test_conditional_car_detail_changed(self):
+        """Returns the car again once the catalog changed"""
+
+        url = reverse("cars-detail", kwargs={"pk": self.car.pk})
+        response = self.client.get(url, format="json")
+        set_up_car()
+        modified_response = self.client.get(
+            url, format="json", HTTP_IF_NONE_MATCH=response.headers["ETag"]
+        )
+        assert modified_response.status_code == HTTP_200_OK
+        assert modified_response.headers["ETag"] != response.headers["ETag"]
+
+    def test_version_cache_check(self):
+        """Refuses a cache local to each process to store the catalog version"""
+
+        locmem_caches = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        }
+        with self.settings(CACHES=locmem_caches, DEBUG=False):
+            assert [error.id for error in check_version_cache(None)] == ["car.E001"]
+        with self.settings(CACHES=locmem_caches, DEBUG=True):
+            assert check_version_cache(None) == []
+        database_caches = {
+            "default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache"}
+        }
+        with self.settings(CACHES=database_caches, DEBUG=False):
+            assert check_version_cache(None) == []
+
+    def test_lru_cache_eviction(self):
+        """Evicts the least recently used entries first"""
+
+        lru_cache = LRUCacheBackend(max_entries=2)
+        lru_cache.set("a", 1)
+        lru_cache.set("b", 2)
+        lru_cache.get("a")
+        lru_cache.set("c", 3)
+        assert lru_cache.get("a") == 1
+        assert lru_cache.get("b") is MISS
+        assert lru_cache.get("c") == 3
+
+    def test_lru_cache_expiration(self):
+        """Expires entries after the cache timeout"""
+
+        lru_cache = LRUCacheBackend(timeout=0.01)
+        lru_cache.set("a", 1)
+        time.sleep(0.02)
+        assert lru_cache.get("a") is MISS
+
+    def test_single_flight(self):
+        """Computes a missing value once for concurrent callers"""
+
+        single_flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(1)
+            return "value"
+
+        leader = threading.Thread(
+            target=lambda: results.append(single_flight.do("key", compute))
+        )
+        leader.start()
+        started.wait(1)
+        followers = [
+            threading.Thread(
+                target=lambda: results.append(single_flight.do("key", compute))
+            )
+            for i in range(3)
+        ]
+        for follower in followers:
+            follower.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(1)
+        assert len(calls) == 1
+        assert results == ["value"] * 4
@@ -1,29 +1,317 @@
 import json
+from collections.abc import Sequence
+from datetime import timedelta
+from functools import partial
+from typing import Any
 
+from django.db.models import Exists, OuterRef, Prefetch
 from django.db.models.query import QuerySet
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework.decorators import action
 from rest_framework.mixins import ListModelMixin
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK
 from rest_framework.viewsets import GenericViewSet, ReadOnlyModelViewSet
 
+from booking.models import Booking
+from furai.cache import VersionCounter
+from furai.errors import PERIOD_INCOMPLETE_ERROR
+from furai.fieldsets import SparseFieldsetMixin
+from furai.utils import (
+    check_booking_duration,
+    get_earliest_booking_start,
+    parse_period,
+)
+
+from .availability import (
+    encode_hourly_bitmap,
+    encode_run_lengths,
+    find_free_windows,
+    get_availability_matrix,
+    get_booked_intervals,
+    get_fleet_availability,
+)
+from .cache import CatalogCacheMixin, get_availability_version
+from .errors import CAR_CALENDAR_PERIOD_TOO_LONG_ERROR, CAR_INVALID_EXPAND_ERROR
+from .filters import filter_cars, get_car_facets
 from .models import Car, CarFeature, CarMedia
-from .serializers import CarFeatureSerializer, CarMediaSerializer, CarSerializer
+from .pricing import PRICE_FIELDS, get_price_matrix, quote_car
+from .serializers import (
+    CarAvailabilityMatrixQuerySerializer,
+    CarAvailabilityMatrixSerializer,
+    CarCalendarSerializer,
+    CarFeatureSerializer,
+    CarFreeWindowQuerySerializer,
+    CarFreeWindowsSerializer,
+    CarMediaSerializer,
+    CarQuoteMatrixRequestSerializer,
+    CarQuoteMatrixSerializer,
+    CarQuoteSerializer,
+    CarSerializer,
+)
 
 
-class CarViewSet(ReadOnlyModelViewSet):
+class CarViewSet(SparseFieldsetMixin, CatalogCacheMixin, ReadOnlyModelViewSet):
     """
     List or retrieve cars
     """
 
-    queryset = Car.objects.order_by("price_twenty_four_hours_cents")
     serializer_class = CarSerializer
+    catalog_cache_bypass_params = ("available_from", "available_to")
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return self.get_cached_response(
+            request, partial(self.get_list_response, request, *args, **kwargs)
+        )
+
+    def get_list_response(
+        self, request: Request, *args: Any, **kwargs: Any
+    ) -> Response:
+        """List cars along with the facet counts of the filtered cars"""
+
+        response = super().list(request, *args, **kwargs)
+        response.data["facets"] = get_car_facets(
+            self.get_queryset(), request.query_params
+        )
+        return response
+
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return self.get_cached_response(
+            request, partial(super().retrieve, request, *args, **kwargs)
+        )
+
+    @action(detail=True)
+    def quote(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Quote the cheapest price to rent a car during a time period"""
+
+        period = parse_period(request.query_params, "start", "end")
+        if period is None:
+            raise PERIOD_INCOMPLETE_ERROR
+        check_booking_duration(*period)
+        car = self.get_object()
+        quote = quote_car(car, *period)
+        serializer = CarQuoteSerializer(
+            {
+                "car": car.pk,
+                "start_date": period[0],
+                "end_date": period[1],
+                "hours": quote.hours,
+                "price_cents": quote.price_cents,
+                "tiers": [
+                    {"hours": hours, "count": count}
+                    for hours, count in sorted(quote.tiers.items(), reverse=True)
+                ],
+            }
+        )
+        return Response(serializer.data, status=HTTP_200_OK)
+
+    @action(detail=False, methods=["post"])
+    def quotes(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Quote the price and the availability of cars for several time periods"""
+
+        request_serializer = CarQuoteMatrixRequestSerializer(data=request.data)
+        request_serializer.is_valid(raise_exception=True)
+        windows = request_serializer.validated_data["windows"]
+        periods = [(window["start_date"], window["end_date"]) for window in windows]
+
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .prefetch_related(None)
+            .only("pk", *PRICE_FIELDS)
+        )
+        car_ids = request_serializer.validated_data.get("cars")
+        if car_ids is not None:
+            queryset = queryset.filter(pk__in=car_ids)
+        cars = list(queryset)
+
+        serializer = CarQuoteMatrixSerializer(
+            {
+                "cars": [car.pk for car in cars],
+                "windows": windows,
+                "prices": get_price_matrix(cars, periods),
+                "available": get_availability_matrix([car.pk for car in cars], periods),
+            }
+        )
+        return Response(serializer.data, status=HTTP_200_OK)
+
+    @action(detail=True)
+    def calendar(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """List the merged time intervals during which a car is booked"""
+
+        return self.get_cached_response(
+            request, partial(self.get_calendar_response, request)
+        )
+
+    def get_calendar_response(self, request: Request) -> Response:
+        period = parse_period(request.query_params, "from", "to")
+        if period is None:
+            raise PERIOD_INCOMPLETE_ERROR
+        start_date, end_date = period
+        if end_date - start_date > timedelta(days=366):
+            raise CAR_CALENDAR_PERIOD_TOO_LONG_ERROR
+
+        car = get_object_or_404(Car.objects.only("pk"), pk=self.kwargs["pk"])
+        intervals = get_booked_intervals(car.pk, start_date, end_date)
+        bitmap = None
+        if request.query_params.get("bitmap") in ("true", "1"):
+            bitmap = encode_hourly_bitmap(intervals, start_date, end_date)
+
+        serializer = CarCalendarSerializer(
+            {
+                "car": car.pk,
+                "start_date": start_date,
+                "end_date": end_date,
+                "intervals": [
+                    {"start_date": interval_start_date, "end_date": interval_end_date}
+                    for interval_start_date, interval_end_date in intervals
+                ],
+                "bitmap": bitmap,
+            }
+        )
+        return Response(serializer.data, status=HTTP_200_OK)
+
+    @action(detail=True, url_path="free-windows", url_name="free-windows")
+    def free_windows(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """List the earliest free time windows of a car"""
 
+        car = get_object_or_404(Car.objects.only("pk"), pk=self.kwargs["pk"])
+        return Response(self.get_free_windows([car.pk])[0], status=HTTP_200_OK)
 
-class CarMediaViewSet(ListModelMixin, GenericViewSet):
+    @action(detail=False, url_path="free-windows", url_name="fleet-free-windows")
+    def fleet_free_windows(
+        self, request: Request, *args: Any, **kwargs: Any
+    ) -> Response:
+        """List the earliest free time windows of every car"""
+
+        return Response({"results": self.get_free_windows(None)}, status=HTTP_200_OK)
+
+    def get_free_windows(self, car_ids: Sequence[int] | None) -> Any:
+        query_serializer = CarFreeWindowQuerySerializer(data=self.request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        free_windows = find_free_windows(
+            car_ids,
+            after=query_serializer.validated_data.get(
+                "after", get_earliest_booking_start()
+            ),
+            duration=timedelta(hours=query_serializer.validated_data["hours"]),
+            count=query_serializer.validated_data["count"],
+        )
+        serializer = CarFreeWindowsSerializer(
+            [
+                {
+                    "car": car_id,
+                    "windows": [
+                        {"start_date": start_date, "end_date": end_date}
+                        for start_date, end_date in windows
+                    ],
+                }
+                for car_id, windows in free_windows.items()
+            ],
+            many=True,
+        )
+        return serializer.data
+
+    @action(detail=False)
+    def availability(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Return the availability of every car for each day of a date range"""
+
+        query_serializer = CarAvailabilityMatrixQuerySerializer(
+            data=request.query_params
+        )
+        query_serializer.is_valid(raise_exception=True)
+        start = query_serializer.validated_data.get("start", timezone.localdate())
+        days = query_serializer.validated_data["days"]
+
+        car_ids = list(
+            self.filter_queryset(self.get_queryset())
+            .prefetch_related(None)
+            .values_list("pk", flat=True)
+        )
+        fleet_availability = get_fleet_availability(car_ids, start, days)
+        serializer = CarAvailabilityMatrixSerializer(
+            {
+                "start": start,
+                "days": days,
+                "cars": car_ids,
+                "rows": [
+                    encode_run_lengths(fleet_availability[car_id]) for car_id in car_ids
+                ],
+            }
+        )
+        return Response(serializer.data, status=HTTP_200_OK)
+
+    def get_cache_version(self) -> VersionCounter:
+        # The calendar of a car depends on its bookings instead of the catalog
+        if self.action == "calendar":
+            return get_availability_version(self.kwargs["pk"])
+        return super().get_cache_version()
+
+    def get_expand(self) -> set[str]:
+        """Return the serializer fields to embed, from the expand query param"""
+
+        expand = self.request.query_params.get("expand")
+        if not expand:
+            return set()
+        fields = set(expand.split(","))
+        if not fields.issubset(CarSerializer.expandable_fields):
+            raise CAR_INVALID_EXPAND_ERROR
+        return fields
+
+    def get_serializer_context(self) -> dict[str, Any]:
+        context = super().get_serializer_context()
+        context["expand"] = self.get_expand()
+        return context
+
+    def get_queryset(self) -> QuerySet[Car]:
+        expand = self.get_expand()
+        # Related objects are fetched with one query per relation for the whole page
+        queryset = Car.objects.order_by("price_twenty_four_hours_cents")
+        if self.includes_field("features") or self.includes_field("feature_names"):
+            queryset = queryset.prefetch_related("features")
+        if "thumbnail" in expand:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "carmedia_set",
+                    queryset=CarMedia.objects.filter(is_thumbnail=True),
+                    to_attr="thumbnails",
+                )
+            )
+        if "medias" in expand:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "carmedia_set", queryset=CarMedia.objects.order_by("created_at")
+                )
+            )
+        period = parse_period(
+            self.request.query_params, "available_from", "available_to"
+        )
+        if period is not None:
+            # Anti-join against the bookings holding the car during the period
+            queryset = queryset.filter(
+                ~Exists(Booking.objects.overlapping(*period).filter(car=OuterRef("pk")))
+            )
+        return queryset
+
+    def filter_queryset(self, queryset: QuerySet[Car]) -> QuerySet[Car]:
+        return filter_cars(super().filter_queryset(queryset), self.request.query_params)
+
+
+class CarMediaViewSet(
+    SparseFieldsetMixin, CatalogCacheMixin, ListModelMixin, GenericViewSet
+):
     """
     List car medias
     """
 
     serializer_class = CarMediaSerializer
 
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return self.get_cached_response(
+            request, partial(super().list, request, *args, **kwargs)
+        )
+
     def get_queryset(self) -> QuerySet[CarMedia]:
         queryset = CarMedia.objects.order_by("created_at")
         car_id = self.request.query_params.get("car")
@@ -35,13 +323,20 @@ class CarMediaViewSet(ListModelMixin, GenericViewSet):
         return queryset
 
 
-class CarFeatureViewSet(ListModelMixin, GenericViewSet):
+class CarFeatureViewSet(
+    SparseFieldsetMixin, CatalogCacheMixin, ListModelMixin, GenericViewSet
+):
     """
     List car features
     """
 
     serializer_class = CarFeatureSerializer
 
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return self.get_cached_response(
+            request, partial(super().list, request, *args, **kwargs)
+        )
+
     def get_queryset(self) -> QuerySet[CarFeature]:
         queryset = CarFeature.objects.order_by("created_at")
         id__in = self.request.query_params.get("id__in")
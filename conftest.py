@@ -7,10 +7,24 @@ from unittest.mock import patch
 
 import pytest
 import resend
+from django.db import connections
+from django.db.models.signals import pre_migrate
+from django.dispatch import receiver
 
 from furai.tests.mocks import StripeMock
 
 
+@receiver(pre_migrate)
+def create_postgres_extensions(using, **kwargs):
+    """
+    Create the Postgres extensions installed by migrations,
+    as the test database is created without running them
+    """
+
+    with connections[using].cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+
+
 @pytest.fixture(autouse=True)
 def stub_resend_send(monkeypatch):
     """Prevent sending emails"""
@@ -25,6 +39,18 @@ def stub_resend_send(monkeypatch):
     yield
 
 
+@pytest.fixture(autouse=True)
+def use_locmem_cache(settings):
+    """
+    Keep the cache in memory, as the tests run in a single process and count
+    the database queries of the cached endpoints
+    """
+
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+
+
 @pytest.fixture
 def stripe_mocks():
     """Mock stripe customer methods"""
@@ -1,10 +1,26 @@
 from django.contrib import admin
+from django.db.models.query import QuerySet
+from django.http import HttpRequest
+from django.http.response import HttpResponseBase
 
 from booking.models import Booking
+from furai.exports import export_queryset
 
+from .exports import CUSTOMER_EXPORT_COLUMNS
 from .models import Customer
 
 
+@admin.action(description="Export selected customers as CSV")
+def export_as_csv(
+    modeladmin: admin.ModelAdmin,
+    request: HttpRequest,
+    queryset: QuerySet[Customer],
+) -> HttpResponseBase:
+    return export_queryset(
+        queryset.order_by("pk"), CUSTOMER_EXPORT_COLUMNS, "customers"
+    )
+
+
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
     list_display = ("name", "address_country", "booking_count")
@@ -15,6 +31,7 @@ class CustomerAdmin(admin.ModelAdmin):
     readonly_fields = ("stripe_id",)
     list_filter = ("address_country",)
     list_per_page = 30
+    actions = [export_as_csv]
 
     @admin.display(description="Name")
     def name(self, obj: Customer) -> str:
@@ -0,0 +1,16 @@
+# Exported columns and the lookups they are read from
+CUSTOMER_EXPORT_COLUMNS = {
+    "id": "id",
+    "created_at": "created_at",
+    "first_name": "first_name",
+    "last_name": "last_name",
+    "email": "user__email",
+    "phone": "phone",
+    "address_line1": "address_line1",
+    "address_line2": "address_line2",
+    "address_city": "address_city",
+    "address_postal_code": "address_postal_code",
+    "address_state": "address_state",
+    "address_country": "address_country",
+    "stripe_id": "stripe_id",
+}
@@ -0,0 +1,22 @@
+from typing import Any
+
+from django.core.management.base import CommandParser
+
+from customer.services import sync_pending_stripe_customers
+from furai.commands import WorkerCommand
+
+
+class Command(WorkerCommand):
+    help = "Create or update the Stripe customers of the updated customers"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="The maximum number of customers synced per batch",
+        )
+
+    def run_once(self, **options: Any) -> int:
+        return sync_pending_stripe_customers(options["batch_size"])
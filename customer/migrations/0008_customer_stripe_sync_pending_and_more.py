@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-17 23:42
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations.state import StateApps
+
+
+def flag_unsynced_customers(
+    apps: StateApps, schema_editor: BaseDatabaseSchemaEditor
+) -> None:
+    """Only the customers without a Stripe customer need to be synced"""
+
+    Customer = apps.get_model('customer', 'Customer')
+    Customer.objects.exclude(stripe_id='').update(stripe_sync_pending=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0007_customer_updated_at_alter_customer_created_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='stripe_sync_pending',
+            field=models.BooleanField(db_comment='Whether the Stripe customer must be created or updated', default=True, help_text='Whether the Stripe customer must be created or updated'),
+        ),
+        migrations.RunPython(flag_unsynced_customers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(condition=models.Q(('stripe_sync_pending', True)), fields=['updated_at'], name='customer_stripe_sync_idx'),
+        ),
+    ]
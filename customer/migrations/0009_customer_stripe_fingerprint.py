@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 23:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0008_customer_stripe_sync_pending_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='stripe_fingerprint',
+            field=models.CharField(blank=True, db_comment='The hash of the fields last synced with Stripe', help_text='The hash of the fields last synced with Stripe', max_length=64),
+        ),
+    ]
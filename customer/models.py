@@ -1,6 +1,7 @@
 from typing import Any
 
 from django.db import models
+from django.db.models import Q
 from django_countries.fields import CountryField
 
 from furai.models import BaseModel
@@ -33,6 +34,17 @@ class Customer(BaseModel):
         db_comment="The Stripe customer identifier linked to the customer",
         blank=True,
     )
+    stripe_sync_pending = models.BooleanField(
+        help_text="Whether the Stripe customer must be created or updated",
+        db_comment="Whether the Stripe customer must be created or updated",
+        default=True,
+    )
+    stripe_fingerprint = models.CharField(
+        help_text="The hash of the fields last synced with Stripe",
+        db_comment="The hash of the fields last synced with Stripe",
+        max_length=64,
+        blank=True,
+    )
     user = models.OneToOneField(
         CustomUser,
         on_delete=models.CASCADE,
@@ -95,6 +107,16 @@ class Customer(BaseModel):
         db_comment="Customer's passport number if not Thai citizen",
     )
 
+    class Meta:
+        indexes = [
+            # Claiming the customers to sync with Stripe
+            models.Index(
+                fields=["updated_at"],
+                condition=Q(stripe_sync_pending=True),
+                name="customer_stripe_sync_idx",
+            ),
+        ]
+
     @property
     def name(self) -> str:
         return f"{self.first_name} {self.last_name}"
@@ -1,9 +1,11 @@
 from rest_framework.serializers import ModelSerializer
 
+from furai.fieldsets import SparseFieldsetSerializerMixin
+
 from .models import Customer
 
 
-class CustomerSerializer(ModelSerializer):
+class CustomerSerializer(SparseFieldsetSerializerMixin, ModelSerializer):
     class Meta:
         model = Customer
         fields = [
@@ -1,16 +1,23 @@
+import hashlib
+import json
+import logging
 import os
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 import stripe
-from django.db import transaction
+from django.db import connection, transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
+from furai.models import upsert
 from user.models import CustomUser
 
 from .errors import CUSTOMER_PASSPORT_NUMBER_REQUIRED_ERROR
 
 stripe.api_key = os.getenv("STRIPE_API_KEY")
 
+logger = logging.getLogger(__name__)
+
 THAILAND_COUNTRY_CODE = "TH"
 
 if TYPE_CHECKING:
@@ -63,21 +70,12 @@ class CustomerService:
 
     @transaction.atomic
     def create(self) -> "Customer":
-        self.validate_passport(self.address_country, self.passport)
+        """
+        Create a customer. The Stripe customer is created afterwards by the
+        Stripe sync worker, outside of the request transaction
+        """
 
-        stripe_customer = stripe.Customer.create(
-            name=f"{self.first_name} {self.last_name}",
-            email=self.user.email,
-            address={
-                "city": self.address_city,
-                "country": self.address_country,
-                "line1": self.address_line1,
-                "line2": self.address_line2,
-                "postal_code": self.address_postal_code,
-                "state": self.address_state,
-            },
-            phone=self.phone,
-        )
+        self.validate_passport(self.address_country, self.passport)
 
         customer = super(
             self.model_class._default_manager.__class__,
@@ -93,7 +91,6 @@ class CustomerService:
             last_name=self.last_name,
             passport=self.passport,
             phone=self.phone,
-            stripe_id=stripe_customer.id,
             user=self.user,
         )
 
@@ -101,25 +98,15 @@ class CustomerService:
 
     @transaction.atomic
     def update(self) -> "Customer":
+        """
+        Update a customer and flag it for the Stripe sync worker, so that the
+        request does not wait for Stripe
+        """
+
         self.validate_passport(self.address_country, self.passport)
 
         customer = get_object_or_404(self.model_class, pk=self.id)
 
-        stripe.Customer.modify(
-            customer.stripe_id,
-            name=f"{self.first_name} {self.last_name}",
-            email=self.user.email,
-            address={
-                "city": self.address_city,
-                "country": self.address_country,
-                "line1": self.address_line1,
-                "line2": self.address_line2,
-                "postal_code": self.address_postal_code,
-                "state": self.address_state,
-            },
-            phone=self.phone,
-        )
-
         (
             super(  # type: ignore
                 self.model_class._default_manager.__class__,
@@ -138,7 +125,161 @@ class CustomerService:
                 passport=self.passport,
                 phone=self.phone,
                 user=self.user,
+                stripe_sync_pending=True,
+                updated_at=timezone.now(),
             )
         )
 
         return customer
+
+    def upsert(self) -> "Customer":
+        """
+        Create or update the customer of the user with a single
+        INSERT ... ON CONFLICT statement. The customer is only flagged for the
+        Stripe sync worker if the fields synced with Stripe changed
+        """
+
+        self.validate_passport(self.address_country, self.passport)
+
+        customer = self.model_class(
+            address_city=self.address_city,
+            address_country=self.address_country,
+            address_line1=self.address_line1,
+            address_line2=self.address_line2,
+            address_postal_code=self.address_postal_code,
+            address_state=self.address_state,
+            first_name=self.first_name,
+            last_name=self.last_name,
+            passport=self.passport,
+            phone=self.phone,
+            user=self.user,
+        )
+        fingerprint = get_stripe_fingerprint(customer)
+        table_name = connection.ops.quote_name(self.model_class._meta.db_table)
+        customer = upsert(
+            customer,
+            unique_fields=["user"],
+            update_fields=[
+                "address_city",
+                "address_country",
+                "address_line1",
+                "address_line2",
+                "address_postal_code",
+                "address_state",
+                "first_name",
+                "last_name",
+                "passport",
+                "phone",
+                "updated_at",
+            ],
+            update_expressions={
+                "stripe_sync_pending": (
+                    f"{table_name}.stripe_fingerprint <> %s",
+                    [fingerprint],
+                ),
+            },
+        )
+        customer.user = self.user
+        return customer
+
+
+def get_stripe_customer_params(customer: "Customer") -> dict[str, Any]:
+    return {
+        "name": customer.name,
+        "email": customer.user.email,
+        "address": {
+            "city": customer.address_city,
+            "country": str(customer.address_country),
+            "line1": customer.address_line1,
+            "line2": customer.address_line2,
+            "postal_code": customer.address_postal_code,
+            "state": customer.address_state,
+        },
+        "phone": customer.phone,
+    }
+
+
+def get_stripe_fingerprint(customer: "Customer") -> str:
+    """Hash the fields synced with Stripe, to detect when they change"""
+
+    params = get_stripe_customer_params(customer)
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+@transaction.atomic
+def sync_stripe_customer(
+    customer_id: int, skip_locked: bool = False
+) -> "Customer | None":
+    """
+    Create or update the Stripe customer of a customer.
+    The customer row is locked during the sync, so that a customer is never
+    synced twice at the same time. With skip_locked, None is returned instead
+    of waiting for a running sync
+    """
+
+    from .models import Customer
+
+    customer = (
+        Customer.objects.select_for_update(skip_locked=skip_locked, of=("self",))
+        .select_related("user")
+        .filter(pk=customer_id)
+        .first()
+    )
+    if customer is None or not customer.stripe_sync_pending:
+        return customer
+
+    params = get_stripe_customer_params(customer)
+    fingerprint = get_stripe_fingerprint(customer)
+    if customer.stripe_id:
+        # Skip the request when only fields not synced with Stripe changed
+        if fingerprint != customer.stripe_fingerprint:
+            stripe.Customer.modify(customer.stripe_id, **params)
+    else:
+        # A retried creation returns the Stripe customer created the first time
+        stripe_customer = stripe.Customer.create(
+            **params, idempotency_key=f"customer-{customer.pk}"
+        )
+        customer.stripe_id = stripe_customer.id
+
+    customer.stripe_fingerprint = fingerprint
+    customer.stripe_sync_pending = False
+    Customer.objects.filter(pk=customer.pk).update(
+        stripe_id=customer.stripe_id,
+        stripe_fingerprint=fingerprint,
+        stripe_sync_pending=False,
+    )
+    return customer
+
+
+def sync_pending_stripe_customers(batch_size: int) -> int:
+    """
+    Sync the customers flagged for the Stripe sync worker, the least recently
+    updated first. Returns the number of synced customers
+    """
+
+    from .models import Customer
+
+    synced_count = 0
+    failed_ids: list[int] = []
+    while synced_count + len(failed_ids) < batch_size:
+        customer_id = (
+            Customer.objects.filter(stripe_sync_pending=True)
+            .exclude(pk__in=failed_ids)
+            .order_by("updated_at")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if customer_id is None:
+            break
+        try:
+            customer = sync_stripe_customer(customer_id, skip_locked=True)
+        except stripe.StripeError as error:
+            logger.warning("Could not sync customer %s: %s", customer_id, error)
+            failed_ids.append(customer_id)
+            continue
+        if customer is None:
+            # Being synced by another worker
+            failed_ids.append(customer_id)
+            continue
+        synced_count += 1
+    return synced_count
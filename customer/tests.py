@@ -1,8 +1,17 @@
+import csv
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
 from faker import Faker
 from rest_framework.exceptions import ValidationError
-from rest_framework.status import HTTP_200_OK, HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_304_NOT_MODIFIED,
+    HTTP_401_UNAUTHORIZED,
+    HTTP_403_FORBIDDEN,
+)
 from rest_framework.test import APITestCase
 
 from furai.tests.mocks import enable_stripe_mock
@@ -10,6 +19,7 @@ from furai.tests.utils import TestClientAuthenticator
 from user.models import CustomUser
 
 from .models import Customer
+from .services import CustomerService
 
 fake = Faker()
 
@@ -111,6 +121,82 @@ class CustomerTestCase(TestCase):
             == f"{self.customer.first_name} {self.customer.last_name}"
         )
 
+    def sync_stripe_customers(self):
+        call_command("sync_stripe_customers", "--once", stdout=StringIO())
+
+    def test_create_customer_stripe_sync(self):
+        """Ensures the Stripe customer is created by the Stripe sync worker"""
+
+        assert self.stripe_mock.create_calls == []
+        assert self.customer.stripe_sync_pending
+        self.sync_stripe_customers()
+        self.customer.refresh_from_db()
+        assert self.customer.stripe_id == "cus_123"
+        assert not self.customer.stripe_sync_pending
+        assert len(self.stripe_mock.create_calls) == 1
+        create_call = self.stripe_mock.create_calls[0]
+        assert create_call["email"] == self.user.email
+        assert create_call["idempotency_key"] == f"customer-{self.customer.pk}"
+
+        # Synced customers are not synced again
+        self.sync_stripe_customers()
+        assert len(self.stripe_mock.create_calls) == 1
+        assert self.stripe_mock.modify_calls == []
+
+    def test_update_customer_stripe_sync(self):
+        """Ensures an updated customer is synced with Stripe by the worker"""
+
+        self.sync_stripe_customers()
+        first_name = fake.first_name()
+        CustomerService(
+            address_city=self.customer.address_city,
+            address_country=self.customer.address_country,
+            address_line1=self.customer.address_line1,
+            address_postal_code=self.customer.address_postal_code,
+            first_name=first_name,
+            last_name=self.customer.last_name,
+            phone=self.customer.phone,
+            passport=self.customer.passport,
+            user=self.user,
+            id=self.customer.pk,
+        ).update()
+        self.customer.refresh_from_db()
+        assert self.customer.stripe_sync_pending
+        assert self.stripe_mock.modify_calls == []
+
+        self.sync_stripe_customers()
+        self.customer.refresh_from_db()
+        assert not self.customer.stripe_sync_pending
+        stripe_id, params = self.stripe_mock.modify_calls[0]
+        assert stripe_id == "cus_123"
+        assert params["name"] == f"{first_name} {self.customer.last_name}"
+
+    def test_update_customer_stripe_sync_unchanged(self):
+        """Ensures Stripe is not called when the synced fields did not change"""
+
+        self.sync_stripe_customers()
+        Customer.objects.filter(pk=self.customer.pk).update(
+            passport=fake.passport_number(), stripe_sync_pending=True
+        )
+        self.sync_stripe_customers()
+        self.customer.refresh_from_db()
+        assert not self.customer.stripe_sync_pending
+        assert self.stripe_mock.modify_calls == []
+
+    def test_stripe_sync_failure(self):
+        """Ensures a customer is synced again after a Stripe error"""
+
+        self.stripe_mock.fail = True
+        self.sync_stripe_customers()
+        self.customer.refresh_from_db()
+        assert self.customer.stripe_sync_pending
+        assert self.customer.stripe_id == ""
+
+        self.stripe_mock.fail = False
+        self.sync_stripe_customers()
+        self.customer.refresh_from_db()
+        assert not self.customer.stripe_sync_pending
+
 
 class CustomerAPITestCase(APITestCase):
     def setUp(self):
@@ -140,6 +226,32 @@ class CustomerAPITestCase(APITestCase):
         assert response.data["passport"] == self.customer.passport
         TestClientAuthenticator.authenticate_logout(self.client)
 
+    def test_retrieve_current_customer_not_modified(self):
+        """Returns a 304 response if the customer did not change since the last request"""
+
+        TestClientAuthenticator.authenticate(self.client, self.user)
+        url = reverse("customers-me")
+        response = self.client.get(url, format="json")
+        assert response.headers["Last-Modified"]
+        not_modified_response = self.client.get(
+            url,
+            format="json",
+            HTTP_IF_MODIFIED_SINCE=response.headers["Last-Modified"],
+        )
+        assert not_modified_response.status_code == HTTP_304_NOT_MODIFIED
+        not_modified_response = self.client.get(
+            url, format="json", HTTP_IF_NONE_MATCH=response.headers["ETag"]
+        )
+        assert not_modified_response.status_code == HTTP_304_NOT_MODIFIED
+        self.customer.first_name = fake.first_name()
+        self.customer.save()
+        modified_response = self.client.get(
+            url, format="json", HTTP_IF_NONE_MATCH=response.headers["ETag"]
+        )
+        assert modified_response.status_code == HTTP_200_OK
+        assert modified_response.data["first_name"] == self.customer.first_name
+        TestClientAuthenticator.authenticate_logout(self.client)
+
     def test_retrieve_current_customer_unauthenticated(self):
         """Prevent retrieving the current customer if not authenticated"""
 
@@ -150,6 +262,7 @@ class CustomerAPITestCase(APITestCase):
     def test_update_customer(self):
         """Correctly update a customer instance"""
 
+        Customer.objects.filter(pk=self.customer.pk).update(stripe_sync_pending=False)
         TestClientAuthenticator.authenticate(self.client, self.user)
         url = reverse("customers-detail", kwargs={"pk": self.customer.id})
         first_name = fake.first_name()
@@ -159,6 +272,7 @@ class CustomerAPITestCase(APITestCase):
         assert response.status_code == HTTP_200_OK
         self.customer.refresh_from_db()
         assert self.customer.first_name == first_name
+        assert self.customer.stripe_sync_pending
         TestClientAuthenticator.authenticate_logout(self.client)
 
     def test_update_customer_unauthenticated(self):
@@ -181,3 +295,28 @@ class CustomerAPITestCase(APITestCase):
         )
         assert response.status_code == HTTP_403_FORBIDDEN
         TestClientAuthenticator.authenticate_logout(self.client)
+
+    def test_export_customers(self):
+        """Streams the customers as a CSV file to the staff"""
+
+        set_up_customer_list()
+        staff_user = CustomUser.objects.create_user(
+            email=fake.email(), password=fake.password(), is_staff=True
+        )
+        TestClientAuthenticator.authenticate(self.client, staff_user)
+        response = self.client.get(reverse("customers-export"))
+        assert response.status_code == HTTP_200_OK
+        assert response["Content-Type"] == "text/csv"
+        rows = list(csv.DictReader(StringIO(response.getvalue().decode())))
+        assert len(rows) == Customer.objects.count()
+        assert rows[0]["email"] == self.user.email
+        assert "passport" not in rows[0]
+        TestClientAuthenticator.authenticate_logout(self.client)
+
+    def test_export_customers_not_authorized(self):
+        """Prevent exporting the customers if the user is not staff"""
+
+        TestClientAuthenticator.authenticate(self.client, self.user)
+        response = self.client.get(reverse("customers-export"))
+        assert response.status_code == HTTP_403_FORBIDDEN
+        TestClientAuthenticator.authenticate_logout(self.client)
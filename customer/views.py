@@ -1,17 +1,35 @@
+from typing import cast
+
+from django.http.response import HttpResponseBase
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
 from rest_framework.mixins import RetrieveModelMixin, UpdateModelMixin
+from rest_framework.permissions import IsAdminUser
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
 from rest_framework.status import HTTP_200_OK
 from rest_framework.viewsets import GenericViewSet
 
+from furai.conditional import ConditionalGetMixin
+from furai.exports import export_queryset, parse_export_options
+from furai.fieldsets import SparseFieldsetMixin
+from furai.utils import parse_period
+from user.models import CustomUser
+
+from .exports import CUSTOMER_EXPORT_COLUMNS
 from .models import Customer
 from .permissions import IsCustomerUser
 from .serializers import CustomerSerializer
 
 
-class CustomerViewSet(RetrieveModelMixin, UpdateModelMixin, GenericViewSet):
+class CustomerViewSet(
+    SparseFieldsetMixin,
+    ConditionalGetMixin,
+    RetrieveModelMixin,
+    UpdateModelMixin,
+    GenericViewSet,
+):
     """
     Retrieve or update a customer instance
     """
@@ -24,6 +42,34 @@ class CustomerViewSet(RetrieveModelMixin, UpdateModelMixin, GenericViewSet):
     def me(self, request: Request, *args: str, **kwargs: str) -> Response:
         """Retrieve the customer instance from current authenticated user"""
 
-        customer = get_object_or_404(Customer, user=self.request.user)
-        serializer = CustomerSerializer(customer)
-        return Response(serializer.data, status=HTTP_200_OK)
+        user = cast(CustomUser, self.request.user)
+        queryset = self.filter_queryset(Customer.objects.filter(user=user))
+
+        def get_response() -> Response:
+            customer = get_object_or_404(queryset)
+            serializer = self.get_serializer(customer)
+            return Response(serializer.data, status=HTTP_200_OK)
+
+        return self.get_conditional_response(request, get_response, queryset)
+
+    @action(detail=False, permission_classes=[IsAdminUser])
+    def export(self, request: Request, *args: str, **kwargs: str) -> HttpResponseBase:
+        """
+        Stream the customers as a CSV or NDJSON file, optionally gzip compressed,
+        filtered by creation date period. Staff only
+        """
+
+        output, compress = parse_export_options(request.query_params)
+        queryset = Customer.objects.order_by("pk")
+        period = parse_period(request.query_params, "start", "end")
+        if period is not None:
+            queryset = queryset.filter(
+                created_at__gte=period[0], created_at__lt=period[1]
+            )
+        return export_queryset(
+            queryset, CUSTOMER_EXPORT_COLUMNS, "customers", output, compress
+        )
+
+    def perform_update(self, serializer: BaseSerializer) -> None:
+        # The Stripe customer is updated by the Stripe sync worker
+        serializer.save(stripe_sync_pending=True)
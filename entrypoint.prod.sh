@@ -1,5 +1,12 @@
 #!/usr/bin/env bash
 
+# Worker containers run a management command given as arguments,
+# e.g. entrypoint.prod.sh process_stripe_events
+if [ "$#" -gt 0 ]; then
+    exec python manage.py "$@"
+fi
+
 python manage.py collectstatic --noinput
 python manage.py migrate --noinput
-python -m gunicorn --bind 0.0.0.0:8000 --workers 3 furai.wsgi:application
\ No newline at end of file
+python manage.py createcachetable
+exec python -m gunicorn --bind 0.0.0.0:8000 --workers 3 furai.wsgi:application
@@ -0,0 +1,172 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any, Protocol
+
+from django.core.cache import caches
+from django.db import transaction
+
+# Returned by the cache backends when a key is missing or expired
+MISS = object()
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> Any: ...
+
+    def set(self, key: str, value: Any) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+class LRUCacheBackend:
+    """
+    In-process cache keeping the most recently used entries
+    """
+
+    def __init__(self, max_entries: int = 1024, timeout: float | None = None) -> None:
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries: OrderedDict[str, tuple[float | None, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return MISS
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = (
+            time.monotonic() + self.timeout if self.timeout is not None else None
+        )
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoCacheBackend:
+    """
+    Cache shared between processes, stored in one of the CACHES aliases
+    """
+
+    def __init__(self, alias: str = "default", timeout: float | None = None) -> None:
+        self.alias = alias
+        self.timeout = timeout
+
+    def get(self, key: str) -> Any:
+        return caches[self.alias].get(key, MISS)
+
+    def set(self, key: str, value: Any) -> None:
+        caches[self.alias].set(key, value, self.timeout)
+
+    def clear(self) -> None:
+        caches[self.alias].clear()
+
+
+def get_cache_backend(options: dict[str, Any]) -> CacheBackend:
+    """Build a cache backend from its settings"""
+
+    if options["BACKEND"] == "lru":
+        return LRUCacheBackend(
+            max_entries=options.get("MAX_ENTRIES", 1024),
+            timeout=options.get("TIMEOUT"),
+        )
+    if options["BACKEND"] == "django":
+        return DjangoCacheBackend(
+            alias=options.get("ALIAS", "default"),
+            timeout=options.get("TIMEOUT"),
+        )
+    raise ValueError(f"Unknown cache backend: {options['BACKEND']}")
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Run a single computation per key at a time.
+    Concurrent callers for the same key wait for the result of the running call
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class VersionCounter:
+    """
+    Version number of a set of data, shared between processes through a cache.
+    Bumping the version invalidates every cache entry keyed with the previous one
+    """
+
+    def __init__(self, key: str, alias: str = "default") -> None:
+        self.key = key
+        self.alias = alias
+
+    def get(self) -> int:
+        cache = caches[self.alias]
+        version = cache.get(self.key)
+        if version is None:
+            # Start from the current time so that a lost counter never goes back
+            # to a version that may still be used by cached entries
+            cache.add(self.key, time.time_ns() // 1000, timeout=None)
+            version = cache.get(self.key)
+        return int(version)
+
+    def bump(self) -> None:
+        cache = caches[self.alias]
+        try:
+            cache.incr(self.key)
+        except ValueError:
+            self.get()
+            cache.incr(self.key)
+
+    def bump_on_commit(self) -> None:
+        """
+        Bump the version now and once the current transaction commits, so that
+        entries cached by readers racing the commit are invalidated too
+        """
+
+        self.bump()
+        transaction.on_commit(self.bump)
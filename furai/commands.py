@@ -0,0 +1,50 @@
+import signal
+import time
+from types import FrameType
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+
+class WorkerCommand(BaseCommand):
+    """
+    Management command processing work in a loop until it is stopped.
+    The loop sleeps when there was nothing to process
+    """
+
+    default_interval = 5.0
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process a single batch and exit, e.g. from a cron job",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=self.default_interval,
+            help="The number of seconds to wait when there is nothing to process",
+        )
+
+    def run_once(self, **options: Any) -> int:
+        """Process a batch of work and return the number of processed items"""
+
+        raise NotImplementedError
+
+    def stop(self, signum: int, frame: FrameType | None) -> None:
+        self.is_stopping = True
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options["once"]:
+            count = self.run_once(**options)
+            self.stdout.write(self.style.SUCCESS(f"Processed {count} items"))
+            return
+
+        # Finish the current batch before exiting
+        self.is_stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        while not self.is_stopping:
+            if not self.run_once(**options):
+                time.sleep(options["interval"])
@@ -0,0 +1,100 @@
+import hashlib
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+from django.db.models import Count, Max
+from django.db.models.query import QuerySet
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.generics import GenericAPIView
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
+
+
+def make_etag(request: Request, *parts: Any) -> str:
+    """
+    Build an ETag from the values identifying a version of the requested data.
+    The URL, the user and the media type are included as they change the response
+    """
+
+    accepted_media_type = getattr(request, "accepted_media_type", "")
+    digest = hashlib.md5(
+        ":".join(
+            str(part)
+            for part in (
+                request.get_full_path(),
+                request.user.pk,
+                accepted_media_type,
+                *parts,
+            )
+        ).encode()
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+class ConditionalGetMixin(GenericAPIView):
+    """
+    Answer conditional GET requests (If-None-Match, If-Modified-Since) with a
+    304 response when the requested data did not change, without serializing it
+    """
+
+    def get_conditional_queryset(self) -> QuerySet:
+        """Return the queryset of the requested objects"""
+
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            queryset = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        return queryset
+
+    def get_conditional_validators(
+        self, request: Request, queryset: QuerySet | None = None
+    ) -> tuple[str | None, datetime | None]:
+        """
+        Return the ETag and the last modification date of the requested objects,
+        probed with a single MAX(updated_at) and COUNT query
+        """
+
+        if queryset is None:
+            queryset = self.get_conditional_queryset()
+        probe = queryset.aggregate(last_modified=Max("updated_at"), count=Count("pk"))
+        last_modified: datetime | None = probe["last_modified"]
+        etag = make_etag(
+            request,
+            probe["count"],
+            last_modified.isoformat() if last_modified is not None else "",
+        )
+        return etag, last_modified
+
+    def get_conditional_response(
+        self,
+        request: Request,
+        get_response: Callable[[], Response],
+        queryset: QuerySet | None = None,
+    ) -> Response:
+        """Return a 304 response if the client data is up to date"""
+
+        etag, last_modified = self.get_conditional_validators(request, queryset)
+        last_modified_timestamp = (
+            int(last_modified.timestamp()) if last_modified is not None else None
+        )
+        precondition_response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified_timestamp,
+        )
+        if precondition_response is not None:
+            response = Response(status=precondition_response.status_code)
+        else:
+            response = get_response()
+
+        if response.status_code in (HTTP_200_OK, HTTP_304_NOT_MODIFIED):
+            if etag is not None:
+                response.headers["ETag"] = etag
+            if last_modified_timestamp is not None:
+                response.headers["Last-Modified"] = http_date(last_modified_timestamp)
+        return response
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from rest_framework import exceptions, status
+
+PERIOD_INCOMPLETE_ERROR = exceptions.ValidationError(
+    detail={"period": "Both the start and the end of the period are required"},
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
+
+PERIOD_INVALID_DATE_ERROR = exceptions.ValidationError(
+    detail={"period": "The start and the end of the period must be ISO 8601 dates"},
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
+
+PERIOD_END_BEFORE_START_ERROR = exceptions.ValidationError(
+    detail={"period": "The end of the period must be after its start"},
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
+
+
+def get_period_too_long_error(max_duration: timedelta) -> exceptions.ValidationError:
+    """Return the error of a period longer than the maximum duration"""
+
+    return exceptions.ValidationError(
+        detail={"period": f"The period cannot be longer than {max_duration}"},
+        code=str(status.HTTP_400_BAD_REQUEST),
+    )
+
+
+PAGINATION_INVALID_CURSOR_ERROR = exceptions.ValidationError(
+    detail={"cursor": "Invalid pagination cursor"},
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
+
+FIELDSET_INVALID_FIELD_ERROR = exceptions.ValidationError(
+    detail={"fields": "Unknown field requested in the fields or omit query params"},
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
+
+EXPORT_INVALID_OUTPUT_ERROR = exceptions.ValidationError(
+    detail={"output": "The export output must be csv or ndjson"},
+    code=str(status.HTTP_400_BAD_REQUEST),
+)
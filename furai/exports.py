@@ -0,0 +1,127 @@
+import csv
+import re
+import zlib
+from collections.abc import Iterable, Iterator, Mapping
+from datetime import date
+from typing import Any
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.query import QuerySet
+from django.http import QueryDict, StreamingHttpResponse
+
+from .errors import EXPORT_INVALID_OUTPUT_ERROR
+
+# Number of rows fetched at a time from the server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+# Approximate size of the chunks written to the response
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+# First characters of the cells run as formulas by spreadsheet applications
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+# Numbers and phone numbers starting with + or - are left unescaped
+CSV_NUMBER_PATTERN = re.compile(r"^[+-][\d\s().-]+$")
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class Echo:
+    """File-like object returning the written value, to stream the CSV writer"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def parse_export_options(query_params: QueryDict) -> tuple[str, bool]:
+    """Parse the output format and the gzip compression of an export"""
+
+    output = query_params.get("output", "csv")
+    if output not in EXPORT_CONTENT_TYPES:
+        raise EXPORT_INVALID_OUTPUT_ERROR
+    return output, query_params.get("gzip", "").lower() in ("1", "true")
+
+
+def format_csv_value(value: Any) -> Any:
+    """Format a CSV cell, escaping the text read as a formula by spreadsheets"""
+
+    if isinstance(value, date):
+        return value.isoformat()
+    if not isinstance(value, str) or not value.startswith(CSV_FORMULA_PREFIXES):
+        return value
+    if CSV_NUMBER_PATTERN.match(value):
+        return value
+    return f"'{value}"
+
+
+def iter_csv(columns: Iterable[str], rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([format_csv_value(value) for value in row])
+
+
+def iter_ndjson(columns: Iterable[str], rows: Iterable[tuple]) -> Iterator[str]:
+    encoder = DjangoJSONEncoder()
+    column_names = list(columns)
+    for row in rows:
+        yield encoder.encode(dict(zip(column_names, row))) + "\n"
+
+
+def iter_chunks(lines: Iterable[str]) -> Iterator[bytes]:
+    """Group lines in chunks of about EXPORT_BUFFER_SIZE bytes"""
+
+    buffer: list[bytes] = []
+    size = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= EXPORT_BUFFER_SIZE:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def iter_gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    # A window of 16 + MAX_WBITS writes the gzip header and trailer
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_queryset(
+    queryset: QuerySet,
+    columns: Mapping[str, str],
+    filename: str,
+    output: str = "csv",
+    compress: bool = False,
+) -> StreamingHttpResponse:
+    """
+    Stream a queryset as a CSV or NDJSON file, with one column per lookup of
+    the columns mapping. Rows are read from a server-side cursor, so that the
+    memory usage does not depend on the number of exported rows
+    """
+
+    rows: Iterable[tuple[Any, ...]] = queryset.values_list(*columns.values()).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+    iter_lines = iter_csv if output == "csv" else iter_ndjson
+    stream = iter_chunks(iter_lines(columns.keys(), rows))
+
+    filename = f"{filename}.{output}"
+    content_type = EXPORT_CONTENT_TYPES[output]
+    if compress:
+        stream = iter_gzip(stream)
+        filename = f"{filename}.gz"
+        content_type = "application/gzip"
+
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
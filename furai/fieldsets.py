@@ -0,0 +1,122 @@
+from typing import Any, cast
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.query import QuerySet
+from rest_framework import serializers
+from rest_framework.generics import GenericAPIView
+from rest_framework.permissions import SAFE_METHODS
+
+from .errors import FIELDSET_INVALID_FIELD_ERROR
+
+
+class SparseFieldsetSerializerMixin(serializers.Serializer):
+    """
+    Trim the serializer fields to the ones listed in the fields context value,
+    minus the ones listed in the omit context value
+    """
+
+    # Model fields read by serializer fields that are not model fields, e.g.
+    # properties or method fields. Relations are fetched by the view
+    field_sources: dict[str, tuple[str, ...]] = {}
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        fields: set[str] | None = self.context.get("fields")
+        omit: set[str] = self.context.get("omit", set())
+        requested_fields = (fields or set()) | omit
+        if not requested_fields.issubset(self.fields):
+            raise FIELDSET_INVALID_FIELD_ERROR
+        for field_name in list(self.fields):
+            if (fields and field_name not in fields) or field_name in omit:
+                self.fields.pop(field_name)
+
+    def get_model_field_names(self) -> set[str] | None:
+        """
+        Return the names of the model fields read to serialize an instance,
+        or None if they cannot be known
+        """
+
+        model = self.Meta.model  # type: ignore[attr-defined]
+        field_names: set[str] = set()
+        for field_name, field in self.fields.items():
+            if field.write_only:
+                continue
+            sources = self.field_sources.get(field_name, (cast(str, field.source),))
+            for source in sources:
+                if source == "*":
+                    return None
+                try:
+                    model_field = model._meta.get_field(source.split(".")[0])
+                except FieldDoesNotExist:
+                    return None
+                # Many to many and reverse relations are not columns of the model
+                if model_field.concrete and not model_field.many_to_many:
+                    field_names.add(model_field.name)
+        return field_names
+
+
+class SparseFieldsetMixin(GenericAPIView):
+    """
+    Serialize the fields listed in the fields query param, minus the ones listed
+    in the omit query param, and only load their columns from the database
+    """
+
+    fields_query_param = "fields"
+    omit_query_param = "omit"
+
+    def get_fieldset_param(self, name: str) -> set[str] | None:
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        return {field_name.strip() for field_name in value.split(",")}
+
+    def uses_sparse_fieldset(self) -> bool:
+        """Return whether the request asks for a subset of the fields"""
+
+        # Write requests need every field to validate and save their data
+        request = getattr(self, "request", None)
+        return (
+            request is not None
+            and request.method in SAFE_METHODS
+            and (
+                self.fields_query_param in request.query_params
+                or self.omit_query_param in request.query_params
+            )
+        )
+
+    def get_serializer_context(self) -> dict[str, Any]:
+        context = super().get_serializer_context()
+        if self.uses_sparse_fieldset():
+            context["fields"] = self.get_fieldset_param(self.fields_query_param)
+            context["omit"] = self.get_fieldset_param(self.omit_query_param) or set()
+        return context
+
+    def includes_field(self, field_name: str) -> bool:
+        """Return whether a field is part of the serialized fields"""
+
+        serializer = self.get_serializer()
+        return (
+            isinstance(serializer, serializers.Serializer)
+            and field_name in serializer.fields
+        )
+
+    def filter_queryset(self, queryset: QuerySet) -> QuerySet:
+        queryset = super().filter_queryset(queryset)
+        if not self.uses_sparse_fieldset():
+            return queryset
+
+        serializer = self.get_serializer()
+        if not isinstance(serializer, SparseFieldsetSerializerMixin):
+            return queryset
+        field_names = serializer.get_model_field_names()
+        if field_names is None:
+            return queryset
+
+        # Keep the primary key and the ordering fields, read by the pagination
+        field_names.add(queryset.model._meta.pk.name)
+        for ordering_field in queryset.query.order_by or queryset.model._meta.ordering:
+            if isinstance(ordering_field, str):
+                field_name = ordering_field.lstrip("-").split("__")[0]
+                if field_name != "pk":
+                    field_names.add(field_name)
+        return queryset.only(*field_names)
@@ -1,6 +1,11 @@
-from django.db import models
+from collections.abc import Mapping, Sequence
+from typing import Any, TypeVar, cast
+
+from django.db import connection, models
 from django.utils import timezone
 
+ModelT = TypeVar("ModelT", bound=models.Model)
+
 
 class BaseModel(models.Model):
     """Base model containing common properties"""
@@ -18,3 +23,52 @@ class BaseModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+def upsert(
+    instance: ModelT,
+    unique_fields: Sequence[str],
+    update_fields: Sequence[str],
+    update_expressions: Mapping[str, tuple[str, Sequence[Any]]] | None = None,
+) -> ModelT:
+    """
+    Insert a model instance, or update the row conflicting on the unique fields,
+    with a single INSERT ... ON CONFLICT statement returning the stored row.
+    The update expressions set fields from SQL expressions, where the existing
+    row is referenced by the table name and the inserted row by EXCLUDED
+    """
+
+    model = type(instance)
+    meta = model._meta
+    quote_name = connection.ops.quote_name
+    concrete_fields = [field for field in meta.fields if field.concrete]
+    fields = [field for field in concrete_fields if not field.primary_key]
+
+    def get_column(name: str) -> str:
+        return quote_name(cast(models.Field, meta.get_field(name)).column)
+
+    assignments = [
+        f"{get_column(name)} = EXCLUDED.{get_column(name)}" for name in update_fields
+    ]
+    params: list[Any] = [
+        field.get_db_prep_save(field.pre_save(instance, True), connection)
+        for field in fields
+    ]
+    for name, (expression, expression_params) in (update_expressions or {}).items():
+        assignments.append(f"{get_column(name)} = {expression}")
+        params.extend(expression_params)
+
+    sql = f"""
+        INSERT INTO {quote_name(meta.db_table)}
+            ({", ".join(quote_name(field.column) for field in fields)})
+        VALUES ({", ".join(["%s"] * len(fields))})
+        ON CONFLICT ({", ".join(get_column(name) for name in unique_fields)})
+        DO UPDATE SET {", ".join(assignments)}
+        RETURNING {", ".join(quote_name(field.column) for field in concrete_fields)}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return model.from_db(
+        connection.alias, [field.attname for field in concrete_fields], row
+    )
@@ -0,0 +1,182 @@
+import base64
+import json
+from typing import Any, cast
+
+from django.core.exceptions import ValidationError
+from django.db.models import Field, Model, Q
+from django.db.models.query import QuerySet
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+
+from .errors import PAGINATION_INVALID_CURSOR_ERROR
+
+
+def get_concrete_field(model: type[Model], name: str) -> Field:
+    field = model._meta.get_field(name)
+    assert isinstance(field, Field), "Keyset pagination requires concrete fields"
+    return field
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate a queryset from its ordering with an opaque cursor, ending with a
+    tiebreak on the primary key. Pages are fetched without COUNT queries nor
+    OFFSETs, so their cost does not grow with the table size or the page depth.
+
+    Clients needing the total count opt in to page number pagination with the
+    page query param
+    """
+
+    cursor_query_param = "cursor"
+    page_query_param = "page"
+    page_size = cast(int, api_settings.PAGE_SIZE)
+    page_number_pagination_class = PageNumberPagination
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request, view: APIView | None = None
+    ) -> list[Any] | None:
+        self.request = request
+        self.page_number_paginator: PageNumberPagination | None = None
+        if self.page_query_param in request.query_params:
+            self.page_number_paginator = self.page_number_pagination_class()
+            return self.page_number_paginator.paginate_queryset(queryset, request, view)
+
+        self.ordering = self.get_ordering(queryset)
+        cursor = self.decode_cursor(request, queryset.model)
+        is_reversed = cursor is not None and cursor["reverse"]
+
+        if cursor is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(cursor["values"], is_reversed)
+            )
+        order_by = [
+            f"-{name}" if is_descending != is_reversed else name
+            for name, is_descending in self.ordering
+        ]
+        results = list(queryset.order_by(*order_by)[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if is_reversed:
+            results.reverse()
+
+        self.next_cursor = self.previous_cursor = None
+        if results:
+            if has_more or is_reversed:
+                self.next_cursor = self.encode_cursor(results[-1], reverse=False)
+            if cursor is not None and (has_more or not is_reversed):
+                self.previous_cursor = self.encode_cursor(results[0], reverse=True)
+        return results
+
+    def get_ordering(self, queryset: QuerySet) -> list[tuple[str, bool]]:
+        """
+        Return the ordering of the queryset as (field name, is descending) pairs,
+        ending with the primary key to make it unique
+        """
+
+        pk_name = queryset.model._meta.pk.name
+        ordering: list[tuple[str, bool]] = []
+        for field in queryset.query.order_by or queryset.model._meta.ordering:
+            assert isinstance(field, str), "Keyset pagination requires field names"
+            name = field.lstrip("-")
+            ordering.append((pk_name if name == "pk" else name, field.startswith("-")))
+
+        if pk_name not in [name for name, is_descending in ordering]:
+            is_descending = ordering[-1][1] if ordering else False
+            ordering.append((pk_name, is_descending))
+        return ordering
+
+    def get_keyset_filter(self, values: list[Any], is_reversed: bool) -> Q:
+        """Filter the rows located after the cursor in the queryset ordering"""
+
+        keyset_filter = Q()
+        for index, (name, is_descending) in enumerate(self.ordering):
+            lookup = "lt" if is_descending != is_reversed else "gt"
+            condition = Q(**{f"{name}__{lookup}": values[index]})
+            for previous_index, (previous_name, _) in enumerate(self.ordering[:index]):
+                condition &= Q(**{previous_name: values[previous_index]})
+            keyset_filter |= condition
+
+        # Bound the first ordering field so that the index range scan can be used
+        name, is_descending = self.ordering[0]
+        lookup = "lte" if is_descending != is_reversed else "gte"
+        return Q(**{f"{name}__{lookup}": values[0]}) & keyset_filter
+
+    def encode_cursor(self, instance: Model, reverse: bool) -> str:
+        values = [
+            get_concrete_field(type(instance), name).value_to_string(instance)
+            for name, is_descending in self.ordering
+        ]
+        payload = json.dumps({"values": values, "reverse": reverse})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(
+        self, request: Request, model: type[Model]
+    ) -> dict[str, Any] | None:
+        encoded_cursor = request.query_params.get(self.cursor_query_param)
+        if encoded_cursor is None:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded_cursor.encode()))
+            values = payload["values"]
+            if len(values) != len(self.ordering):
+                raise ValueError("Invalid cursor length")
+            return {
+                "values": [
+                    get_concrete_field(model, name).to_python(value)
+                    for (name, is_descending), value in zip(self.ordering, values)
+                ],
+                "reverse": bool(payload["reverse"]),
+            }
+        except (TypeError, ValueError, KeyError, ValidationError) as error:
+            raise PAGINATION_INVALID_CURSOR_ERROR from error
+
+    def get_page_link(self, cursor: str | None) -> str | None:
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data: Any) -> Response:
+        if self.page_number_paginator is not None:
+            return self.page_number_paginator.get_paginated_response(data)
+        return Response(
+            {
+                "next": self.get_page_link(self.next_cursor),
+                "previous": self.get_page_link(self.previous_cursor),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view: APIView) -> list[dict[str, Any]]:
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_query_param,
+                "required": False,
+                "in": "query",
+                "description": "A page number, to paginate with a total count",
+                "schema": {"type": "integer"},
+            },
+        ]
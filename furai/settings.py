@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import os
 from pathlib import Path
+from typing import Any
 from urllib.parse import urlparse
 
 from dotenv import load_dotenv
@@ -59,6 +60,7 @@ INSTALLED_APPS = [
     "user",
     "customer",
     "booking",
+    "notification",
 ]
 
 MIDDLEWARE = [
@@ -98,7 +100,7 @@ APPEND_SLASH = False
 # Django REST Framework
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "furai.pagination.KeysetPagination",
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework.authentication.TokenAuthentication",
     ),
@@ -166,6 +168,49 @@ DATABASES: dict[str, dict[str, str | int | bytes | None]] = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The cache must be shared between processes (database, Redis..), as it stores
+# the catalog and availability versions. The database cache table is created
+# with the createcachetable command
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "DJANGO_CACHE_BACKEND", "django.core.cache.backends.db.DatabaseCache"
+        ),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", "furai_cache"),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
+# Car catalog response cache
+# "lru" keeps responses in the memory of each process,
+# "django" stores them in the ALIAS cache from CACHES
+
+CAR_CATALOG_CACHE: dict[str, Any] = {
+    "BACKEND": os.getenv("CAR_CATALOG_CACHE_BACKEND", "lru"),
+    "ALIAS": "default",
+    "MAX_ENTRIES": 1024,
+    "TIMEOUT": 60 * 60,
+}
+
+# Responses of requests sent with an Idempotency-Key header are replayed to the
+# retries of the request during this number of seconds
+
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+
+# Unpaid bookings hold their car during this number of seconds, after which
+# they are expired by the expire_bookings command
+
+BOOKING_HOLD_TTL = int(os.getenv("BOOKING_HOLD_TTL", 30 * 60))
+
+# Maximum duration of a booked or quoted time period, in seconds, which bounds
+# the size of the pricing tables
+
+BOOKING_MAX_DURATION = int(os.getenv("BOOKING_MAX_DURATION", 90 * 24 * 60 * 60))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -1,6 +1,9 @@
+from types import SimpleNamespace
 from typing import Any
 from unittest.mock import patch
 
+import stripe
+
 
 class StripeCustomer:
     def __init__(self, id: str = "cus_123") -> None:
@@ -11,15 +14,80 @@ class StripeMock:
     def __init__(self) -> None:
         self.create_calls: list = []
         self.modify_calls: list = []
+        self.payment_intent_create_calls: list = []
+        self.payment_intent_cancel_calls: list = []
+        self.refund_create_calls: list = []
+        self.payment_intents: list[dict[str, Any]] = []
+        self.payment_intent_list_calls = 0
+        self.fail = False
 
     def customer_create(self, **kwargs: Any) -> StripeCustomer:
+        if self.fail:
+            raise stripe.APIConnectionError("Stripe unavailable")
         self.create_calls.append(kwargs)
         return StripeCustomer()
 
     def customer_modify(self, id: str, **kwargs: Any) -> None:
+        if self.fail:
+            raise stripe.APIConnectionError("Stripe unavailable")
         self.modify_calls.append((id, kwargs))
         return None
 
+    def payment_intent_create(self, **kwargs: Any) -> dict[str, Any]:
+        self.payment_intent_create_calls.append(kwargs)
+        return {"id": "pi_123", "client_secret": "pi_123_secret_123"}
+
+    def payment_intent_cancel(self, id: str, **kwargs: Any) -> dict[str, Any]:
+        if self.fail:
+            raise stripe.APIConnectionError("Stripe unavailable")
+        self.payment_intent_cancel_calls.append((id, kwargs))
+        return {"id": id, "status": "canceled"}
+
+    def refund_create(self, **kwargs: Any) -> dict[str, Any]:
+        if self.fail:
+            raise stripe.APIConnectionError("Stripe unavailable")
+        self.refund_create_calls.append(kwargs)
+        return {"id": "re_123", "status": "succeeded"}
+
+    def add_payment_intent(
+        self, booking_id: Any, status: str, created: int
+    ) -> dict[str, Any]:
+        """Add a payment intent listed by payment_intent_list"""
+
+        payment_intent = {
+            "id": f"pi_{len(self.payment_intents)}",
+            "status": status,
+            "created": created,
+            "metadata": {"booking_id": str(booking_id)} if booking_id else {},
+        }
+        self.payment_intents.append(payment_intent)
+        return payment_intent
+
+    def payment_intent_list(
+        self,
+        created: dict[str, int],
+        limit: int = 10,
+        starting_after: str | None = None,
+    ) -> SimpleNamespace:
+        self.payment_intent_list_calls += 1
+        # Stripe lists the most recent payment intents first
+        payment_intents = sorted(
+            (
+                payment_intent
+                for payment_intent in self.payment_intents
+                if created["gte"] <= payment_intent["created"]
+                and payment_intent["created"] < created.get("lt", 2**63)
+            ),
+            key=lambda payment_intent: payment_intent["created"],
+            reverse=True,
+        )
+        if starting_after is not None:
+            ids = [payment_intent["id"] for payment_intent in payment_intents]
+            payment_intents = payment_intents[ids.index(starting_after) + 1 :]
+        return SimpleNamespace(
+            data=payment_intents[:limit], has_more=len(payment_intents) > limit
+        )
+
 
 def enable_stripe_mock(self: Any) -> None:
     self.stripe_mock = StripeMock()
@@ -29,7 +97,57 @@ def enable_stripe_mock(self: Any) -> None:
     patcher_modify = patch(
         "customer.services.stripe.Customer.modify", self.stripe_mock.customer_modify
     )
+    patcher_payment_intent_create = patch(
+        "booking.services.stripe.PaymentIntent.create",
+        self.stripe_mock.payment_intent_create,
+    )
+    patcher_payment_intent_cancel = patch(
+        "booking.services.stripe.PaymentIntent.cancel",
+        self.stripe_mock.payment_intent_cancel,
+    )
+    patcher_refund_create = patch(
+        "booking.services.stripe.Refund.create", self.stripe_mock.refund_create
+    )
+    patcher_payment_intent_list = patch(
+        "booking.reconciliation.stripe.PaymentIntent.list",
+        self.stripe_mock.payment_intent_list,
+    )
     self.addCleanup(patcher_create.stop)
     self.addCleanup(patcher_modify.stop)
+    self.addCleanup(patcher_payment_intent_create.stop)
+    self.addCleanup(patcher_payment_intent_cancel.stop)
+    self.addCleanup(patcher_refund_create.stop)
+    self.addCleanup(patcher_payment_intent_list.stop)
     patcher_create.start()
     patcher_modify.start()
+    patcher_payment_intent_create.start()
+    patcher_payment_intent_cancel.start()
+    patcher_refund_create.start()
+    patcher_payment_intent_list.start()
+
+
+class EmailSenderMock:
+    max_batch_size = 100
+
+    def __init__(self) -> None:
+        self.batches: list = []
+        self.fail = False
+        # Indexes of the chunks failing to be sent
+        self.failing_chunks: set[int] = set()
+        self.chunk_count = 0
+
+    def send_chunk(self, emails: Any) -> list[str]:
+        self.chunk_count += 1
+        if self.fail or self.chunk_count - 1 in self.failing_chunks:
+            raise ConnectionError("Email provider unavailable")
+        self.batches.append([email.to for email in emails])
+        return [f"email_{email.pk}" for email in emails]
+
+
+def enable_email_sender_mock(self: Any) -> None:
+    self.email_sender_mock = EmailSenderMock()
+    patcher = patch(
+        "notification.services.get_email_sender", lambda: self.email_sender_mock
+    )
+    self.addCleanup(patcher.stop)
+    patcher.start()
@@ -0,0 +1,70 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.http import QueryDict
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .errors import (
+    PERIOD_END_BEFORE_START_ERROR,
+    PERIOD_INCOMPLETE_ERROR,
+    PERIOD_INVALID_DATE_ERROR,
+    get_period_too_long_error,
+)
+
+
+def parse_query_datetime(value: str) -> datetime:
+    """Parse an aware datetime from an ISO 8601 date or datetime query param"""
+
+    try:
+        parsed_datetime = parse_datetime(value)
+        if parsed_datetime is None:
+            parsed_date = parse_date(value)
+            if parsed_date is not None:
+                parsed_datetime = datetime.combine(parsed_date, time.min)
+    except ValueError:
+        parsed_datetime = None
+
+    if parsed_datetime is None:
+        raise PERIOD_INVALID_DATE_ERROR
+    if timezone.is_naive(parsed_datetime):
+        parsed_datetime = timezone.make_aware(parsed_datetime)
+    return parsed_datetime
+
+
+def parse_period(
+    query_params: QueryDict, start_param: str, end_param: str
+) -> tuple[datetime, datetime] | None:
+    """
+    Parse a time period from two query params.
+    Returns None when none of the params is provided
+    """
+
+    start = query_params.get(start_param)
+    end = query_params.get(end_param)
+    if start is None and end is None:
+        return None
+    if not start or not end:
+        raise PERIOD_INCOMPLETE_ERROR
+
+    start_date = parse_query_datetime(start)
+    end_date = parse_query_datetime(end)
+    if end_date <= start_date:
+        raise PERIOD_END_BEFORE_START_ERROR
+    return start_date, end_date
+
+
+def check_booking_duration(start_date: datetime, end_date: datetime) -> None:
+    """Reject a time period longer than the maximum booking duration"""
+
+    max_duration = timedelta(seconds=settings.BOOKING_MAX_DURATION)
+    if end_date - start_date > max_duration:
+        raise get_period_too_long_error(max_duration)
+
+
+def get_earliest_booking_start() -> datetime:
+    """Return the earliest start date of a new booking, the start of the next day"""
+
+    return timezone.now().replace(
+        hour=0, minute=0, second=0, microsecond=0
+    ) + timedelta(days=1)
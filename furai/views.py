@@ -1,16 +1,13 @@
+import json
 import os
 
 import stripe
-from django.shortcuts import get_object_or_404
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.status import HTTP_200_OK
 from rest_framework.views import APIView
-from stripe import PaymentIntent
 
-from booking.enums import BookingStatus
-from booking.models import Booking
-from booking.services import BookingService
+from booking.events import record_stripe_event
 
 stripe.api_key = os.getenv("STRIPE_API_KEY")
 
@@ -23,12 +20,11 @@ class WebhookView(APIView):
     """
 
     def post(self, request: Request) -> Response:
-        event = None
         payload = request.body.decode("utf-8")
         sig_header = request.headers["STRIPE_SIGNATURE"]
 
         try:
-            event = stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
+            stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
         except ValueError as error:
             # Invalid payload
             raise error
@@ -36,20 +32,8 @@ class WebhookView(APIView):
             # Invalid signature
             raise error
 
-        if event["type"] == "payment_intent.succeeded":
-            payment_intent: PaymentIntent = event["data"]["object"]
-            if payment_intent.metadata.get("booking_id"):
-                booking = get_object_or_404(
-                    Booking, pk=payment_intent.metadata["booking_id"]
-                )
-                booking.status = BookingStatus.ACTIVE
-                booking.save()
-                BookingService().send_confirmation_email(booking)
-        if event["type"] == "payment_intent.canceled":
-            booking_id: str = event["data"]["object"].metadata["booking_id"]
-            booking = get_object_or_404(Booking, pk=booking_id)
-            booking.delete()
-        else:
-            print("Unhandled event type {}".format(event["type"]))
+        # The event is applied to its booking by the Stripe event worker, so
+        # that Stripe gets a response right away. Retried events are ignored
+        record_stripe_event(json.loads(payload))
 
         return Response(status=HTTP_200_OK)
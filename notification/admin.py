@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import OutboxEmail
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ("to", "subject", "status", "attempts", "created_at", "sent_at")
+    search_fields = ("to",)
+    readonly_fields = ("provider_id", "last_error", "sent_at")
+    list_filter = ("status",)
+    list_per_page = 30
@@ -0,0 +1,7 @@
+from django.db.models import TextChoices
+
+
+class EmailStatus(TextChoices):
+    PENDING = "PENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
@@ -0,0 +1,22 @@
+from typing import Any
+
+from django.core.management.base import CommandParser
+
+from furai.commands import WorkerCommand
+from notification.services import EmailService
+
+
+class Command(WorkerCommand):
+    help = "Send the pending emails of the outbox in batches"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="The maximum number of emails sent per batch",
+        )
+
+    def run_once(self, **options: Any) -> int:
+        return EmailService().send_pending(options["batch_size"])
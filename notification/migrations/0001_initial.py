@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-17 23:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_comment='The creation date of the model instance', default=django.utils.timezone.now, help_text='The creation date of the model instance')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_comment='The last updated date of the model instance', help_text='The last updated date of the model instance')),
+                ('to', models.EmailField(db_comment='The email address of the recipient', help_text='The email address of the recipient', max_length=254)),
+                ('subject', models.CharField(db_comment='The subject of the email', help_text='The subject of the email', max_length=255)),
+                ('html', models.TextField(db_comment='The HTML body of the email', help_text='The HTML body of the email')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('SENT', 'Sent'), ('FAILED', 'Failed')], db_comment='The delivery status of the email', default='PENDING', help_text='The delivery status of the email')),
+                ('attempts', models.IntegerField(db_comment='The number of failed sending attempts', default=0, help_text='The number of failed sending attempts')),
+                ('next_attempt_at', models.DateTimeField(db_comment='The date after which the email can be sent', default=django.utils.timezone.now, help_text='The date after which the email can be sent')),
+                ('sent_at', models.DateTimeField(blank=True, db_comment='The date the email was sent', help_text='The date the email was sent', null=True)),
+                ('provider_id', models.CharField(blank=True, db_comment='The identifier of the email at the email provider', help_text='The identifier of the email at the email provider', max_length=255)),
+                ('last_error', models.TextField(blank=True, db_comment='The error of the last failed sending attempt', help_text='The error of the last failed sending attempt')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'PENDING')), fields=['next_attempt_at'], name='outbox_email_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,86 @@
+from datetime import datetime
+from typing import Self
+
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from furai.models import BaseModel
+
+from .enums import EmailStatus
+
+
+class OutboxEmailQuerySet(models.QuerySet):
+    def due(self, now: datetime) -> Self:
+        """Pending emails whose next sending attempt is due"""
+
+        return self.filter(status=EmailStatus.PENDING, next_attempt_at__lte=now)
+
+
+class OutboxEmail(BaseModel):
+    """
+    Representation of an email written in the transaction of the change it is
+    about, and sent afterwards by the email worker
+    """
+
+    objects = OutboxEmailQuerySet.as_manager()
+
+    to = models.EmailField(
+        help_text="The email address of the recipient",
+        db_comment="The email address of the recipient",
+    )
+    subject = models.CharField(
+        help_text="The subject of the email",
+        db_comment="The subject of the email",
+        max_length=255,
+    )
+    html = models.TextField(
+        help_text="The HTML body of the email",
+        db_comment="The HTML body of the email",
+    )
+    status = models.CharField(
+        choices=EmailStatus,
+        help_text="The delivery status of the email",
+        db_comment="The delivery status of the email",
+        default=EmailStatus.PENDING,
+    )
+    attempts = models.IntegerField(
+        help_text="The number of failed sending attempts",
+        db_comment="The number of failed sending attempts",
+        default=0,
+    )
+    next_attempt_at = models.DateTimeField(
+        help_text="The date after which the email can be sent",
+        db_comment="The date after which the email can be sent",
+        default=timezone.now,
+    )
+    sent_at = models.DateTimeField(
+        help_text="The date the email was sent",
+        db_comment="The date the email was sent",
+        null=True,
+        blank=True,
+    )
+    provider_id = models.CharField(
+        help_text="The identifier of the email at the email provider",
+        db_comment="The identifier of the email at the email provider",
+        max_length=255,
+        blank=True,
+    )
+    last_error = models.TextField(
+        help_text="The error of the last failed sending attempt",
+        db_comment="The error of the last failed sending attempt",
+        blank=True,
+    )
+
+    class Meta:
+        indexes = [
+            # Claiming the due emails of the outbox
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=Q(status=EmailStatus.PENDING),
+                name="outbox_email_pending_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.to} - {self.subject}"
@@ -0,0 +1,47 @@
+import hashlib
+from collections.abc import Sequence
+from typing import Protocol
+
+import resend
+
+from furai.settings import NOREPLY_EMAIL_ADDRESS
+
+from .models import OutboxEmail
+
+
+class EmailSender(Protocol):
+    # Maximum number of emails sent per request
+    max_batch_size: int
+
+    def send_chunk(self, emails: Sequence[OutboxEmail]) -> list[str]:
+        """Send emails and return their identifiers at the email provider"""
+        ...
+
+
+class ResendEmailSender:
+    """
+    Send emails with the Resend batch API, up to 100 emails per request
+    """
+
+    max_batch_size = 100
+
+    def send_chunk(self, emails: Sequence[OutboxEmail]) -> list[str]:
+        params: list[resend.Emails.SendParams] = [
+            {
+                "from": NOREPLY_EMAIL_ADDRESS,
+                "to": [email.to],
+                "subject": email.subject,
+                "html": email.html,
+            }
+            for email in emails
+        ]
+        # Retrying the same batch after a timeout does not send it twice
+        digest = hashlib.sha256(
+            ",".join(str(email.pk) for email in emails).encode()
+        ).hexdigest()
+        response = resend.Batch.send(params, {"idempotency_key": f"outbox-{digest}"})
+        return [email["id"] for email in response["data"]]
+
+
+def get_email_sender() -> EmailSender:
+    return ResendEmailSender()
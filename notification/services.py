@@ -0,0 +1,136 @@
+import logging
+from collections.abc import Iterable
+from datetime import timedelta
+from typing import cast
+
+from django.db import transaction
+from django.utils import timezone
+
+from .enums import EmailStatus
+from .models import OutboxEmail
+from .senders import EmailSender, get_email_sender
+
+logger = logging.getLogger(__name__)
+
+# Number of sending attempts before an email is marked as failed
+EMAIL_MAX_ATTEMPTS = 8
+# Delay before the first retry, doubled after each failed attempt
+EMAIL_RETRY_BASE_DELAY = timedelta(seconds=30)
+EMAIL_RETRY_MAX_DELAY = timedelta(hours=1)
+# Delay after which the emails claimed by a worker can be claimed again
+EMAIL_CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+class EmailService:
+    """
+    Service class for OutboxEmail instances
+    """
+
+    def __init__(
+        self,
+        to: str | None = None,
+        subject: str | None = None,
+        html: str | None = None,
+    ) -> None:
+        self.to = to
+        self.subject = subject
+        self.html = html
+
+    def enqueue(self) -> OutboxEmail:
+        """
+        Write an email to the outbox. It is sent by the email worker once the
+        current transaction commits
+        """
+
+        email = self.build()
+        email.save()
+        return email
+
+    def build(self) -> OutboxEmail:
+        """Return the outbox email, without saving it"""
+
+        return OutboxEmail(
+            to=cast(str, self.to),
+            subject=cast(str, self.subject),
+            html=cast(str, self.html),
+        )
+
+    @staticmethod
+    def enqueue_many(services: Iterable["EmailService"]) -> list[OutboxEmail]:
+        """Write several emails to the outbox with a single INSERT statement"""
+
+        return OutboxEmail.objects.bulk_create(service.build() for service in services)
+
+    def get_retry_delay(self, attempts: int) -> timedelta:
+        return min(EMAIL_RETRY_BASE_DELAY * 2 ** (attempts - 1), EMAIL_RETRY_MAX_DELAY)
+
+    def claim_pending(self, batch_size: int) -> list[OutboxEmail]:
+        """
+        Claim a batch of due emails by postponing their next attempt for
+        EMAIL_CLAIM_TIMEOUT, so that the other workers skip them without them
+        being locked while they are sent. Emails of a worker stopped before
+        recording their status are sent again once the claim times out
+        """
+
+        now = timezone.now()
+        with transaction.atomic():
+            emails = list(
+                OutboxEmail.objects.due(now)
+                .select_for_update(skip_locked=True)
+                .order_by("next_attempt_at", "id")[:batch_size]
+            )
+            OutboxEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                next_attempt_at=now + EMAIL_CLAIM_TIMEOUT, updated_at=now
+            )
+        return emails
+
+    def send_pending(self, batch_size: int) -> int:
+        """
+        Send a batch of due emails and record their delivery status.
+        The emails are sent in chunks of the maximum batch size of the email
+        provider, and the status of each chunk is recorded once it is sent.
+        Returns the number of claimed emails
+        """
+
+        emails = self.claim_pending(batch_size)
+        sender = get_email_sender()
+        for index in range(0, len(emails), sender.max_batch_size):
+            self.send_chunk(sender, emails[index : index + sender.max_batch_size])
+        return len(emails)
+
+    def send_chunk(self, sender: EmailSender, emails: list[OutboxEmail]) -> None:
+        """Send a chunk of emails and record their delivery status"""
+
+        try:
+            provider_ids = sender.send_chunk(emails)
+        except Exception as error:
+            logger.warning("Could not send %s emails: %s", len(emails), error)
+            now = timezone.now()
+            for email in emails:
+                email.attempts += 1
+                email.last_error = str(error)
+                if email.attempts >= EMAIL_MAX_ATTEMPTS:
+                    email.status = EmailStatus.FAILED
+                else:
+                    email.next_attempt_at = now + self.get_retry_delay(email.attempts)
+        else:
+            now = timezone.now()
+            for email, provider_id in zip(emails, provider_ids):
+                email.status = EmailStatus.SENT
+                email.sent_at = now
+                email.provider_id = provider_id
+
+        for email in emails:
+            email.updated_at = now
+        OutboxEmail.objects.bulk_update(
+            emails,
+            [
+                "status",
+                "attempts",
+                "next_attempt_at",
+                "sent_at",
+                "provider_id",
+                "last_error",
+                "updated_at",
+            ],
+        )
@@ -0,0 +1,145 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from faker import Faker
+
+from booking.services import BookingService
+from booking.tests import set_up_booking
+from car.tests import set_up_car
+from customer.tests import set_up_customer
+from furai.tests.mocks import enable_email_sender_mock, enable_stripe_mock
+
+from .enums import EmailStatus
+from .models import OutboxEmail
+from .services import EMAIL_MAX_ATTEMPTS, EMAIL_RETRY_BASE_DELAY, EmailService
+
+fake = Faker()
+
+
+def set_up_outbox_email(**kwargs):
+    """Creates an OutboxEmail instance in the test DB"""
+
+    return OutboxEmail.objects.create(
+        to=fake.email(),
+        subject=fake.sentence(),
+        html=fake.text(),
+        **kwargs,
+    )
+
+
+class OutboxEmailTestCase(TestCase):
+    def setUp(self):
+        enable_stripe_mock(self)
+        enable_email_sender_mock(self)
+
+    def send_emails(self):
+        call_command("send_emails", "--once", stdout=StringIO())
+
+    def test_booking_cancellation_email(self):
+        """Ensures cancelling a booking writes an email to the outbox"""
+
+        customer = set_up_customer()
+        booking = set_up_booking(set_up_car(), customer)
+        BookingService(id=booking.pk).cancel()
+        email = OutboxEmail.objects.get()
+        assert email.to == customer.user.email
+        assert email.status == EmailStatus.PENDING
+        assert self.email_sender_mock.batches == []
+
+    def test_send_emails(self):
+        """Ensures the due emails are sent in a single batch"""
+
+        emails = [set_up_outbox_email() for _ in range(3)]
+        self.send_emails()
+        assert self.email_sender_mock.batches == [[email.to for email in emails]]
+        for email in emails:
+            email.refresh_from_db()
+            assert email.status == EmailStatus.SENT
+            assert email.sent_at is not None
+            assert email.provider_id == f"email_{email.pk}"
+
+        # Sent emails are not sent again
+        self.send_emails()
+        assert len(self.email_sender_mock.batches) == 1
+
+    def test_send_emails_batch_size(self):
+        """Ensures a batch does not exceed the batch size"""
+
+        for _ in range(3):
+            set_up_outbox_email()
+        sent_count = EmailService().send_pending(batch_size=2)
+        assert sent_count == 2
+        assert OutboxEmail.objects.filter(status=EmailStatus.SENT).count() == 2
+
+    def test_send_emails_not_due(self):
+        """Ensures emails are not sent before their next attempt date"""
+
+        email = set_up_outbox_email(
+            next_attempt_at=timezone.now() + timedelta(minutes=5)
+        )
+        self.send_emails()
+        email.refresh_from_db()
+        assert email.status == EmailStatus.PENDING
+        assert self.email_sender_mock.batches == []
+
+    def test_send_emails_failure(self):
+        """Ensures a failed batch is retried later with an increasing delay"""
+
+        email = set_up_outbox_email()
+        self.email_sender_mock.fail = True
+        self.send_emails()
+        email.refresh_from_db()
+        assert email.status == EmailStatus.PENDING
+        assert email.attempts == 1
+        assert email.last_error == "Email provider unavailable"
+        first_delay = email.next_attempt_at - timezone.now()
+        assert timedelta(0) < first_delay <= EMAIL_RETRY_BASE_DELAY
+
+        email.next_attempt_at = timezone.now()
+        email.save()
+        self.send_emails()
+        email.refresh_from_db()
+        assert email.attempts == 2
+        assert email.next_attempt_at - timezone.now() > EMAIL_RETRY_BASE_DELAY
+
+    def test_send_emails_chunk_failure(self):
+        """Ensures only the emails of a failed chunk are retried"""
+
+        emails = [set_up_outbox_email() for _ in range(5)]
+        self.email_sender_mock.max_batch_size = 2
+        self.email_sender_mock.failing_chunks = {1}
+        self.send_emails()
+        statuses = []
+        for email in emails:
+            email.refresh_from_db()
+            statuses.append((email.status, email.attempts))
+        assert statuses == [
+            (EmailStatus.SENT, 0),
+            (EmailStatus.SENT, 0),
+            (EmailStatus.PENDING, 1),
+            (EmailStatus.PENDING, 1),
+            (EmailStatus.SENT, 0),
+        ]
+        assert emails[0].provider_id == f"email_{emails[0].pk}"
+        assert emails[2].updated_at > emails[2].created_at
+
+    def test_send_emails_claimed(self):
+        """Ensures the emails claimed by a worker are skipped by the others"""
+
+        set_up_outbox_email()
+        claimed_emails = EmailService().claim_pending(batch_size=10)
+        assert len(claimed_emails) == 1
+        assert EmailService().claim_pending(batch_size=10) == []
+
+    def test_send_emails_max_attempts(self):
+        """Ensures an email is marked as failed after too many attempts"""
+
+        email = set_up_outbox_email(attempts=EMAIL_MAX_ATTEMPTS - 1)
+        self.email_sender_mock.fail = True
+        self.send_emails()
+        email.refresh_from_db()
+        assert email.status == EmailStatus.FAILED
+        assert email.attempts == EMAIL_MAX_ATTEMPTS
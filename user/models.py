@@ -5,7 +5,7 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.forms import ValidationError
 
-from furai.models import BaseModel
+from furai.models import BaseModel, upsert
 
 
 class CustomUserManager(BaseUserManager):
@@ -38,6 +38,15 @@ class CustomUserManager(BaseUserManager):
         user.save()
         return user
 
+    def upsert(self, email: str) -> "CustomUser":
+        """
+        Return the user with this email, created as a regular user if it does not
+        exist, with a single INSERT ... ON CONFLICT statement
+        """
+
+        user: CustomUser = self.model(email=self.normalize_email(email))
+        return upsert(user, unique_fields=["email"], update_fields=["email"])
+
     def create_superuser(self, email: str, password: str | None = None, **kwargs: Any):
         user = self.create_user(
             email=email, password=password, is_staff=True, is_superuser=True
@@ -21,6 +21,25 @@ class CustomUserTestCase(TestCase):
         assert user.is_staff is False
         assert user.is_superuser is False
 
+    def test_upsert_user(self):
+        """Creates a regular user or returns the existing one"""
+
+        user_email = fake.email()
+        user = CustomUser.objects.upsert(user_email)
+        assert user.pk is not None
+        assert user.email == user_email
+        assert not user.password
+        assert user.is_staff is False
+
+        staff_user = CustomUser.objects.create_user(
+            email=fake.email(), password=fake.password(), is_staff=True
+        )
+        user = CustomUser.objects.upsert(staff_user.email)
+        assert user.pk == staff_user.pk
+        assert user.is_staff is True
+        assert user.password == staff_user.password
+        assert CustomUser.objects.count() == 2
+
     def test_fail_create_user_missing_email(self):
         """Fails to create a regular user if email is not provided"""
 